@@ -0,0 +1,58 @@
+import os
+import statistics
+import tempfile
+import time
+
+# Benchmarks run against a throwaway SQLite database in a scratch directory,
+# configured the same way as the test suite. Run them from Backend/, e.g.
+#
+#     python -m benchmarks.nearby_search
+#
+# Settings already in the environment win, so a benchmark can be pointed at a
+# real database by exporting SQLALCHEMY_DATABASE_URI first.
+
+
+def create_benchmark_app(**environ):
+    """Create the app on a scratch database, with the scheduler paused."""
+    workdir = tempfile.mkdtemp(prefix="lifelinego-bench-")
+    os.chdir(workdir)
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URI", f"sqlite:///{workdir}/bench.db")
+    os.environ.setdefault("SQLALCHEMY_REPLICA_URIS", "")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("JWT_SECRET_KEY", "bench")
+    os.environ.setdefault("MAIL_DEFAULT_SENDER", "noreply@lifelinego.test")
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    os.environ.setdefault("IDEMPOTENCY_BACKEND", "memory")
+    os.environ.setdefault("LIVE_LOCATION_BACKEND", "memory")
+    for key, value in environ.items():
+        os.environ.setdefault(key, str(value))
+
+    from project import create_app
+    from project.scheduler import scheduler
+
+    app, _ = create_app()
+    scheduler.pause()
+    return app
+
+
+def measure(func, repeat):
+    """Call `func` `repeat` times; return the per-call latencies in milliseconds."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies):
+    """p50 / p95 / p99 / max of a list of millisecond latencies, for printing."""
+    ordered = sorted(latencies)
+    return (
+        f"p50 {statistics.median(ordered):8.2f} ms  p95 {percentile(ordered, 0.95):8.2f} ms  "
+        f"p99 {percentile(ordered, 0.99):8.2f} ms  max {ordered[-1]:8.2f} ms"
+    )
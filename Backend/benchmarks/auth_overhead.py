@@ -0,0 +1,67 @@
+"""
+Per-request cost of the JWT blocklist check (the token_in_blocklist_loader).
+
+Compares one query per check (before), the negative-lookup LRU alone (the
+filter forced stale) and the Bloom filter. The workload is many live tokens
+each used several times, with a small share of requests made with revoked
+tokens, against a blocklist table of `--revoked` rows.
+
+    python -m benchmarks.auth_overhead [--revoked 20000] [--tokens 2000] [--uses 10]
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks import create_benchmark_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--revoked", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--uses", type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    from project.db import db
+    from project.tables import TokenBlocklist
+    from project.services.logout import blocklist_cache, is_token_revoked
+
+    rng = random.Random(5)
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    revoked = [str(uuid.uuid4()) for _ in range(args.revoked)]
+    with app.app_context():
+        db.session.execute(TokenBlocklist.__table__.insert(), [
+            {"jti": jti, "created_at": datetime.utcnow(), "expires_at": expires_at} for jti in revoked
+        ])
+        db.session.commit()
+
+    exp = time.time() + 3600
+    live = [{"jti": str(uuid.uuid4()), "exp": exp} for _ in range(args.tokens)]
+    requests = live * args.uses + [{"jti": jti, "exp": exp} for jti in rng.sample(revoked, len(live) * args.uses // 100)]
+    rng.shuffle(requests)
+
+    def query_per_check(payload):
+        return TokenBlocklist.query.filter_by(jti=payload["jti"]).first() is not None
+
+    def run(name, check, stale=False):
+        with app.app_context():
+            blocklist_cache.configure(app)
+            if stale:
+                blocklist_cache.refreshed_at = None
+            start = time.perf_counter()
+            revoked_seen = sum(check(payload) for payload in requests)
+            elapsed = time.perf_counter() - start
+        lookups = blocklist_cache.database_lookups if check is is_token_revoked else len(requests)
+        print(f"{name:<24} {elapsed / len(requests) * 1e6:8.1f} us/check  {lookups:>7} queries  {revoked_seen} revoked")
+
+    print(f"{len(requests)} checks, {args.tokens} live tokens, {args.revoked} revoked tokens in the table")
+    run("query per check", query_per_check)
+    run("negative LRU only", is_token_revoked, stale=True)
+    run("Bloom filter", is_token_revoked)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+End-to-end latency of creating a booking request: POST /api/users/order-requests
+through the whole Flask stack (auth, validation, service, commit, response),
+with the number of SQL statements each request sends.
+
+    python -m benchmarks.booking_latency [--requests 1000]
+
+Emails are only queued (outbox) or, where a tree still sends them from the
+request, run eagerly with sending suppressed, so no network is involved.
+"""
+import argparse
+
+from sqlalchemy import event
+
+from benchmarks import create_benchmark_app, measure, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    app.config["MAIL_SUPPRESS_SEND"] = True
+    app.extensions["mail"].suppress = True
+    from celery import current_app as celery
+    celery.conf.task_always_eager = True
+
+    from flask_jwt_extended import create_access_token
+    from project.db import db
+    from project.tables import CityStateModel, HospitalModel, UserModel
+
+    with app.app_context():
+        city_state = CityStateModel(city="Delhi", state="DL", postal_code="110001")
+        db.session.add(city_state)
+        db.session.flush()
+        hospital = HospitalModel(
+            name="hospital", email="hospital@lifelinego.test", phone="9000000000", password="x",
+            street="1 Test Road", latitude=28.61, longitude=77.21, city_state_id=city_state.id
+        )
+        user = UserModel(name="user", email="user@lifelinego.test", phone="8000000000", password="x")
+        db.session.add_all([hospital, user])
+        db.session.commit()
+        hospital_id = hospital.id
+        token = create_access_token(identity=str(user.id), additional_claims={"role": "user"})
+        engine = db.engine
+
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = {
+        "hospital_id": hospital_id, "ambulance_type": "Basic", "status": "pending",
+        "name": "Patient", "age": 40, "sex": "M",
+        "address": {
+            "street": "2 Pickup Lane", "city": "Delhi", "state": "DL", "postal_code": "110001",
+            "latitude": 28.62, "longitude": 77.22
+        },
+    }
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    def create():
+        response = client.post("/api/users/order-requests", json=payload, headers=headers)
+        assert response.status_code == 201, response.get_data(as_text=True)
+
+    create()  # Warm up caches and lazily created state
+    statements.clear()
+    latencies = measure(create, args.requests)
+    print(f"{args.requests} bookings  {summarize(latencies)}  {len(statements) / args.requests:.1f} statements each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Load test of live driver locations: 10k drivers each reporting a ping every
+5 seconds (2,000 pings/s), through POST /api/drivers/location, with the
+periodic flush writing the buffered pings to driver_location_samples.
+
+    python -m benchmarks.driver_locations [--drivers 10000] [--interval 5] [--rounds 3]
+
+Every round sends one ping per driver, then runs the flush the scheduler runs
+every LOCATION_SAMPLE_FLUSH_INTERVAL_SECONDS. Reported per round: ping latency,
+the pings/s one worker sustains against the pings/s the fleet sends, and the
+flush time against the interval. At the end: nearby searches over the live
+positions, and buffered / dropped / written sample counts.
+"""
+import argparse
+import random
+import time
+
+from benchmarks import create_benchmark_app, measure, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=10000)
+    parser.add_argument("--interval", type=float, default=5, help="seconds between two pings of a driver")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+
+    from flask_jwt_extended import create_access_token
+    from project.db import db
+    from project.tables import CityStateModel, DriverModel
+    from project.services import driver_locations
+
+    with app.app_context():
+        city_state = CityStateModel(city="Delhi", state="DL", postal_code="110001")
+        db.session.add(city_state)
+        db.session.flush()
+        db.session.execute(DriverModel.__table__.insert(), [
+            {
+                "name": f"driver {index}", "email": f"driver{index}@lifelinego.test", "phone": "7000000000",
+                "password": "x", "status": "available", "city_state_id": city_state.id,
+                "latitude": 28.61, "longitude": 77.21
+            }
+            for index in range(args.drivers)
+        ])
+        db.session.commit()
+        driver_ids = db.session.execute(db.select(DriverModel.id)).scalars().all()
+        headers = {
+            driver_id: {"Authorization": "Bearer " + create_access_token(
+                identity=str(driver_id), additional_claims={"role": "driver"}
+            )}
+            for driver_id in driver_ids
+        }
+
+    client = app.test_client()
+    # Drivers spread over ~30 km around central Delhi, each drifting a little per ping
+    positions = {driver_id: [28.61 + random.uniform(-0.15, 0.15), 77.21 + random.uniform(-0.15, 0.15)]
+                 for driver_id in driver_ids}
+    fleet_rate = len(driver_ids) / args.interval
+
+    for round in range(1, args.rounds + 1):
+        order = iter(random.sample(driver_ids, len(driver_ids)))
+
+        def ping():
+            driver_id = next(order)
+            position = positions[driver_id]
+            position[0] += random.uniform(-0.0005, 0.0005)
+            position[1] += random.uniform(-0.0005, 0.0005)
+            response = client.post(
+                "/api/drivers/location", headers=headers[driver_id],
+                json={"pings": [{"latitude": position[0], "longitude": position[1]}]}
+            )
+            assert response.status_code == 202, response.get_data(as_text=True)
+
+        latencies = measure(ping, len(driver_ids))
+        worker_rate = len(latencies) / (sum(latencies) / 1000)
+
+        start = time.perf_counter()
+        written = driver_locations.flush_location_samples(app)
+        flush_seconds = time.perf_counter() - start
+
+        print(f"round {round}: {len(latencies)} pings  {summarize(latencies)}")
+        print(f"         one worker {worker_rate:7.0f} pings/s for a fleet sending {fleet_rate:.0f} pings/s"
+              f" -> {fleet_rate / worker_rate:.1f} workers busy")
+        print(f"         flush {written} samples in {flush_seconds:.2f} s of a {args.interval:g} s interval")
+
+    latencies = measure(lambda: driver_locations.get_live_drivers_near(28.61, 77.21, 5), 200)
+    nearby = len(driver_locations.get_live_drivers_near(28.61, 77.21, 5))
+    print(f"nearby search, {driver_locations.location_store.size()} live drivers ({nearby} within 5 km)  "
+          f"{summarize(latencies)}")
+
+    buffer = driver_locations.sample_buffer
+    print(f"samples: {len(buffer)} buffered  {buffer.dropped} dropped  {buffer.written} written  "
+          f"{buffer.rejected} rejected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Nearby hospital search at 10k, 100k and 1M hospitals: the geohash range scans
+of find_items_in_range against the plain lat/lon box filter it replaced.
+
+    python -m benchmarks.nearby_search [--sizes 10000 100000 1000000] [--queries 200]
+"""
+import argparse
+import random
+
+from sqlalchemy import and_, insert
+
+from benchmarks import create_benchmark_app, measure, summarize
+
+
+def seed(app, total, rng, batch_size=50000):
+    """Scatter `total` hospitals over India, in batches of core inserts."""
+    from project.db import db
+    from project.tables import HospitalModel
+    from project.services import geohash
+    from project.services.city_state import resolve_city_state
+
+    with app.app_context():
+        city_state = resolve_city_state({"city": "Delhi", "state": "DL", "postal_code": "110001"})
+        start = db.session.query(db.func.count(HospitalModel.id)).scalar()
+        for offset in range(start, total, batch_size):
+            rows = []
+            for n in range(offset, min(offset + batch_size, total)):
+                latitude, longitude = rng.uniform(8, 35), rng.uniform(68, 97)
+                rows.append({
+                    "name": f"hospital{n}", "email": f"hospital{n}@lifelinego.test", "phone": f"{n:010d}",
+                    "password": "x", "latitude": latitude, "longitude": longitude,
+                    "geohash": geohash.encode(latitude, longitude), "city_state_id": city_state.id
+                })
+            db.session.execute(insert(HospitalModel), rows)
+            db.session.commit()
+
+
+def box_search(latitude, longitude, radius_km):
+    """The search before the geohash index: the same columns, filtered by a lat/lon box only."""
+    from project.db import db
+    from project.tables import CityStateModel, HospitalModel
+    from project.services.distance import nearest_within
+
+    radius_deg = radius_km / 111
+    rows = (
+        db.session.query(
+            HospitalModel.id, HospitalModel.name, HospitalModel.phone, HospitalModel.latitude, HospitalModel.longitude,
+            CityStateModel.city, CityStateModel.state, CityStateModel.postal_code
+        )
+        .outerjoin(CityStateModel, HospitalModel.city_state_id == CityStateModel.id)
+        .filter(and_(
+            HospitalModel.latitude >= latitude - radius_deg, HospitalModel.latitude <= latitude + radius_deg,
+            HospitalModel.longitude >= longitude - radius_deg, HospitalModel.longitude <= longitude + radius_deg
+        ))
+        .all()
+    )
+    return nearest_within(latitude, longitude, [row.latitude for row in rows], [row.longitude for row in rows], radius_km)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=75)
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    from project.tables import HospitalModel
+    from project.services.helper import find_items_in_range
+
+    rng = random.Random(42)
+    for size in sorted(args.sizes):
+        seed(app, size, rng)
+        points = [(rng.uniform(8, 35), rng.uniform(68, 97)) for _ in range(args.queries)]
+        with app.app_context():
+            queries = iter(points * 2)
+            geohash_ms = measure(
+                lambda: find_items_in_range(*next(queries), HospitalModel, "hospital", args.radius), args.queries
+            )
+            queries = iter(points)
+            box_ms = measure(lambda: box_search(*next(queries), args.radius), args.queries)
+        print(f"{size:>8} hospitals  box scan  {summarize(box_ms)}")
+        print(f"{size:>8} hospitals  geohash   {summarize(geohash_ms)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Connection pool under load: request threads check out a connection, run a
+query and hold it for `--query-ms`, against pools of different sizes. Prints
+throughput and the db_pool metrics (checkout latency, overflow, timeouts).
+
+    python -m benchmarks.pool_load [--threads 64] [--requests 20] [--query-ms 5] [--pools 5:10 10:20 30:0]
+
+--url points it at a real database (e.g. mysql+pymysql://...); the default is
+a scratch SQLite file, where only the pool's own behaviour is meaningful.
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, exc, text
+
+from project import pool_config
+from project.pool_config import InstrumentedQueuePool, PoolStats
+
+
+def run(url, pool_size, max_overflow, threads, requests, query_seconds, timeout):
+    pool_config.pool_stats = PoolStats(window=threads * requests)
+    engine = create_engine(
+        url, poolclass=InstrumentedQueuePool, pool_size=pool_size, max_overflow=max_overflow, pool_timeout=timeout
+    )
+    barrier = threading.Barrier(threads)
+    failed = []
+
+    def worker():
+        barrier.wait()
+        for _ in range(requests):
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                    time.sleep(query_seconds)
+            except exc.TimeoutError:
+                failed.append(1)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+
+    stats = pool_config.pool_stats.snapshot()
+    latency = stats["checkout_latency_ms"]
+    print(
+        f"pool {pool_size:>3}+{max_overflow:<3} {(threads * requests - len(failed)) / elapsed:8.0f} req/s  "
+        f"checkout p50 {latency['p50']:7.2f} ms  p99 {latency['p99']:7.2f} ms  max {latency['max']:7.2f} ms  "
+        f"overflow {stats['overflow_checkouts']:>5}  timeouts {stats['timeouts']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url")
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--query-ms", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--pools", nargs="+", default=["5:10", "10:20", "30:0"], help="pool_size:max_overflow")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{tempfile.mkdtemp(prefix='lifelinego-bench-')}/pool.db"
+    print(f"{args.threads} threads x {args.requests} requests, {args.query_ms} ms per query")
+    for pool in args.pools:
+        pool_size, max_overflow = (int(value) for value in pool.split(":"))
+        run(url, pool_size, max_overflow, args.threads, args.requests, args.query_ms / 1000, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
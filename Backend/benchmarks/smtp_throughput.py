@@ -0,0 +1,94 @@
+"""
+Email delivery throughput: a new SMTP connection per email (before) against
+one connection reused for a batch (services/tasks.py).
+
+Emails go to a local SMTP sink. `--connect-delay` holds the greeting back to
+stand in for the TCP, TLS and login round trips of a real server.
+
+    python -m benchmarks.smtp_throughput [--emails 500] [--connect-delay 0.05]
+"""
+import argparse
+import socket
+import socketserver
+import threading
+import time
+
+from benchmarks import create_benchmark_app
+
+
+class SMTPSink(socketserver.StreamRequestHandler):
+    """Accepts and discards every message; just enough SMTP for smtplib."""
+
+    connect_delay = 0.0
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        # Replies are small writes; don't let Nagle's algorithm hold them back
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        time.sleep(self.connect_delay)
+        self.reply("220 sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.reply("250-sink")
+                self.reply("250 8BITMIME")
+            elif command == b"DATA":
+                self.reply("354 end with <CRLF>.<CRLF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.reply("250 queued")
+            elif command == b"QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--connect-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    SMTPSink.connect_delay = args.connect_delay
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPSink)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    app = create_benchmark_app()
+    from project.mail_config import mail
+    from project.services import tasks
+
+    app.config.update(MAIL_SERVER="127.0.0.1", MAIL_PORT=server.server_address[1], MAIL_USE_TLS=False, MAIL_DEBUG=False)
+    mail.init_app(app)
+
+    emails = [
+        {"to_email": f"user{n}@lifelinego.test", "subject": f"Booking {n}", "body": "Your booking was accepted."}
+        for n in range(args.emails)
+    ]
+
+    def connection_per_email():
+        for email_data in emails:
+            mail.send(tasks._build_message(email_data))
+
+    def reused_connection():
+        assert not tasks._deliver_all(emails)
+        tasks.close_smtp_connection()
+
+    print(f"{args.emails} emails, {args.connect_delay * 1000:.0f} ms to connect")
+    with app.app_context():
+        for name, send in [("connection per email", connection_per_email), ("reused connection", reused_connection)]:
+            start = time.perf_counter()
+            send()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<22} {args.emails / elapsed:8.1f} emails/s  ({elapsed:.2f} s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
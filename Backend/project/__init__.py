@@ -8,8 +8,10 @@ from dotenv import load_dotenv
 from .db import db  # Ensure db is the same instance used in your models
 
 from .mail_config import mail
-from .scheduler import scheduler
+from .scheduler import scheduler, start_scheduler
 from .celery_config import make_celery
+from .pool_config import engine_options_from_env, register_pool_metrics
+from .schema import upgrade_schema
 
 from .controller.user import blp as UserBlp
 from .controller.admin import blp as AdminBlp
@@ -18,7 +20,16 @@ from .controller.driver import blp as DriverBlp
 
 from .tables import *  # Make sure tables use db from db.py
 
-from .services.logout import is_token_revoked
+from .services.logout import is_token_revoked, init_blocklist_cache, refresh_blocklist_cache, cleanup_expired_tokens
+from .services.ambulanceBooking import sweep_booking_deadlines
+from .services.outbox import relay_outbox
+from .services.profile_cache import init_profile_cache
+from .services.city_state import preload_city_states
+from .services.idempotency import init_idempotency_store
+from .services.events import init_event_bus
+from .services.driver_locations import init_driver_locations, flush_location_samples
+from .services.dispatch import rebuild_availability_index
+from .services.passwords import init_password_hasher, ROLES as PASSWORD_ROLES
 
 from datetime import datetime
 
@@ -32,6 +43,10 @@ def create_app():
     app.config["OPENAPI_VERSION"] = "3.0.3"
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("SQLALCHEMY_DATABASE_URI")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env(app.config["SQLALCHEMY_DATABASE_URI"])
+    # Read replicas for read-only queries, as a comma-separated list of URIs
+    replica_uris = [uri.strip() for uri in os.getenv("SQLALCHEMY_REPLICA_URIS", "").split(",") if uri.strip()]
+    app.config["SQLALCHEMY_BINDS"] = {f"replica_{index}": uri for index, uri in enumerate(replica_uris)}
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
     app.config["DEBUG"] = True
 
@@ -42,6 +57,76 @@ def create_app():
     app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")  # Use an App Password if using Gmail
     app.config["MAIL_DEFAULT_SENDER"] = os.getenv("MAIL_DEFAULT_SENDER")
 
+    # JWT blocklist cache: revoked tokens are cached until they expire, negative lookups for BLOCKLIST_CACHE_TTL seconds.
+    # A Bloom filter of every revoked token, refreshed every BLOCKLIST_BLOOM_REFRESH_SECONDS, answers the rest.
+    app.config["BLOCKLIST_CACHE_SIZE"] = int(os.getenv("BLOCKLIST_CACHE_SIZE", 10000))
+    app.config["BLOCKLIST_CACHE_TTL"] = int(os.getenv("BLOCKLIST_CACHE_TTL", 30))
+    app.config["BLOCKLIST_BLOOM_CAPACITY"] = int(os.getenv("BLOCKLIST_BLOOM_CAPACITY", 100000))
+    app.config["BLOCKLIST_BLOOM_REFRESH_SECONDS"] = int(os.getenv("BLOCKLIST_BLOOM_REFRESH_SECONDS", 30))
+
+    # Expired blocklist tokens are deleted in chunks of this many rows
+    app.config["TOKEN_CLEANUP_CHUNK_SIZE"] = int(os.getenv("TOKEN_CLEANUP_CHUNK_SIZE", 1000))
+
+    # Booking deadlines: how long a hospital has to act, and how often overdue bookings are swept
+    app.config["BOOKING_RESPONSE_TIMEOUT_MINUTES"] = int(os.getenv("BOOKING_RESPONSE_TIMEOUT_MINUTES", 15))
+    app.config["DEADLINE_SWEEP_INTERVAL_SECONDS"] = int(os.getenv("DEADLINE_SWEEP_INTERVAL_SECONDS", 5))
+    app.config["DEADLINE_SWEEP_BATCH_SIZE"] = int(os.getenv("DEADLINE_SWEEP_BATCH_SIZE", 500))
+
+    # Delta sync holds watermarks this far behind the present, so late commits and replica lag aren't skipped
+    app.config["DELTA_SYNC_LAG_SECONDS"] = int(os.getenv("DELTA_SYNC_LAG_SECONDS", 5))
+
+    # Notification outbox relay: how often queued emails are handed to Celery, and how many per task
+    app.config["OUTBOX_RELAY_INTERVAL_SECONDS"] = int(os.getenv("OUTBOX_RELAY_INTERVAL_SECONDS", 2))
+    app.config["OUTBOX_RELAY_BATCH_SIZE"] = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", 500))
+
+    # Hospital and driver profile cache: "memory" (per process) or "redis" (shared)
+    app.config["PROFILE_CACHE_BACKEND"] = os.getenv("PROFILE_CACHE_BACKEND", "memory")
+    app.config["PROFILE_CACHE_REDIS_URL"] = os.getenv("PROFILE_CACHE_REDIS_URL", "redis://localhost:6379/1")
+    app.config["PROFILE_CACHE_TTL"] = int(os.getenv("PROFILE_CACHE_TTL", 300))
+    app.config["PROFILE_CACHE_SIZE"] = int(os.getenv("PROFILE_CACHE_SIZE", 10000))
+
+    # Number of web worker processes (the variable gunicorn reads). Per-process "memory" backends
+    # are refused for state every worker must share when there is more than one.
+    app.config["WEB_CONCURRENCY"] = int(os.getenv("WEB_CONCURRENCY", 1))
+
+    # Idempotency-Key responses: "redis" (shared by all workers) or "memory" (single worker only).
+    # Stored responses live for IDEMPOTENCY_TTL seconds, in-flight reservations for IDEMPOTENCY_LOCK_TTL.
+    app.config["IDEMPOTENCY_BACKEND"] = os.getenv("IDEMPOTENCY_BACKEND", "redis")
+    app.config["IDEMPOTENCY_REDIS_URL"] = os.getenv("IDEMPOTENCY_REDIS_URL", "redis://localhost:6379/2")
+    app.config["IDEMPOTENCY_TTL"] = int(os.getenv("IDEMPOTENCY_TTL", 86400))
+    app.config["IDEMPOTENCY_LOCK_TTL"] = int(os.getenv("IDEMPOTENCY_LOCK_TTL", 60))
+    app.config["IDEMPOTENCY_SIZE"] = int(os.getenv("IDEMPOTENCY_SIZE", 100000))
+
+    # Booking event streams: "memory" only reaches streams in the same process, use "redis" with several workers
+    app.config["EVENTS_BACKEND"] = os.getenv("EVENTS_BACKEND", "memory")
+    app.config["EVENTS_REDIS_URL"] = os.getenv("EVENTS_REDIS_URL", "redis://localhost:6379/3")
+    app.config["EVENTS_HEARTBEAT_SECONDS"] = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+    app.config["EVENTS_QUEUE_SIZE"] = int(os.getenv("EVENTS_QUEUE_SIZE", 100))
+
+    # Live driver locations: latest position per driver in a "redis" geo set shared by all workers, or
+    # "memory" (single worker only), ignored after LIVE_LOCATION_MAX_AGE_SECONDS; pings are buffered and
+    # written in batches
+    app.config["LIVE_LOCATION_BACKEND"] = os.getenv("LIVE_LOCATION_BACKEND", "redis")
+    app.config["LIVE_LOCATION_REDIS_URL"] = os.getenv("LIVE_LOCATION_REDIS_URL", "redis://localhost:6379/4")
+    app.config["LIVE_LOCATION_MAX_AGE_SECONDS"] = int(os.getenv("LIVE_LOCATION_MAX_AGE_SECONDS", 120))
+    app.config["LOCATION_SAMPLE_BUFFER_SIZE"] = int(os.getenv("LOCATION_SAMPLE_BUFFER_SIZE", 100000))
+    app.config["LOCATION_SAMPLE_FLUSH_INTERVAL_SECONDS"] = int(os.getenv("LOCATION_SAMPLE_FLUSH_INTERVAL_SECONDS", 5))
+    app.config["LOCATION_SAMPLE_FLUSH_BATCH_SIZE"] = int(os.getenv("LOCATION_SAMPLE_FLUSH_BATCH_SIZE", 1000))
+
+    # Dispatch availability index: kept in sync by this process, and rebuilt to pick up other workers' changes
+    app.config["DISPATCH_INDEX_REFRESH_SECONDS"] = int(os.getenv("DISPATCH_INDEX_REFRESH_SECONDS", 60))
+
+    # Password hashing: PBKDF2 rounds (overridable per role) and the process pool that runs them.
+    # The pool is per web worker, so keep PASSWORD_HASH_WORKERS x web workers within the cores
+    # the host can spare for logins. PASSWORD_HASH_WORKERS=0 hashes on the request thread.
+    app.config["PASSWORD_HASH_ROUNDS"] = int(os.getenv("PASSWORD_HASH_ROUNDS", 29000))
+    for role in PASSWORD_ROLES:
+        key = f"PASSWORD_HASH_ROUNDS_{role.upper()}"
+        app.config[key] = int(os.getenv(key, app.config["PASSWORD_HASH_ROUNDS"]))
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    app.config["PASSWORD_HASH_MAX_PENDING"] = int(os.getenv("PASSWORD_HASH_MAX_PENDING", app.config["PASSWORD_HASH_WORKERS"] * 4))
+    app.config["PASSWORD_HASH_TIMEOUT"] = int(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+
     app.config["CELERY_CONFIG"]={
      'broker_url': 'redis://localhost:6379/0',  # Broker (Redis or RabbitMQ)
      'result_backend': 'redis://localhost:6379/0'
@@ -49,8 +134,14 @@ def create_app():
 
     # Initialize SQLAlchemy
     db.init_app(app)
+    register_pool_metrics(app, db)
 
     mail.init_app(app)
+    init_profile_cache(app)
+    init_password_hasher(app)
+    init_idempotency_store(app)
+    init_event_bus(app)
+    init_driver_locations(app)
     print("Mail object:", mail)
     print("Mail instance initialized successfully!")
 
@@ -108,20 +199,6 @@ def create_app():
             "error": "authorization_required"
         }), 401
 
-    # Function to clean up expired tokens
-    def cleanup_expired_tokens():
-        with app.app_context():
-            print("called")
-            now = datetime.utcnow()
-            expired_tokens = TokenBlocklist.query.filter(TokenBlocklist.expires_at < now).all()
-            if expired_tokens:
-                print(f"Cleaning up {len(expired_tokens)} expired tokens...")
-                for token in expired_tokens:
-                    db.session.delete(token)
-                db.session.commit()
-            else:
-                print("No expired tokens to clean up.")
-
     # Register Blueprints
     api = Api(app)
     api.register_blueprint(UserBlp)
@@ -147,7 +224,69 @@ def create_app():
         print("Here")
         print("Database URI:", os.getenv("SQLALCHEMY_DATABASE_URI"))
         db.create_all()
-        scheduler.add_job(func=cleanup_expired_tokens, trigger="interval", hours=6)
+        upgrade_schema(db.engine, app.logger, app.config)  # Columns and indexes added to tables that already existed
+        preload_city_states()
+        rebuild_availability_index(app)
+        init_blocklist_cache(app)
+        scheduler.add_job(
+            func=cleanup_expired_tokens,
+            trigger="interval",
+            hours=6,
+            args=[app],
+            id="cleanup_expired_tokens",
+            replace_existing=True,
+        )
+        scheduler.add_job(
+            func=refresh_blocklist_cache,
+            trigger="interval",
+            seconds=app.config["BLOCKLIST_BLOOM_REFRESH_SECONDS"],
+            args=[app],
+            id="refresh_blocklist_cache",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        scheduler.add_job(
+            func=sweep_booking_deadlines,
+            trigger="interval",
+            seconds=app.config["DEADLINE_SWEEP_INTERVAL_SECONDS"],
+            args=[app],
+            id="sweep_booking_deadlines",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        scheduler.add_job(
+            func=relay_outbox,
+            trigger="interval",
+            seconds=app.config["OUTBOX_RELAY_INTERVAL_SECONDS"],
+            args=[app],
+            id="relay_outbox",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        scheduler.add_job(
+            func=flush_location_samples,
+            trigger="interval",
+            seconds=app.config["LOCATION_SAMPLE_FLUSH_INTERVAL_SECONDS"],
+            args=[app],
+            id="flush_location_samples",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        scheduler.add_job(
+            func=rebuild_availability_index,
+            trigger="interval",
+            seconds=app.config["DISPATCH_INDEX_REFRESH_SECONDS"],
+            args=[app],
+            id="rebuild_availability_index",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        start_scheduler()
         print("Scheduled Jobs after adding auto-reject:", scheduler.get_jobs())  # ✅ Print after scheduling
         
 
@@ -4,8 +4,9 @@ from flask.views import MethodView
 from flask_jwt_extended import  jwt_required, get_jwt_identity, get_jwt
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from project.db import db
-from project.schemas import AdminSchema, LoginSchema
+from project.schemas import AdminSchema, LoginSchema, PaginationSchema
 from project.services.logout import logout_logic
+from project.services import metrics
 from project.services.helper import *
 
 blp = Blueprint("Admins", __name__, description="Operations on admins")
@@ -59,9 +60,10 @@ class AdminList(MethodView):
 
 @blp.route("/api/admins/all")
 class AllAdmins(MethodView):
-    def get(self):
+    @blp.arguments(PaginationSchema, location="query")
+    def get(self, pagination):
         """Get all admins without any authentication."""
-        return get_all_item_logic(AdminModel, "admin")
+        return get_all_item_logic(AdminModel, "admin", pagination)
 
 @blp.route("/api/admins/login")
 class AdminLogin(MethodView):
@@ -80,3 +82,12 @@ class AdminLogout(MethodView):
     jti = get_jwt()["jti"]
     exp = get_jwt()["exp"]  # Token expiration timestamp
     return logout_logic(jti, exp)
+
+
+@blp.route("/api/admins/metrics")
+class AdminMetrics(MethodView):
+    @jwt_required()
+    def get(self):
+        """Get runtime metrics of the caches and background subsystems."""
+        check_admin_role()
+        return {"metrics": metrics.collect(), "message": "Metrics fetched successfully", "status": 200}, 200
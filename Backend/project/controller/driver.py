@@ -10,9 +10,11 @@ from passlib.hash import pbkdf2_sha256
 from project.services.driver import *
 from project.services.logout import logout_logic
 from project.services.helper import *
+from project.services.profile_cache import cached_profile
+from project.services.driver_locations import record_driver_locations
 
 from project.tables import DriverModel, ConnectRequestModel
-from project.schemas import DriverSchema, LoginSchema
+from project.schemas import DriverSchema, LoginSchema, PaginationSchema, LocationBatchSchema
 from project.db import db
 
 blp = Blueprint("Drivers", __name__, description="Operations on drivers")
@@ -65,8 +67,9 @@ class DriverList(MethodView):
 
 @blp.route("/api/drivers/all")
 class AllDrivers(MethodView):
-  def get(self):
-    return get_all_item_logic(DriverModel, "driver")
+  @blp.arguments(PaginationSchema, location="query")
+  def get(self, pagination):
+    return get_all_item_logic(DriverModel, "driver", pagination)
 
 @blp.route("/api/drivers/login")
 class DriverLogin(MethodView):
@@ -86,12 +89,23 @@ class DriverLogout(MethodView):
         return logout_logic(jti, exp)
 
 
+@blp.route("/api/drivers/location")
+class DriverLocation(MethodView):
+    @jwt_required()
+    @blp.arguments(LocationBatchSchema)
+    def post(self, location_data):
+      """Report a batch of GPS pings for the current driver."""
+      check_driver_role()
+      driver_id = int(get_jwt_identity())
+      return record_driver_locations(driver_id, location_data["pings"])
+
+
 @blp.route("/api/drivers/nearby-hospitals")
 class NearbyHospitals(MethodView):
     @jwt_required()
     def get(self):
       """Get hospitals within a 75 km range of the driver’s address."""
-      chck_driver_role()
+      check_driver_role()
       driver_id = get_jwt_identity()
       result = get_nearby_items(driver_id, 'hospital' ,radius_km=75)
       return {"hospitals": result, "status": 200, "message":"Hospitals fetched successfully"}, 200
@@ -143,7 +157,7 @@ class HospitalDrivers(MethodView):
         hospitals = DriverModel.query.get(driver_id).hospitals
         if not hospitals:
             return abort(404, message="No hospitals associated with the driver.")
-        hospitals = [hospital.to_dict() for hospital in hospitals]
+        hospitals = [cached_profile("hospital", hospital.id, hospital.to_dict) for hospital in hospitals]
         
         return {"hospitals":hospitals, "status": 200, "message":"Hospitals fetched successfully"}, 200
     
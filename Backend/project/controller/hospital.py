@@ -13,10 +13,13 @@ from passlib.hash import pbkdf2_sha256
 
 from project.tables import HospitalModel, ConnectRequestModel
 from project.db import db
-from project.schemas import HospitalSchema, LoginSchema
+from project.schemas import HospitalSchema, LoginSchema, PaginationSchema, OrderRequestFilterSchema
 from project.services.logout import logout_logic
 from project.services.helper import *
+from project.services.profile_cache import cached_profile
 from project.services.ambulanceBooking import *
+from project.services.idempotency import idempotent
+from project.services.events import event_bus, hospital_channel
 
 blp = Blueprint("Hospitals", __name__, description="Operations on hospitals")
 
@@ -72,23 +75,36 @@ class HospitalList(MethodView):
 
 @blp.route("/api/hospitals/all")
 class AllUsers(MethodView):
-    def get(self):
+    @blp.arguments(PaginationSchema, location="query")
+    def get(self, pagination):
         """Get all hospitals without any authentication."""
-        return get_all_item_logic(HospitalModel, "hospitals")
+        return get_all_item_logic(HospitalModel, "hospitals", pagination)
 
 @blp.route("/api/hospitals/order-requests/all", methods=["GET"])
 @jwt_required()
-def find_order_requests():
+@blp.arguments(OrderRequestFilterSchema, location="query")
+def find_order_requests(filters):
     """Retrieve order requests for the logged-in user"""
     user_id = get_jwt_identity()
     check_hospital_role()
-    return get_order_requests(user_id,"hospital")
+    return get_order_requests(user_id,"hospital", filters)
+
+
+# EventSource can't send headers, so the token may also be passed as ?jwt=
+@blp.route("/api/hospitals/order-requests/stream", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+def stream_order_requests():
+    """Stream booking request changes for the logged-in hospital as Server-Sent Events"""
+    hospital_id = get_jwt_identity()
+    check_hospital_role()
+    return event_bus.stream(hospital_channel(hospital_id))
 
 
 
 
 @blp.route("/api/hospitals/booking-response/<int:booking_id>", methods=["POST"])
 @jwt_required()
+@idempotent("booking-response")
 def handle_respond_to_booking(booking_id):
     """Step 1: Hospital responds with accepted/rejected."""
     hospital_id = get_jwt_identity()
@@ -184,7 +200,7 @@ class HospitalDrivers(MethodView):
         drivers = HospitalModel.query.get(hospital_id).drivers
         if not drivers:
             return abort(404, message="No drivers associated with the hospital.")
-        drivers = [{**driver.to_dict() , "status":driver.status} for driver in drivers]
+        drivers = [{**cached_profile("driver", driver.id, driver.to_dict) , "status":driver.status} for driver in drivers]
         return {"drivers":drivers, "status": 200, "message":"Drivers fetched successfully"}, 200
 
 @blp.route("/api/hospitals/remove-driver/<int:driver_id>")
@@ -10,10 +10,13 @@ from passlib.hash import pbkdf2_sha256
 
 from project.tables import UserModel
 from project.db import db
-from project.schemas import UserSchema, LoginSchema
+from project.schemas import UserSchema, LoginSchema, PaginationSchema, OrderRequestFilterSchema, DispatchQuerySchema, FanOutOrderRequestSchema
 from project.services.logout import logout_logic
 from project.services.helper import *
 from project.services.ambulanceBooking import *
+from project.services.idempotency import idempotent
+from project.services.events import event_bus, user_channel
+from project.services.dispatch import rank_hospitals_for_dispatch
 
 blp = Blueprint("Users", __name__, description="Operations on users")
 
@@ -68,13 +71,15 @@ class UserList(MethodView):
 
 @blp.route("/api/users/all")
 class AllUsers(MethodView):
-    def get(self):
+    @blp.arguments(PaginationSchema, location="query")
+    def get(self, pagination):
         """Get all users without any authentication."""
-        return get_all_item_logic(UserModel, "user")
+        return get_all_item_logic(UserModel, "user", pagination)
 
 @blp.route("/api/users/order-requests", methods=["POST"])
 @jwt_required()
 @blp.arguments(OrderRequestSchema)
+@idempotent("order-request")
 def handle_create_order_request(request_data):
     """Create a new ambulance booking request"""
     user_id = get_jwt_identity()  # Get logged-in user
@@ -82,14 +87,50 @@ def handle_create_order_request(request_data):
     return create_order_request(request_data,user_id)
 
 
+@blp.route("/api/users/order-requests/fan-out", methods=["POST"])
+@jwt_required()
+@blp.arguments(FanOutOrderRequestSchema)
+@idempotent("order-request-fan-out")
+def handle_create_fan_out_order_request(request_data):
+    """Send an ambulance booking request to the nearest hospitals at once; the first to accept gets it"""
+    user_id = get_jwt_identity()
+    check_user_role()
+    return create_fan_out_order_request(request_data, user_id)
+
+
+@blp.route("/api/users/dispatch", methods=["GET"])
+@jwt_required()
+@blp.arguments(DispatchQuerySchema, location="query")
+def find_dispatch_hospitals(query):
+    """Rank the nearest hospitals with an available ambulance of the requested type"""
+    check_user_role()
+    hospitals = rank_hospitals_for_dispatch(
+        query["latitude"], query["longitude"], query["ambulance_type"], query["radius_km"], query["limit"]
+    )
+    if not hospitals:
+        abort(404, message=f"No hospital with an available {query['ambulance_type']} ambulance within {query['radius_km']} km.")
+    return {"hospitals": hospitals, "message": "Hospitals ranked successfully", "status": 200}, 200
+
+
 @blp.route("/api/users/order-requests/all", methods=["GET"])
 @jwt_required()
-def find_order_requests():
+@blp.arguments(OrderRequestFilterSchema, location="query")
+def find_order_requests(filters):
     """Retrieve order requests for the logged-in user"""
     user_id = get_jwt_identity()
     check_user_role()
 
-    return get_order_requests(user_id,"user")
+    return get_order_requests(user_id,"user", filters)
+
+
+# EventSource can't send headers, so the token may also be passed as ?jwt=
+@blp.route("/api/users/order-requests/stream", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+def stream_order_requests():
+    """Stream booking request changes for the logged-in user as Server-Sent Events"""
+    user_id = get_jwt_identity()
+    check_user_role()
+    return event_bus.stream(user_channel(user_id))
 
 
 
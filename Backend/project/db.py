@@ -1,4 +1,78 @@
+from contextlib import contextmanager
+from functools import wraps
+import random
+
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Binds whose key starts with this prefix are read replicas of the primary database
+REPLICA_BIND_PREFIX = "replica"
+
+
+class RoutingSession(Session):
+    """
+    Sends queries made inside replica_reads() to a read replica.
+
+    Writes, locking reads and every query after the session has written go to
+    the primary, so a request always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if clause is not None and getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+        elif bind is None and self._use_replica(clause):
+            replicas = [
+                engine for key, engine in self._db.engines.items()
+                if key and key.startswith(REPLICA_BIND_PREFIX)
+            ]
+            if replicas:
+                return random.choice(replicas)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if not self.info.get("read_only") or self.info.get("wrote") or self._flushing:
+            return False
+        # SELECT ... FOR UPDATE must lock rows on the primary
+        return clause is None or getattr(clause, "_for_update_arg", None) is None
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def mark_session_wrote(session, flush_context):
+    session.info["wrote"] = True
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+@contextmanager
+def replica_reads():
+    """Route the reads made inside the block to a replica, if any is configured."""
+    info = db.session.info
+    previous = info.get("read_only", False)
+    info["read_only"] = True
+    try:
+        yield
+    finally:
+        info["read_only"] = previous
+
+
+@contextmanager
+def primary_reads():
+    """Send the reads made inside the block to the primary, even within replica_reads()."""
+    info = db.session.info
+    previous = info.get("read_only", False)
+    info["read_only"] = False
+    try:
+        yield
+    finally:
+        info["read_only"] = previous
 
-db = SQLAlchemy()
 
+def read_only(func):
+    """Decorator for service functions that only read, so they can be served by a replica."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return func(*args, **kwargs)
+    return wrapper
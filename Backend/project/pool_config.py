@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+from project.services import metrics
+
+
+class PoolStats:
+    """Counters for connection checkouts from the SQLAlchemy pool."""
+
+    def __init__(self, window=1024):
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.max_wait = 0.0
+        self._waits = deque(maxlen=window)  # Most recent checkout latencies, for percentiles
+        self._lock = threading.Lock()
+
+    def record_checkout(self, wait, overflow):
+        with self._lock:
+            self.checkouts += 1
+            if overflow:
+                self.overflow_checkouts += 1
+            self.max_wait = max(self.max_wait, wait)
+            self._waits.append(wait)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self._waits)
+        p50 = waits[len(waits) // 2] if waits else 0.0
+        p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0
+        return {
+            "checkouts": self.checkouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "timeouts": self.timeouts,
+            "checkout_latency_ms": {
+                "p50": round(p50 * 1000, 3),
+                "p99": round(p99 * 1000, 3),
+                "max": round(self.max_wait * 1000, 3)
+            }
+        }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._checkout = threading.local()
+
+    def _do_get(self):
+        checkout = self._checkout
+        if getattr(checkout, "active", False):
+            return super()._do_get()  # QueuePool retries by calling _do_get again
+        checkout.active, checkout.opened_overflow = True, False
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record_timeout()
+            raise
+        finally:
+            checkout.active = False
+        pool_stats.record_checkout(time.perf_counter() - start, overflow=checkout.opened_overflow)
+        return connection
+
+    def _inc_overflow(self):
+        # QueuePool's own counter, decided under its lock so concurrent checkouts
+        # can't misattribute each other's connections. It counts up from
+        # -pool_size as connections are opened, so past zero they are overflow.
+        with self._overflow_lock:
+            if self._max_overflow != -1 and self._overflow >= self._max_overflow:
+                return False
+            self._overflow += 1
+            self._checkout.opened_overflow = self._overflow > 0
+            return True
+
+
+def engine_options_from_env(database_uri):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* environment variables.
+
+    pool_recycle should stay below the server's wait_timeout so connections are
+    replaced before MySQL drops them; pre-ping catches the ones it dropped anyway.
+    SQLite keeps SQLAlchemy's defaults since it has no server-side pool to size.
+    """
+    if not database_uri or database_uri.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+
+
+def register_pool_metrics(app, db):
+    """Expose pool saturation and checkout counters through the metrics endpoint."""
+
+    def collect():
+        with app.app_context():
+            pool = db.engine.pool
+        stats = {"status": pool.status()}
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            stats.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "saturation": round(pool.checkedout() / capacity, 4) if capacity else None
+            })
+        stats.update(pool_stats.snapshot())
+        return stats
+
+    metrics.register("db_pool", collect)
@@ -12,5 +12,13 @@ jobstores = {
 # Scheduler setup
 scheduler = BackgroundScheduler(daemon=True)  # ✅ Ensures it runs in the background
 scheduler.configure(timezone=utc)
-        
-scheduler.start()
\ No newline at end of file
+
+
+def start_scheduler():
+    """
+    Start the scheduler once the app has added its jobs. Not started on import,
+    so processes that only import project, like the password hashing pool's,
+    don't run the periodic jobs too.
+    """
+    if not scheduler.running:
+        scheduler.start()
\ No newline at end of file
@@ -0,0 +1,202 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, bindparam, exists, inspect, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn
+
+from project.tables import (
+    HospitalModel, DriverModel, TokenBlocklist, BookingRequestModel, BookingModel, ConnectRequestModel
+)
+from project.services import geohash
+
+# db.create_all() only creates missing tables: it never adds columns or indexes
+# to tables that already exist. Schema changes to existing tables are therefore
+# written as migrations below, applied in order by upgrade_schema() at startup
+# and recorded in the schema_migrations table so each runs once per database.
+# Every step checks the live schema first, so on a database just created by
+# create_all() a migration only records itself.
+
+MIGRATIONS = []
+
+migrations_table = Table(
+    "schema_migrations", MetaData(),
+    Column("name", String(100), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def migration(name):
+    """Register a migration; names sort in the order they were added."""
+    def register(func):
+        MIGRATIONS.append((name, func))
+        return func
+    return register
+
+
+class SchemaChanges:
+    """Check-first schema operations for migrations, run on the migration's connection."""
+
+    def __init__(self, connection, logger, config=None):
+        self.connection = connection
+        self.logger = logger
+        self.config = config or {}
+
+    def _inspector(self):
+        return inspect(self.connection)
+
+    def add_column(self, column):
+        """Add a model column to its existing table; returns whether it was added."""
+        table = column.table
+        if column.name in {existing["name"] for existing in self._inspector().get_columns(table.name)}:
+            return False
+        if not column.nullable and column.server_default is None:
+            raise RuntimeError(f"Can't add NOT NULL column {table.name}.{column.name} without a server default")
+
+        dialect = self.connection.dialect
+        preparer = dialect.identifier_preparer
+        table_name = preparer.format_table(table)
+        self.connection.execute(text(
+            f"ALTER TABLE {table_name} ADD COLUMN {CreateColumn(column).compile(dialect=dialect)}"
+        ))
+        # SQLite can't add a constraint to an existing table; elsewhere keep the foreign key
+        if dialect.name != "sqlite":
+            for foreign_key in column.foreign_keys:
+                target = foreign_key.column
+                self.connection.execute(text(
+                    f"ALTER TABLE {table_name} ADD FOREIGN KEY ({preparer.quote(column.name)}) "
+                    f"REFERENCES {preparer.format_table(target.table)} ({preparer.quote(target.name)})"
+                ))
+        self.logger.info(f"Schema upgrade: added column {table.name}.{column.name}")
+        return True
+
+    def create_index(self, table, name):
+        """Create the model index `name` of `table` unless it exists; returns whether it was created."""
+        if name in {index["name"] for index in self._inspector().get_indexes(table.name)}:
+            return False
+        index = next(index for index in table.indexes if index.name == name)
+        index.create(self.connection)
+        self.logger.info(f"Schema upgrade: created index {name}")
+        return True
+
+
+def upgrade_schema(engine, logger, config=None):
+    """
+    Apply the migrations not yet recorded for this database, each in its own
+    transaction. `config` (the app config) supplies settings backfills depend on.
+    """
+    migrations_table.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(migrations_table.c.name)).scalars())
+
+    for name, func in MIGRATIONS:
+        if name in applied:
+            continue
+        try:
+            with engine.begin() as connection:
+                # Recorded first: a second worker starting at the same time
+                # fails here and leaves the migration to the first one
+                connection.execute(migrations_table.insert().values(name=name, applied_at=datetime.utcnow()))
+                func(SchemaChanges(connection, logger, config))
+        except IntegrityError:
+            logger.info(f"Schema upgrade: {name} was applied by another process")
+            continue
+        logger.info(f"Schema upgrade: applied {name}")
+
+
+@migration("0001_geohash")
+def add_geohash(schema, batch_size=1000):
+    """Geohash cells of hospital and driver addresses, backfilled for existing rows."""
+    for Model in (HospitalModel, DriverModel):
+        table = Model.__table__
+        schema.add_column(table.c.geohash)
+        schema.create_index(table, f"ix_{table.name}_geohash")
+
+        fill = update(table).where(table.c.id == bindparam("row_id")).values(geohash=bindparam("cell"))
+        while True:
+            rows = schema.connection.execute(
+                select(table.c.id, table.c.latitude, table.c.longitude)
+                .where(table.c.geohash.is_(None), table.c.latitude.isnot(None), table.c.longitude.isnot(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            schema.connection.execute(fill, [
+                {"row_id": row.id, "cell": geohash.encode(row.latitude, row.longitude)} for row in rows
+            ])
+
+
+@migration("0005_token_blocklist_created_at")
+def index_token_blocklist_created_at(schema):
+    """The blocklist Bloom filter reads the rows added since its last refresh."""
+    schema.create_index(TokenBlocklist.__table__, "ix_token_blocklist_created_at")
+
+
+@migration("0006_token_blocklist_expires_at")
+def index_token_blocklist_expires_at(schema):
+    """Expired-token cleanup selects its chunks through expires_at."""
+    schema.create_index(TokenBlocklist.__table__, "ix_token_blocklist_expires_at")
+
+
+@migration("0007_booking_deadlines")
+def add_booking_deadlines(schema, batch_size=1000):
+    """
+    Booking deadlines, backfilled for the bookings still waiting on a hospital:
+    pending ones from when they were created, accepted ones without booking
+    details from when they were accepted. Overdue ones are rejected by the
+    first sweep.
+    """
+    table = BookingRequestModel.__table__
+    schema.add_column(table.c.deadline_at)
+    schema.create_index(table, "ix_booking_requests_deadline_at")
+
+    window = timedelta(minutes=schema.config.get("BOOKING_RESPONSE_TIMEOUT_MINUTES", 15))
+    has_details = exists().where(BookingModel.__table__.c.request_id == table.c.id)
+    waiting = or_(table.c.status == "pending", (table.c.status == "accepted") & ~has_details)
+    fill = update(table).where(table.c.id == bindparam("row_id")).values(deadline_at=bindparam("deadline"))
+    while True:
+        rows = schema.connection.execute(
+            select(table.c.id, table.c.status, table.c.created_at, table.c.updated_at)
+            .where(table.c.deadline_at.is_(None), waiting)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        now = datetime.utcnow()
+        schema.connection.execute(fill, [
+            {
+                "row_id": row.id,
+                "deadline": ((row.created_at if row.status == "pending" else row.updated_at) or now) + window
+            }
+            for row in rows
+        ])
+        schema.logger.info(f"Schema upgrade: set deadlines on {len(rows)} waiting bookings")
+
+
+@migration("0012_booking_composite_indexes")
+def add_booking_composite_indexes(schema):
+    """Indexes behind the order request listings and the connection request checks."""
+    for name in ("ix_booking_requests_hospital_status_created", "ix_booking_requests_user_status_created"):
+        schema.create_index(BookingRequestModel.__table__, name)
+    for name in ("ix_connect_requests_driver_hospital_status", "ix_connect_requests_hospital_status"):
+        schema.create_index(ConnectRequestModel.__table__, name)
+
+
+@migration("0020_booking_version")
+def add_booking_version(schema):
+    """Row version checked by the conditional status updates; existing rows start at 0."""
+    schema.add_column(BookingRequestModel.__table__.c.version)
+
+
+@migration("0022_booking_updated_indexes")
+def add_booking_updated_indexes(schema):
+    """Indexes behind the since-watermark syncs, which walk a user's or hospital's requests by updated_at."""
+    for name in ("ix_booking_requests_hospital_updated", "ix_booking_requests_user_updated"):
+        schema.create_index(BookingRequestModel.__table__, name)
+
+
+@migration("0025_booking_group")
+def add_booking_group(schema):
+    """Fan-out offers point at their booking group; the booking_groups table itself comes from create_all()."""
+    table = BookingRequestModel.__table__
+    schema.add_column(table.c.group_id)
+    schema.create_index(table, "ix_booking_requests_group_id")
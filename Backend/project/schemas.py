@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
 from enum import Enum
 
 # ===================== User Schemas ===================== #
@@ -87,3 +87,48 @@ class AdminSchema(Schema):
 class LoginSchema(Schema):
     name = fields.Str(required=True)
     password = fields.Str(required=True)
+
+
+# ===================== Driver Location Schemas ===================== #
+class LocationPingSchema(Schema):
+    latitude = fields.Float(required=True, validate=validate.Range(min=-90, max=90))
+    longitude = fields.Float(required=True, validate=validate.Range(min=-180, max=180))
+    recorded_at = fields.DateTime(load_default=None)  # UTC; defaults to when the ping is received
+
+
+class LocationBatchSchema(Schema):
+    pings = fields.List(fields.Nested(LocationPingSchema), required=True, validate=validate.Length(min=1, max=500))
+
+
+class FanOutOrderRequestSchema(OrderRequestSchema):
+    # Sent to the nearest hospitals with a matching ambulance instead of one chosen hospital
+    hospital_id = fields.Int(load_default=None)
+    hospitals = fields.Int(load_default=3, validate=validate.Range(min=1, max=10))
+    radius_km = fields.Float(load_default=75, validate=validate.Range(min=1, max=500))
+
+
+# ===================== Dispatch Schemas ===================== #
+class DispatchQuerySchema(Schema):
+    latitude = fields.Float(required=True, validate=validate.Range(min=-90, max=90))
+    longitude = fields.Float(required=True, validate=validate.Range(min=-180, max=180))
+    ambulance_type = fields.Str(required=True, validate=lambda x: x in AmbulanceTypeEnum._value2member_map_)
+    radius_km = fields.Float(load_default=75, validate=validate.Range(min=1, max=500))
+    limit = fields.Int(load_default=5, validate=validate.Range(min=1, max=50))
+
+
+# ===================== Listing Schemas ===================== #
+class PaginationSchema(Schema):
+    # Opt-in: without a limit or cursor the whole list is returned
+    cursor = fields.Int(load_default=None)  # Id of the last item of the previous page
+    limit = fields.Int(load_default=None, validate=validate.Range(min=1, max=500))
+    format = fields.Str(load_default="json", validate=validate.OneOf(["json", "ndjson"]))
+
+
+class OrderRequestFilterSchema(Schema):
+    status = fields.Str(validate=validate.OneOf(["pending", "accepted", "rejected", "completed"]))
+    created_from = fields.DateTime()
+    created_to = fields.DateTime()
+    # Opt-in paging, newest first: without a limit or cursor every matching request is returned
+    cursor = fields.Int(load_default=None)  # Id of the last request of the previous page
+    limit = fields.Int(load_default=None, validate=validate.Range(min=1, max=500))
+    since = fields.Str()  # Watermark from the previous sync, or "0" for a full sync; not combined with status
@@ -1,6 +1,7 @@
 from project.tables import AmbulanceModel, BookingModel
 from project.db import db
 from project.services.driver import *
+from project.services.dispatch import availability_index
 
 from sqlalchemy.exc import SQLAlchemyError
 from flask_smorest import abort
@@ -45,6 +46,7 @@ def create_ambulance(ambulance_data):
     except SQLAlchemyError as e:
         db.session.rollback()
         abort(500, message=str(e))
+    availability_index.update_ambulance(ambulance.id, ambulance.hospital_id, ambulance.vehicle_type, ambulance.status)
     return ambulance
 
 def update_ambulance(ambulance, ambulance_data):
@@ -56,6 +58,7 @@ def update_ambulance(ambulance, ambulance_data):
     except SQLAlchemyError as e:
         db.session.rollback()
         abort(500, message=str(e))
+    availability_index.update_ambulance(ambulance.id, ambulance.hospital_id, ambulance.vehicle_type, ambulance.status)
     return ambulance
 
 def delete_ambulance(ambulance_id):
@@ -69,4 +72,5 @@ def delete_ambulance(ambulance_id):
     except SQLAlchemyError as e:
         db.session.rollback()
         abort(500, message=str(e))
+    availability_index.remove_ambulance(ambulance_id)
     return {"message": "Ambulance deleted successfully"}
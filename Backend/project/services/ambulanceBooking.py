@@ -1,18 +1,26 @@
 from flask_smorest import abort
+from sqlalchemy import select, or_, and_
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from flask import current_app
 
 from datetime import datetime, timedelta
 import random
 
-from project.db import db
+from project.db import db, read_only
 
-from project.tables import HospitalModel, BookingRequestModel,BookingModel,UserModel, OTPModel
+from project.tables import HospitalModel, BookingRequestModel,BookingModel,UserModel, OTPModel, BookingGroupModel
 from project.schemas import OrderRequestSchema, BookingSchema
-from project.services.helper import manage_address_field
-from project.services.tasks import send_email
+from project.services.helper import manage_address_field, DEFAULT_PAGE_SIZE
+from project.services.city_state import resolve_city_state
+from project.services.serializers import serialize_query
+from project.services.outbox import enqueue_email, enqueue_emails
+from project.services.deadlines import deadline_after, reject_due_bookings, DEADLINE_REASONS
+from project.services.booking_state import (
+    transition_booking, claim_booking_group, withdraw_group_offers, close_exhausted_groups, WITHDRAWN_REASON
+)
+from project.services.dispatch import rank_hospitals_for_dispatch
+from project.services.events import publish_booking_event
 
-from project.scheduler import scheduler
 from project.mail_config import mail
 
 from flask_mail import Message
@@ -22,31 +30,41 @@ from flask_mail import Message
 
 
 
+def booking_summary(id, user_id, hospital_id, status, reason_of_rejection=None):
+    """The fields of a booking event when the full booking was not loaded."""
+    return {
+        "id": id,
+        "user_id": user_id,
+        "hospital_id": hospital_id,
+        "status": status,
+        "reason_of_rejection": reason_of_rejection
+    }
+
+
 def create_order_request(request_data, user_id):
     """Create a new ambulance booking request"""
 
-    # Check if hospital exists
-    hospital = HospitalModel.query.get(request_data["hospital_id"])
+    # Check if hospital exists, loading only what the notification needs
+    hospital = db.session.execute(
+        select(HospitalModel.name, HospitalModel.email).where(HospitalModel.id == request_data["hospital_id"])
+    ).first()
     if not hospital:
         abort(404, message="Hospital not found.")
-    field = manage_address_field(request_data)
+    address = request_data["address"]
+    city_state = resolve_city_state(address)
+    field = manage_address_field(request_data, city_state)
     
-    # Create new order request
-    order_request = BookingRequestModel(
-        name=request_data["name"],
-        age=request_data["age"],
-        sex=request_data["sex"],
-        user_id=user_id,
-        hospital_id=request_data["hospital_id"],
-        ambulance_type=request_data["ambulance_type"],
-        status="pending",
-        created_at=datetime.utcnow(),
-        **field
-    )
+    # Create new order request. The JWT identity is a string, the column an integer
+    order_request = new_order_request(request_data, int(user_id), request_data["hospital_id"], field)
 
-    # Save to DB
+    # Save to DB: the request, its deadline and the email go out in one transaction.
+    # The response is built from the flushed object before commit expires it,
+    # so no extra SELECTs are needed to serialize it.
     try:
         db.session.add(order_request)
+        enqueue_email(hospital.email, "New Ambulance Booking Request", new_request_email(hospital.name, request_data, address))
+        db.session.flush()
+        order_request_data = order_request.to_dict(city_state=city_state)
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
@@ -55,45 +73,71 @@ def create_order_request(request_data, user_id):
         print("Exception:", str(e))
         db.session.rollback()
         abort(500, message="An error occurred while saving the order request.")
-        
-    # Send email to the hospital
-    try:
-        email_body = f"""
-        Dear {hospital.name},
-
-        You have received a new ambulance booking request.
-
-        Patient Name: {request_data["name"]}
-        Age: {request_data["age"]}
-        Sex: {request_data["sex"]}
-        Ambulance Type: {request_data["ambulance_type"]}
-        Pickup Address: {field["street"]}, {field['city_state'].city}, {field["city_state"].state}, {field['city_state'].postal_code}
+    publish_booking_event("booking.created", order_request_data)
+    
+    # Return response with patient details
+    return {
+        "message": "Order request created successfully.",
+        "data": {
+            "order_request": order_request_data,
+            "patient_details":{
+                "patientName": request_data["name"],
+                "patientAge": request_data["age"],
+                "patientSex": request_data["sex"],
+            }
+        },
+        "status": 201
+    }, 201
 
-        Please check your dashboard for more details.
 
-        Best Regards,
-        LifeLineGo Team
-        """
-        task = send_email.delay({"to_email":f"{hospital.email}", "subject":"New Ambulance Booking Request", "body":email_body})
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email: {str(e)}")
-    
-    # Schedule the auto-reject job synchronously with a reason
-    scheduler.add_job(
-        func=auto_reject_booking,
-        trigger="date",
-        run_date=datetime.utcnow() + timedelta(minutes=15),
-        args=[current_app._get_current_object(), order_request.id, "Hospital did not respond in time"],
-        id=f"auto_reject_{order_request.id}",
-        replace_existing=True,
+def create_fan_out_order_request(request_data, user_id):
+    """
+    Send a booking request to the nearest hospitals with an available ambulance
+    of the requested type at once. Each hospital gets its own offer; the first
+    to accept claims the booking and the other offers are withdrawn.
+    """
+    address = request_data["address"]
+    hospitals = rank_hospitals_for_dispatch(
+        address["latitude"], address["longitude"], request_data["ambulance_type"],
+        request_data["radius_km"], request_data["hospitals"]
     )
+    if not hospitals:
+        abort(404, message=f"No hospital with an available {request_data['ambulance_type']} ambulance nearby.")
+    city_state = resolve_city_state(address)
+    field = manage_address_field(request_data, city_state)
+    user_id = int(user_id)  # The JWT identity is a string, the column an integer
+    now = datetime.utcnow()
+
+    # The group, every offer, their deadlines and the emails go out in one transaction
+    try:
+        group = BookingGroupModel(user_id=user_id, status="open", created_at=now, updated_at=now)
+        db.session.add(group)
+        db.session.flush()
+        offers = []
+        for ranked in hospitals:
+            hospital = ranked["hospital"]
+            offers.append(new_order_request(request_data, user_id, hospital["id"], field, group_id=group.id))
+            enqueue_email(hospital["email"], "New Ambulance Booking Request", new_request_email(hospital["name"], request_data, address))
+        db.session.add_all(offers)
+        db.session.flush()
+        group_id = group.id
+        offers_data = [offer.to_dict(city_state=city_state) for offer in offers]
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        abort(400, message="Invalid data.")
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Failed to save the fan-out order request: {str(e)}")
+        abort(500, message="An error occurred while saving the order request.")
+    for offer_data in offers_data:
+        publish_booking_event("booking.created", offer_data)
 
-
-    # Return response with patient details
     return {
-        "message": "Order request created successfully.",
+        "message": f"Order request sent to {len(offers_data)} hospitals.",
         "data": {
-            "order_request": order_request.to_dict(),
+            "group_id": group_id,
+            "order_requests": offers_data,
             "patient_details":{
                 "patientName": request_data["name"],
                 "patientAge": request_data["age"],
@@ -104,6 +148,45 @@ def create_order_request(request_data, user_id):
     }, 201
 
 
+def new_order_request(request_data, user_id, hospital_id, field, group_id=None):
+    """Build a pending booking request for one hospital, with its response deadline."""
+    now = datetime.utcnow()
+    return BookingRequestModel(
+        name=request_data["name"],
+        age=request_data["age"],
+        sex=request_data["sex"],
+        user_id=user_id,
+        hospital_id=hospital_id,
+        ambulance_type=request_data["ambulance_type"],
+        status="pending",
+        created_at=now,
+        updated_at=now,
+        deadline_at=deadline_after(),
+        group_id=group_id,
+        **field
+    )
+
+
+def new_request_email(hospital_name, request_data, address):
+    """Body of the email telling a hospital about a new booking request."""
+    return f"""
+        Dear {hospital_name},
+
+        You have received a new ambulance booking request.
+
+        Patient Name: {request_data["name"]}
+        Age: {request_data["age"]}
+        Sex: {request_data["sex"]}
+        Ambulance Type: {request_data["ambulance_type"]}
+        Pickup Address: {address["street"]}, {address["city"]}, {address["state"]}, {address["postal_code"]}
+
+        Please check your dashboard for more details.
+
+        Best Regards,
+        LifeLineGo Team
+        """
+
+
 
 
 def respond_to_booking(data,booking_id,hospital_id):
@@ -123,6 +206,9 @@ def respond_to_booking(data,booking_id,hospital_id):
         abort(404, message="Booking request not found.")
 
     if booking.status != "pending":
+        if booking.reason_of_rejection == WITHDRAWN_REASON:
+            # A fan-out offer another hospital accepted first, same answer as losing the claim
+            abort(409, message="This booking request has already been accepted by another hospital.")
         abort(400, message="Booking has already been processed.")
     if str(booking.hospital_id) != hospital_id:
         abort(403, message="Access forbidden: Booking request not for this hospital.")
@@ -134,50 +220,52 @@ def respond_to_booking(data,booking_id,hospital_id):
         reason = data.get("reason")
         if not isinstance(reason, str):
             abort(400, message="Invalid reason.")
-        booking.reason_of_rejection = reason
-
-    booking.status = status
-    booking.updated_at = datetime.utcnow() # Update timestamp
 
-    db.session.commit()
-    
-    # Remove previous auto-reject job if hospital responded
-    job_id = f"auto_reject_{booking_id}"
-    job = scheduler.get_job(job_id)
-    if job:
-        scheduler.remove_job(job_id)
+    # The response deadline is replaced by a deadline for assigning details
+    # if accepted, or cancelled if rejected, in the same conditional update.
+    # Fails with 409 if the deadline sweep or another response got there first.
+    group_id = booking.group_id
+    withdrawn = []
+    if status == "accepted":
+        if group_id:
+            # A fan-out offer: claim the group first, so hospitals accepting at
+            # the same time lock the group before any offer and can't deadlock
+            claim_booking_group(booking)
+        transition_booking(booking, "pending", status="accepted", deadline_at=deadline_after())
+        if group_id:
+            withdrawn = withdraw_group_offers(booking)
     else:
-        print(f"No job with id {job_id} found.")
-    
+        transition_booking(booking, "pending", status="rejected", reason_of_rejection=reason, deadline_at=None)
+
     user_email = booking.user.email  
     
+    # Notify the user in the same commit as the response
     if status == "accepted":
       
-        send_email.delay({
-            "to_email" : user_email,
-            "subject" : "🚑 Booking Accepted - LifeLineGo",
-            "body" : "Your ambulance booking request has been accepted. The hospital will assign details soon."
-        })
-
-        # Schedule automatic rejection if no details provided in 10 minutes
-        scheduler.add_job(
-            func=auto_reject_booking,
-            trigger="date",
-            run_date=datetime.utcnow() + timedelta(minutes=15),
-            args=[current_app._get_current_object(), booking_id,"Hospital could not provide booking details in time" ],
-            id=f"auto_reject_{booking_id}",
-            replace_existing=True,
+        enqueue_email(
+            user_email,
+            "🚑 Booking Accepted - LifeLineGo",
+            "Your ambulance booking request has been accepted. The hospital will assign details soon."
         )
     
-    else:
-        send_email.delay({
-            "to_email" : user_email,
-            "subject" : "❌ Booking Rejected - LifeLineGo",
-            "body" : f"Your ambulance booking request has been rejected by the hospital. Please try again.\n Reason : {reason}"
-        })
+    elif not group_id:  # A fan-out user only hears back once every hospital declined
+        enqueue_email(
+            user_email,
+            "❌ Booking Rejected - LifeLineGo",
+            f"Your ambulance booking request has been rejected by the hospital. Please try again.\n Reason : {reason}"
+        )
 
+    db.session.commit()
+    booking_data = booking.to_dict()
+    publish_booking_event(f"booking.{status}", booking_data)
+    for offer_id, offer_hospital_id in withdrawn:
+        publish_booking_event("booking.withdrawn", booking_summary(
+            offer_id, booking_data["user_id"], offer_hospital_id, "rejected", WITHDRAWN_REASON
+        ))
+    if status == "rejected" and group_id:
+        notify_exhausted_groups([group_id])
 
-    return {"message": f"Booking request {status} successfully.", "data":booking.to_dict(),"status":200}, 200
+    return {"message": f"Booking request {status} successfully.", "data":booking_data,"status":200}, 200
 
 
 
@@ -203,6 +291,10 @@ def assign_booking_details(data, booking_request_id, hospital_id):
     # Generate a 6-digit OTP
     otp_code = random.randint(100000, 999999)
 
+    # Clear the details deadline, unless the sweep already rejected the booking
+    transition_booking(booking_request, "accepted", deadline_at=None)
+    event = booking_summary(booking_request.id, booking_request.user_id, booking_request.hospital_id, "accepted")
+
     try:
         # Create Booking Entry
         booking = BookingModel(
@@ -217,6 +309,21 @@ def assign_booking_details(data, booking_request_id, hospital_id):
         )
 
         db.session.add(booking)
+
+        # Notify user via email
+        enqueue_email(
+            booking_request.user.email,
+            "✅ Booking Confirmed - LifeLineGo",
+            f"Your ambulance and driver have been assigned.\n\n"
+            f"🚑 **Ambulance Details**:\n"
+            f"• Vehicle Number: {data['ambulance']['vehicle_number']}\n"
+            f"• Type: {data['ambulance']['vehicle_type']}\n\n"
+            f"👨‍⚕️ **Driver Details**:\n"
+            f"• Name: {data['driver']['name']}\n"
+            f"• Phone: {data['driver']['phone']}\n\n"
+            f"🔑 **Your OTP for booking verification:** {otp_code}\n\n"
+            f"Use this OTP to confirm the completion of your booking."
+        )
         db.session.commit()  # Commit everything in one transaction
     except IntegrityError as e:
         db.session.rollback()
@@ -227,74 +334,181 @@ def assign_booking_details(data, booking_request_id, hospital_id):
         print("Exception:", str(e))
         abort(500, message="An error occurred while assigning booking details.")
 
-    
 
-    # Remove auto-reject scheduler
-    try:
-        scheduler.remove_job(f"auto_reject_{booking_request_id}")
-    except Exception:
-        current_app.logger.info(f"No auto-reject job found for booking request {booking_request_id}")
-
-    # Get user details
-    user_email = booking_request.user.email
-    user_phone = booking_request.user.phone  # Assuming phone number is stored
-
-    # Notify user via email
-    send_email.delay({
-        "to_email" : user_email,
-        "subject" : "✅ Booking Confirmed - LifeLineGo",
-        "body" : f"Your ambulance and driver have been assigned.\n\n"
-        f"🚑 **Ambulance Details**:\n"
-        f"• Vehicle Number: {data['ambulance']['vehicle_number']}\n"
-        f"• Type: {data['ambulance']['vehicle_type']}\n\n"
-        f"👨‍⚕️ **Driver Details**:\n"
-        f"• Name: {data['driver']['name']}\n"
-        f"• Phone: {data['driver']['phone']}\n\n"
-        f"🔑 **Your OTP for booking verification:** {otp_code}\n\n"
-        f"Use this OTP to confirm the completion of your booking."
-    })
+    publish_booking_event("booking.details_assigned", event)
 
     return {"message": "Booking details assigned successfully. OTP sent via email "}, 200
 
 
 
-def get_order_requests(id,role):
-    """Retrieve order requests for the logged-in user or hospital."""
+def order_requests_query(id, role, filters):
+    """The order requests of a user or hospital, narrowed by the listing filters."""
+    if role == "user":
+        query = BookingRequestModel.query.filter_by(user_id=id)
+    else:  # role == "hospital"
+        query = BookingRequestModel.query.filter_by(hospital_id=id)
+
+    if filters.get("status"):
+        query = query.filter(BookingRequestModel.status == filters["status"])
+    if filters.get("created_from"):
+        query = query.filter(BookingRequestModel.created_at >= filters["created_from"])
+    if filters.get("created_to"):
+        query = query.filter(BookingRequestModel.created_at <= filters["created_to"])
+    return query
+
+
+def order_requests_page_query(query, cursor=None, limit=None):
+    """Newest first; a page continues below the id of the previous page's last request."""
+    if cursor is not None:
+        query = query.filter(BookingRequestModel.id < cursor)
+    query = query.order_by(BookingRequestModel.id.desc())
+    return query if limit is None else query.limit(limit)
+
+
+@read_only
+def get_order_requests(id,role, filters=None):
+    """
+    Retrieve the order requests of the logged-in user or hospital, newest first.
+    Paging is opt-in: only a `limit` or `cursor` returns a page, otherwise every
+    matching request is returned.
+    """
     if role not in ["user", "hospital"]:
         abort(403, message="Access forbidden: Only users and hospitals can retrieve order requests.")
+    filters = filters or {}
+    if filters.get("since") is not None:
+        # A request that changes status leaves a status-filtered sync, which would never hear of it
+        if filters.get("status"):
+            abort(400, message="A since sync returns every changed request and can't be filtered by status.")
+        query = order_requests_query(id, role, filters)
+        return get_changed_order_requests(query, filters["since"], filters.get("limit") or DEFAULT_PAGE_SIZE)
+
+    query = order_requests_query(id, role, filters)
+
+    cursor, limit = filters.get("cursor"), filters.get("limit")
+    if limit is None and cursor is None:
+        order_requests = serialize_query(order_requests_page_query(query), BookingRequestModel)
+        next_cursor = None
+    else:
+        limit = limit or DEFAULT_PAGE_SIZE
+        # Fetch one extra row to know whether another page follows
+        order_requests = serialize_query(order_requests_page_query(query, cursor, limit + 1), BookingRequestModel)
+        next_cursor = order_requests[limit - 1]["id"] if len(order_requests) > limit else None
+        order_requests = order_requests[:limit]
 
-    if role == "user":
-        order_requests = BookingRequestModel.query.filter_by(user_id=id).all()
-    else:  # role == "hospital"
-        order_requests = BookingRequestModel.query.filter_by(hospital_id=id).all()
+    if not order_requests:
+        return {"message": "No order requests found.", "data": [], "next_cursor": None}, 200
 
+    return {
+        "message": "Order requests retrieved successfully.",
+        "data": order_requests,
+        "next_cursor": next_cursor,
+    }, 200
 
 
-    if not order_requests:
-        return {"message": "No order requests found.", "data": []}, 200
+
+def _parse_watermark(watermark):
+    """Split a "<updated_at>,<id>" watermark; "0" starts from the beginning."""
+    if watermark == "0":
+        return None
+    try:
+        updated_at, id = watermark.rsplit(",", 1)
+        return datetime.fromisoformat(updated_at), int(id)
+    except ValueError:
+        abort(400, message="Invalid since watermark.")
+
+
+def get_changed_order_requests(query, since, limit):
+    """
+    Return the requests of `query` created or changed after the `since` watermark, in change order.
+
+    The watermark is the (updated_at, id) of the last request returned. It is
+    held back to DELTA_SYNC_LAG_SECONDS ago, so requests whose commit or
+    replication lands a little after their updated_at are sent again on the
+    next sync instead of being skipped; clients merge them by id.
+    """
+    start = _parse_watermark(since)
+    if start:
+        updated_at, id = start
+        query = query.filter(or_(
+            BookingRequestModel.updated_at > updated_at,
+            and_(BookingRequestModel.updated_at == updated_at, BookingRequestModel.id > id)
+        ))
+
+    query = query.order_by(BookingRequestModel.updated_at, BookingRequestModel.id).limit(limit + 1)
+    order_requests = serialize_query(query, BookingRequestModel)
+    has_more = len(order_requests) > limit
+    order_requests = order_requests[:limit]
+
+    watermark = since
+    if order_requests:
+        last = order_requests[-1]
+        watermark = f"{last['updated_at']},{last['id']}"
+        settled = datetime.utcnow() - timedelta(seconds=current_app.config.get("DELTA_SYNC_LAG_SECONDS", 5))
+        # A full page must advance, or a burst of recent changes would be returned forever
+        if not has_more and datetime.fromisoformat(last["updated_at"]) > settled and (not start or start[0] < settled):
+            watermark = f"{settled.isoformat()},0"
 
     return {
         "message": "Order requests retrieved successfully.",
-        "data": [order.to_dict() for order in order_requests],
+        "data": order_requests,
+        "watermark": watermark,
+        "has_more": has_more,
     }, 200
 
 
+def notify_exhausted_groups(group_ids):
+    """
+    Close the fan-out groups whose offers were all declined or expired and tell
+    their users, in a transaction of its own: the offers must already be
+    committed, so this never holds offer rows while waiting on a group row.
+    """
+    groups = close_exhausted_groups(group_ids)
+    if groups:
+        user_emails = dict(
+            db.session.query(UserModel.id, UserModel.email)
+            .filter(UserModel.id.in_({group.user_id for group in groups}))
+        )
+        enqueue_emails([{
+            "to_email": user_emails[group.user_id],
+            "subject": "❌ Booking Rejected - LifeLineGo",
+            "body": "None of the nearby hospitals could accept your ambulance booking request. Please try again."
+        } for group in groups if group.user_id in user_emails])
+    db.session.commit()
 
-def auto_reject_booking(app, booking_id, reason):
-    """Automatically reject the booking if details aren’t provided in 15 minutes."""
-    with app.app_context():
-        print("called scheduler")
-        booking = BookingRequestModel.query.get(booking_id)
-        if booking and booking.status in ["accepted", "pending"]:
-            booking.status = "rejected"
-            db.session.commit()
-            
-            # Fetch user email
-            user_email = booking.user.email  
 
-            # Send rejection email with reason
-            send_email.delay({
-                "to_email": user_email,
+def sweep_booking_deadlines(app, batch_size=None):
+    """Reject every booking whose deadline has passed, one bulk UPDATE per batch."""
+    with app.app_context():
+        batch_size = batch_size or app.config.get("DEADLINE_SWEEP_BATCH_SIZE", 500)
+        now = datetime.utcnow()
+        rejected = 0
+        while True:
+            rows = reject_due_bookings(now, limit=batch_size)
+            if not rows:
+                break
+            # Expired fan-out offers are reported per group once all of them ran out
+            offer_expired = lambda group_id, reason: group_id is not None and reason == DEADLINE_REASONS["pending"]
+            expired_offers = {group_id for _, _, _, group_id, reason in rows if offer_expired(group_id, reason)}
+            notified = [row for row in rows if not offer_expired(row[3], row[4])]
+            user_emails = dict(
+                db.session.query(UserModel.id, UserModel.email)
+                .filter(UserModel.id.in_({user_id for _, user_id, _, _, _ in notified}))
+            ) if notified else {}
+
+            # Queue all rejection emails of the batch in the same transaction
+            enqueue_emails([{
+                "to_email": user_emails[user_id],
                 "subject": "❌ Booking Auto-Rejected - LifeLineGo",
                 "body": f"Your booking has been automatically rejected. Reason: {reason}"
-            })
+            } for _, user_id, _, _, reason in notified if user_id in user_emails])
+            db.session.commit()
+            for booking_id, user_id, hospital_id, _, reason in rows:
+                publish_booking_event("booking.rejected", booking_summary(
+                    booking_id, user_id, hospital_id, "rejected", reason
+                ))
+            notify_exhausted_groups(expired_offers)
+            rejected += len(rows)
+
+            if len(rows) < batch_size:
+                break
+        return rejected
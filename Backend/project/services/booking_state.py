@@ -0,0 +1,135 @@
+from datetime import datetime
+
+from flask_smorest import abort
+from sqlalchemy import select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from project.db import db
+from project.tables import BookingRequestModel, BookingGroupModel
+
+# Booking request status changes go through conditional UPDATEs instead of
+# read-check-write on the ORM object. Each transition only applies if the row
+# still has the status and version it was read with, so a hospital response,
+# a details assignment and the deadline sweep can race without row locks and
+# exactly one of them wins; the others get a 409.
+
+# Status a booking may move to from each status. "accepted" -> "accepted" is
+# the details assignment, which keeps the status but clears the deadline.
+BOOKING_TRANSITIONS = {
+    "pending": ("accepted", "rejected"),
+    "accepted": ("accepted", "rejected", "completed"),
+}
+
+
+def transition_booking(booking, expected_status, **values):
+    """
+    Move a loaded booking out of `expected_status`, setting `values` on the row.
+
+    The UPDATE matches on the booking's status and version and bumps the
+    version; the caller commits. Aborts with 409 if the booking changed since
+    it was read. On success the loaded object reflects the new values.
+    """
+    new_status = values.setdefault("status", expected_status)
+    if new_status not in BOOKING_TRANSITIONS.get(expected_status, ()):
+        raise ValueError(f"Invalid booking transition {expected_status} -> {new_status}")
+    values.setdefault("updated_at", datetime.utcnow())
+
+    result = db.session.execute(
+        update(BookingRequestModel)
+        .where(
+            BookingRequestModel.id == booking.id,
+            BookingRequestModel.status == expected_status,
+            BookingRequestModel.version == booking.version,
+        )
+        .values(version=BookingRequestModel.version + 1, **values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        abort(409, message="Booking request was updated by another request. Please reload it and try again.")
+
+    # Mirror the update on the object without making it dirty
+    for key, value in values.items():
+        set_committed_value(booking, key, value)
+    set_committed_value(booking, "version", booking.version + 1)
+
+
+# Fan-out bookings: one offer per hospital, all in the same group. Claiming the
+# group is a conditional UPDATE too, so when several hospitals accept at once
+# exactly one claim succeeds and the others get a 409.
+
+WITHDRAWN_REASON = "Accepted by another hospital"
+
+
+def claim_booking_group(booking):
+    """Claim the group of an offer being accepted; the caller commits. Aborts with 409 if it was already claimed."""
+    result = db.session.execute(
+        update(BookingGroupModel)
+        .where(BookingGroupModel.id == booking.group_id, BookingGroupModel.status == "open")
+        .values(status="claimed", accepted_request_id=booking.id, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        abort(409, message="This booking request has already been accepted by another hospital.")
+
+
+def withdraw_group_offers(booking):
+    """
+    Withdraw the other pending offers of the booking's group and cancel their
+    deadlines; the caller commits. Returns (id, hospital_id) of the withdrawn offers.
+    """
+    pending = (
+        (BookingRequestModel.group_id == booking.group_id)
+        & (BookingRequestModel.id != booking.id)
+        & (BookingRequestModel.status == "pending")
+    )
+    statement = (
+        update(BookingRequestModel)
+        .where(pending)
+        .values(
+            status="rejected", reason_of_rejection=WITHDRAWN_REASON, deadline_at=None,
+            updated_at=datetime.utcnow(), version=BookingRequestModel.version + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if db.engine.dialect.update_returning:
+        return db.session.execute(statement.returning(BookingRequestModel.id, BookingRequestModel.hospital_id)).all()
+    offers = db.session.query(BookingRequestModel.id, BookingRequestModel.hospital_id).filter(pending).with_for_update().all()
+    db.session.execute(statement.where(BookingRequestModel.id.in_([offer.id for offer in offers])))
+    return offers
+
+
+def close_exhausted_groups(group_ids):
+    """
+    Mark open groups with no pending or accepted offer left as exhausted; the
+    caller commits. Returns (id, user_id) of the groups this call closed, so
+    when two transactions race to close a group only one of them reports it.
+    """
+    if not group_ids:
+        return []
+    live_offer = (
+        select(BookingRequestModel.id)
+        .where(
+            BookingRequestModel.group_id == BookingGroupModel.id,
+            BookingRequestModel.status.in_(["pending", "accepted"])
+        )
+        .exists()
+    )
+    exhausted = (BookingGroupModel.id.in_(set(group_ids)), BookingGroupModel.status == "open", ~live_offer)
+    statement = (
+        update(BookingGroupModel)
+        .where(*exhausted)
+        .values(status="exhausted", updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if db.engine.dialect.update_returning:
+        return db.session.execute(statement.returning(BookingGroupModel.id, BookingGroupModel.user_id)).all()
+
+    # Without RETURNING (MySQL), close the candidates one at a time and keep
+    # the ones whose UPDATE changed the row
+    candidates = db.session.query(BookingGroupModel.id, BookingGroupModel.user_id).filter(*exhausted).all()
+    return [
+        group for group in candidates
+        if db.session.execute(statement.where(BookingGroupModel.id == group.id)).rowcount == 1
+    ]
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# In-process caching primitives shared by the services.
+
+
+class LRUCache:
+    """A thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter over strings.
+
+    Membership tests never give false negatives; false positives happen at
+    roughly `error_rate` once `capacity` items have been added.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        # Double hashing: derive every probe position from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        """Add `item`; returns False if it was (probably) already present."""
+        added = False
+        with self._lock:
+            for position in self._positions(item):
+                mask = 1 << (position & 7)
+                if not self._bits[position >> 3] & mask:
+                    self._bits[position >> 3] |= mask
+                    added = True
+            if added:
+                self.count += 1
+        return added
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def stats(self):
+        return {"items": self.count, "capacity": self.capacity, "bits": self.size, "hashes": self.hash_count}
+
+
+# Pluggable key-value backends. Values must be JSON-serializable so the same
+# callers work with the in-process backend and with Redis shared by all workers.
+
+class MemoryBackend:
+    """Key-value backend kept in this process, bounded by an LRU."""
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._cache.set(key, value, ttl=ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    def add(self, key, value, ttl=None):
+        """Set the key only if it is absent; returns whether it was set."""
+        with self._lock:
+            if self._cache.get(key) is not None:
+                return False
+            self._cache.set(key, value, ttl=ttl)
+            return True
+
+    def incr(self, key):
+        with self._lock:
+            value = (self._cache.get(key) or 0) + 1
+            self._cache.set(key, value, ttl=0)  # Counters never expire
+            return value
+
+
+class RedisBackend:
+    """Key-value backend in Redis, shared by every worker process."""
+
+    def __init__(self, url, ttl=None):
+        import redis
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.set(key, json.dumps(value), ex=ttl or self.ttl)
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def add(self, key, value, ttl=None):
+        """Set the key only if it is absent; returns whether it was set."""
+        return bool(self._client.set(key, json.dumps(value), ex=ttl or self.ttl, nx=True))
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+
+def require_shared_backend(config, prefix):
+    """
+    Refuse a per-process `{prefix}_BACKEND` for state every web worker must see,
+    when WEB_CONCURRENCY says there is more than one worker.
+    """
+    workers = config.get("WEB_CONCURRENCY", 1)
+    if config.get(f"{prefix}_BACKEND") == "memory" and workers > 1:
+        raise RuntimeError(
+            f"{prefix}_BACKEND=memory is per process and can't be shared by {workers} web workers; use redis"
+        )
+
+
+def backend_from_config(config, prefix, shared=False):
+    """
+    Build the backend selected by the `{prefix}_BACKEND` setting ("memory" or "redis").
+    With `shared`, the data must be the same in every web worker, see require_shared_backend().
+    """
+    if shared:
+        require_shared_backend(config, prefix)
+    ttl = config.get(f"{prefix}_TTL")
+    if config.get(f"{prefix}_BACKEND", "memory") == "redis":
+        return RedisBackend(config[f"{prefix}_REDIS_URL"], ttl=ttl)
+    return MemoryBackend(maxsize=config.get(f"{prefix}_SIZE", 10000), ttl=ttl)
@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from project.db import db
+from project.tables import CityStateModel
+
+# Postal codes interned in process memory. City/state rows are never updated
+# or deleted, so once a postal code is resolved its row can be reused for the
+# life of the process and address writes skip the CityStateModel lookup.
+
+CityState = namedtuple("CityState", ["id", "city", "state", "postal_code"])
+
+_city_states = {}
+
+
+def preload_city_states():
+    """Load every known postal code into the cache (needs an app context)."""
+    rows = db.session.query(
+        CityStateModel.id, CityStateModel.city, CityStateModel.state, CityStateModel.postal_code
+    )
+    for row in rows.yield_per(1000):
+        _city_states[row.postal_code] = CityState(*row)
+
+
+def resolve_city_state(address):
+    """Return the CityState for the address's postal code, creating the row if it is new."""
+    city_state = _city_states.get(address["postal_code"])
+    if city_state is None:
+        city_state = _upsert(address)
+        _city_states[city_state.postal_code] = city_state
+    return city_state
+
+
+def _insert_ignoring_duplicates(connection, values):
+    table = CityStateModel.__table__
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        connection.execute(insert(table).values(**values).on_conflict_do_nothing(index_elements=["postal_code"]))
+    elif dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table).values(**values)
+        connection.execute(statement.on_duplicate_key_update(postal_code=statement.inserted.postal_code))
+    else:
+        try:
+            with connection.begin_nested():
+                connection.execute(table.insert().values(**values))
+        except IntegrityError:
+            pass  # Created concurrently by another request
+
+
+def _upsert(address):
+    """
+    Insert the postal code if missing and return its row.
+
+    This runs in its own short transaction on the primary, so two requests
+    creating the same new postal code both succeed, and the row stays valid
+    even if the caller's own transaction is rolled back afterwards.
+    """
+    values = {"city": address["city"], "state": address["state"], "postal_code": address["postal_code"]}
+    with db.engine.begin() as connection:
+        _insert_ignoring_duplicates(connection, values)
+        row = connection.execute(
+            select(CityStateModel.id, CityStateModel.city, CityStateModel.state, CityStateModel.postal_code)
+            .where(CityStateModel.postal_code == values["postal_code"])
+        ).one()
+    return CityState(*row)
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, update
+
+from project.db import db
+from project.tables import BookingRequestModel
+
+# Booking timeouts are stored in the indexed booking_requests.deadline_at column
+# instead of one scheduler job per booking. The index acts as a min-heap of
+# pending deadlines: registering or cancelling a deadline is a column write in
+# the same conditional UPDATE as the status change (services/booking_state.py),
+# and a periodic sweep pops every due deadline in id batches.
+
+# Why an overdue booking is rejected, by the status it was left in
+DEADLINE_REASONS = {
+    "pending": "Hospital did not respond in time",
+    "accepted": "Hospital could not provide booking details in time",
+}
+
+
+def deadline_after(minutes=None):
+    """Return the deadline for a booking that must be handled within `minutes`."""
+    if minutes is None:
+        minutes = current_app.config.get("BOOKING_RESPONSE_TIMEOUT_MINUTES", 15)
+    return datetime.utcnow() + timedelta(minutes=minutes)
+
+
+def reject_due_bookings(now=None, limit=500):
+    """
+    Reject up to `limit` overdue bookings with a single UPDATE; the caller commits.
+
+    Returns (id, user_id, hospital_id, group_id, reason) rows for the rejected bookings. Where the
+    database supports UPDATE ... RETURNING the rows come back from the update
+    itself; otherwise (MySQL) the due rows are first locked with
+    SELECT ... FOR UPDATE SKIP LOCKED so concurrent sweepers never claim the
+    same booking.
+    """
+    now = now or datetime.utcnow()
+    due = (
+        (BookingRequestModel.deadline_at <= now)
+        & BookingRequestModel.status.in_(list(DEADLINE_REASONS))
+    )
+    # The reason is computed before status is overwritten, since MySQL
+    # evaluates SET assignments left to right
+    values = (
+        (BookingRequestModel.reason_of_rejection, case(DEADLINE_REASONS, value=BookingRequestModel.status)),
+        (BookingRequestModel.status, "rejected"),
+        (BookingRequestModel.deadline_at, None),
+        (BookingRequestModel.updated_at, now),
+        (BookingRequestModel.version, BookingRequestModel.version + 1),
+    )
+
+    if db.engine.dialect.update_returning:
+        due_ids = (
+            db.session.query(BookingRequestModel.id)
+            .filter(due)
+            .order_by(BookingRequestModel.deadline_at)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        statement = (
+            update(BookingRequestModel)
+            .where(BookingRequestModel.id.in_(due_ids), due)
+            .ordered_values(*values)
+            .returning(
+                BookingRequestModel.id, BookingRequestModel.user_id, BookingRequestModel.hospital_id,
+                BookingRequestModel.group_id, BookingRequestModel.reason_of_rejection
+            )
+        )
+        return db.session.execute(statement).all()
+
+    rows = (
+        db.session.query(
+            BookingRequestModel.id, BookingRequestModel.user_id, BookingRequestModel.hospital_id,
+            BookingRequestModel.group_id, BookingRequestModel.status
+        )
+        .filter(due)
+        .order_by(BookingRequestModel.deadline_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if rows:
+        db.session.execute(
+            update(BookingRequestModel)
+            .where(BookingRequestModel.id.in_([row.id for row in rows]))
+            .ordered_values(*values)
+        )
+    return [(row.id, row.user_id, row.hospital_id, row.group_id, DEADLINE_REASONS[row.status]) for row in rows]
@@ -0,0 +1,182 @@
+import threading
+
+import numpy as np
+
+from project.db import db
+from project.tables import AmbulanceModel, HospitalModel
+from project.services.distance import nearest_within
+from project.services.profile_cache import cached_profile
+from project.services import metrics
+
+# Availability index for dispatch ranking: for each ambulance type, how many
+# ambulances of that type each hospital has available, plus the hospitals'
+# coordinates. The ambulance service functions update it as ambulances are
+# created, changed and deleted, and a periodic rebuild from the database picks
+# up changes made by other worker processes. Changes recorded here while a
+# rebuild reads the database are applied again on top of what it read, so a
+# snapshot taken before them can't undo them. Ranking a pickup point is then
+# one vectorized distance pass over the hospitals that have a matching ambulance.
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._ambulances = {}  # ambulance id -> (hospital id, type, available)
+        self._available = {}  # type -> {hospital id: available ambulances}
+        self._hospitals = {}  # hospital id -> (latitude, longitude)
+        self._arrays = {}  # type -> (hospital ids, latitudes, longitudes), built on demand
+        self.rebuilds = 0
+        self._generation = 0  # Of the latest rebuild started
+        self._changes = None  # Changes made since it started, None when no rebuild is running
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _type_key(ambulance_type):
+        return (ambulance_type or "").strip().lower()
+
+    def _add(self, ambulance_id, hospital_id, ambulance_type, available):
+        self._ambulances[ambulance_id] = (hospital_id, ambulance_type, available)
+        if available:
+            counts = self._available.setdefault(ambulance_type, {})
+            counts[hospital_id] = counts.get(hospital_id, 0) + 1
+            self._arrays.pop(ambulance_type, None)
+
+    def _remove(self, ambulance_id):
+        entry = self._ambulances.pop(ambulance_id, None)
+        if entry is None:
+            return
+        hospital_id, ambulance_type, available = entry
+        if available:
+            counts = self._available[ambulance_type]
+            counts[hospital_id] -= 1
+            if not counts[hospital_id]:
+                del counts[hospital_id]
+            self._arrays.pop(ambulance_type, None)
+
+    def _update_ambulance(self, ambulance_id, hospital_id, ambulance_type, status):
+        self._remove(ambulance_id)
+        self._add(ambulance_id, hospital_id, self._type_key(ambulance_type), status == "available")
+
+    def _move_hospital(self, hospital_id, latitude, longitude):
+        self._hospitals[hospital_id] = (latitude, longitude)
+        self._arrays.clear()
+
+    def _remove_hospital(self, hospital_id):
+        self._hospitals.pop(hospital_id, None)
+        self._arrays.clear()
+
+    def _change(self, apply, *args):
+        with self._lock:
+            apply(*args)
+            if self._changes is not None:
+                self._changes.append((apply, args))
+
+    def update_ambulance(self, ambulance_id, hospital_id, ambulance_type, status):
+        """Record an ambulance's current hospital, type and status."""
+        self._change(self._update_ambulance, ambulance_id, hospital_id, ambulance_type, status)
+
+    def remove_ambulance(self, ambulance_id):
+        self._change(self._remove, ambulance_id)
+
+    def move_hospital(self, hospital_id, latitude, longitude):
+        self._change(self._move_hospital, hospital_id, latitude, longitude)
+
+    def remove_hospital(self, hospital_id):
+        self._change(self._remove_hospital, hospital_id)
+
+    def begin_rebuild(self):
+        """Start recording changes for a rebuild; call before reading its rows. Returns its generation."""
+        with self._lock:
+            self._generation += 1
+            self._changes = []
+            return self._generation
+
+    def replace(self, ambulances, hospitals, generation=None):
+        """
+        Swap in the index built from (id, hospital id, type, status) and (id, latitude, longitude) rows,
+        then apply the changes made since begin_rebuild() returned `generation`. Returns False, leaving
+        the index alone, when a later rebuild has started since.
+        """
+        index = AvailabilityIndex()
+        for ambulance_id, hospital_id, ambulance_type, status in ambulances:
+            index._add(ambulance_id, hospital_id, self._type_key(ambulance_type), status == "available")
+        index._hospitals = {
+            hospital_id: (latitude, longitude) for hospital_id, latitude, longitude in hospitals
+            if latitude is not None and longitude is not None
+        }
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._ambulances, self._available, self._hospitals = index._ambulances, index._available, index._hospitals
+            self._arrays = {}
+            for apply, args in self._changes or ():
+                apply(*args)
+            self._changes = None
+            self.rebuilds += 1
+            return True
+
+    def _arrays_for(self, ambulance_type):
+        arrays = self._arrays.get(ambulance_type)
+        if arrays is None:
+            ids = [id for id in self._available.get(ambulance_type, {}) if id in self._hospitals]
+            arrays = (
+                np.asarray(ids, dtype=np.int64),
+                np.asarray([self._hospitals[id][0] for id in ids], dtype=np.float64),
+                np.asarray([self._hospitals[id][1] for id in ids], dtype=np.float64),
+            )
+            self._arrays[ambulance_type] = arrays
+        return arrays
+
+    def nearest(self, latitude, longitude, ambulance_type, radius_km, limit):
+        """Return (hospital id, available ambulances, distance_km) of the nearest hospitals with one available."""
+        ambulance_type = self._type_key(ambulance_type)
+        with self._lock:
+            ids, lats, lons = self._arrays_for(ambulance_type)
+            counts = dict(self._available.get(ambulance_type, {}))
+        indices, distances = nearest_within(latitude, longitude, lats, lons, radius_km, k=limit)
+        return [
+            (int(ids[index]), counts.get(int(ids[index]), 0), float(distance))
+            for index, distance in zip(indices, distances)
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ambulances": len(self._ambulances),
+                "hospitals": len(self._hospitals),
+                "available_by_type": {
+                    ambulance_type: sum(counts.values()) for ambulance_type, counts in self._available.items()
+                },
+                "rebuilds": self.rebuilds
+            }
+
+
+availability_index = AvailabilityIndex()
+metrics.register("dispatch_index", availability_index.stats)
+
+
+def rebuild_availability_index(app):
+    """Reload the availability index from the database."""
+    generation = availability_index.begin_rebuild()
+    with app.app_context():
+        ambulances = db.session.query(
+            AmbulanceModel.id, AmbulanceModel.hospital_id, AmbulanceModel.vehicle_type, AmbulanceModel.status
+        ).all()
+        hospitals = db.session.query(HospitalModel.id, HospitalModel.latitude, HospitalModel.longitude).all()
+        db.session.commit()
+        availability_index.replace(ambulances, hospitals, generation)
+
+
+def rank_hospitals_for_dispatch(latitude, longitude, ambulance_type, radius_km=75, limit=5):
+    """Nearest hospitals with an available ambulance of the requested type, nearest first."""
+    ranked = []
+    for hospital_id, available, distance in availability_index.nearest(latitude, longitude, ambulance_type, radius_km, limit):
+        hospital = cached_profile("hospital", hospital_id, lambda: _load_hospital(hospital_id))
+        if hospital is None:
+            continue  # Deleted by another worker since the last rebuild
+        ranked.append({"hospital": hospital, "available_ambulances": available, "distance_km": round(distance, 2)})
+    return ranked
+
+
+def _load_hospital(hospital_id):
+    hospital = HospitalModel.query.get(hospital_id)
+    return hospital.to_dict() if hospital else None
@@ -0,0 +1,41 @@
+import numpy as np
+
+# Batched great-circle distances. Radius searches refine every candidate row
+# returned by the database, so the distances are computed in one NumPy pass
+# instead of calling the scalar haversine in a Python loop.
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_many(lat, lon, latitudes, longitudes):
+    """Return an array of distances in km from (lat, lon) to every candidate point."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(longitudes, dtype=np.float64) - lon)
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+def nearest_within(lat, lon, latitudes, longitudes, radius_km, k=None):
+    """
+    Find the candidates within `radius_km` of (lat, lon), nearest first.
+
+    Returns a pair of arrays (indices, distances), where indices point into the
+    candidate arrays. When `k` is given only the k nearest are returned; they are
+    selected with argpartition so the full candidate set is never sorted.
+    """
+    if len(latitudes) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+    distances = haversine_many(lat, lon, latitudes, longitudes)
+    indices = np.flatnonzero(distances <= radius_km)
+
+    if k is not None and k < len(indices):
+        nearest = np.argpartition(distances[indices], k - 1)[:k]
+        indices = indices[nearest]
+
+    indices = indices[np.argsort(distances[indices], kind="stable")]
+    return indices, distances[indices]
@@ -0,0 +1,297 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+
+from project.db import db
+from project.tables import DriverLocationSampleModel
+from project.services.cache import require_shared_backend
+from project.services.distance import nearest_within
+from project.services import metrics
+
+# Live driver positions reported by the driver apps. The latest position of
+# each driver is kept in a location store (a Redis geo set shared by all
+# workers, or in process for a single worker) for nearby searches; every ping is also buffered and
+# written to driver_location_samples in bulk by a periodic flush instead of one
+# commit per ping. Positions older than LIVE_LOCATION_MAX_AGE_SECONDS are
+# ignored, so drivers whose app went quiet fall back to their address.
+
+
+class MemoryLocationStore:
+    """Latest positions in NumPy arrays, one slot per driver, searched in one vectorized pass."""
+
+    def __init__(self, max_age=120):
+        self.max_age = max_age
+        self._slots = {}
+        self._ids = np.zeros(1024, dtype=np.int64)
+        self._lats = np.zeros(1024, dtype=np.float64)
+        self._lons = np.zeros(1024, dtype=np.float64)
+        self._times = np.zeros(1024, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def _grow(self):
+        for name in ("_ids", "_lats", "_lons", "_times"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+
+    def update(self, driver_id, latitude, longitude, recorded_at):
+        """Store the position unless a more recent one is already known."""
+        with self._lock:
+            slot = self._slots.get(driver_id)
+            if slot is None:
+                slot = len(self._slots)
+                if slot == len(self._ids):
+                    self._grow()
+                self._slots[driver_id] = slot
+                self._ids[slot] = driver_id
+            elif self._times[slot] > recorded_at:
+                return
+            self._lats[slot] = latitude
+            self._lons[slot] = longitude
+            self._times[slot] = recorded_at
+
+    def nearby(self, latitude, longitude, radius_km):
+        """Return (driver_id, latitude, longitude, distance_km, recorded_at) of fresh positions, nearest first."""
+        with self._lock:
+            count = len(self._slots)
+            fresh = np.flatnonzero(self._times[:count] >= time.time() - self.max_age)
+            ids, lats, lons, times = self._ids[fresh], self._lats[fresh], self._lons[fresh], self._times[fresh]
+        indices, distances = nearest_within(latitude, longitude, lats, lons, radius_km)
+        return [
+            (int(ids[index]), float(lats[index]), float(lons[index]), float(distance), float(times[index]))
+            for index, distance in zip(indices, distances)
+        ]
+
+    def fresh(self, driver_ids):
+        """Return the subset of `driver_ids` with a fresh position."""
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            return {
+                driver_id for driver_id in driver_ids
+                if driver_id in self._slots and self._times[self._slots[driver_id]] >= cutoff
+            }
+
+    def size(self):
+        return len(self._slots)
+
+
+class RedisLocationStore:
+    """Latest positions in a Redis geo set, with report times in a sorted set alongside."""
+
+    POSITIONS_KEY = "driver_locations:positions"
+    TIMES_KEY = "driver_locations:times"
+
+    def __init__(self, url, max_age=120):
+        import redis
+
+        self.max_age = max_age
+        self._client = redis.Redis.from_url(url)
+
+    def update(self, driver_id, latitude, longitude, recorded_at):
+        # GT only moves the report time forward, so a late batch can't overwrite a newer position
+        if self._client.zadd(self.TIMES_KEY, {driver_id: recorded_at}, gt=True, ch=True):
+            self._client.geoadd(self.POSITIONS_KEY, [longitude, latitude, driver_id])
+
+    def nearby(self, latitude, longitude, radius_km):
+        matches = self._client.geosearch(
+            self.POSITIONS_KEY, longitude=longitude, latitude=latitude, radius=radius_km, unit="km",
+            withdist=True, withcoord=True, sort="ASC"
+        )
+        if not matches:
+            return []
+        times = self._client.zmscore(self.TIMES_KEY, [member for member, _, _ in matches])
+        cutoff = time.time() - self.max_age
+        return [
+            (int(member), coordinates[1], coordinates[0], distance, recorded_at)
+            for (member, distance, coordinates), recorded_at in zip(matches, times)
+            if recorded_at is not None and recorded_at >= cutoff
+        ]
+
+    def fresh(self, driver_ids):
+        driver_ids = list(driver_ids)
+        if not driver_ids:
+            return set()
+        cutoff = time.time() - self.max_age
+        times = self._client.zmscore(self.TIMES_KEY, driver_ids)
+        return {driver_id for driver_id, recorded_at in zip(driver_ids, times) if recorded_at is not None and recorded_at >= cutoff}
+
+    def size(self):
+        return self._client.zcard(self.TIMES_KEY)
+
+
+class LocationSampleBuffer:
+    """Bounded buffer of pings waiting to be written; the oldest are dropped when it is full."""
+
+    def __init__(self, maxsize=100000):
+        self.dropped = 0
+        self.rejected = 0
+        self.written = 0
+        self._samples = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+
+    def extend(self, samples):
+        with self._lock:
+            overflow = len(self._samples) + len(samples) - self._samples.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+            self._samples.extend(samples)
+
+    def take(self, limit):
+        with self._lock:
+            return [self._samples.popleft() for _ in range(min(limit, len(self._samples)))]
+
+    def put_back(self, samples):
+        """
+        Return samples whose write failed to the front of the buffer. They are
+        older than everything buffered since, so they are the ones dropped if
+        it filled up in the meantime.
+        """
+        with self._lock:
+            overflow = len(self._samples) + len(samples) - self._samples.maxlen
+            if overflow > 0:
+                self.dropped += min(overflow, len(samples))
+                samples = samples[overflow:]
+            self._samples.extendleft(reversed(samples))
+
+    def count_written(self, count):
+        with self._lock:
+            self.written += count
+
+    def count_rejected(self, count):
+        with self._lock:
+            self.rejected += count
+
+    def __len__(self):
+        return len(self._samples)
+
+
+location_store = MemoryLocationStore()
+sample_buffer = LocationSampleBuffer()
+
+
+def init_driver_locations(app):
+    """Select the live location store and size the sample buffer from the app config."""
+    global location_store, sample_buffer
+    # A ping reaches one worker; with positions kept per process the others would never see it
+    require_shared_backend(app.config, "LIVE_LOCATION")
+    max_age = app.config.get("LIVE_LOCATION_MAX_AGE_SECONDS", 120)
+    if app.config.get("LIVE_LOCATION_BACKEND", "memory") == "redis":
+        location_store = RedisLocationStore(app.config["LIVE_LOCATION_REDIS_URL"], max_age=max_age)
+    else:
+        location_store = MemoryLocationStore(max_age=max_age)
+    sample_buffer = LocationSampleBuffer(maxsize=app.config.get("LOCATION_SAMPLE_BUFFER_SIZE", 100000))
+
+
+def record_driver_locations(driver_id, pings):
+    """Update the driver's live position from a batch of pings and buffer them for the database."""
+    now = datetime.utcnow()
+    samples = []
+    for ping in pings:
+        recorded_at = ping.get("recorded_at") or now
+        if recorded_at.tzinfo is not None:
+            recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+        # Device clocks drift, a ping can't be recorded in the future
+        recorded_at = min(recorded_at, now)
+        samples.append({
+            "driver_id": driver_id,
+            "latitude": ping["latitude"],
+            "longitude": ping["longitude"],
+            "recorded_at": recorded_at
+        })
+
+    latest = max(samples, key=lambda sample: sample["recorded_at"])
+    location_store.update(
+        driver_id, latest["latitude"], latest["longitude"],
+        # Naive UTC datetimes to epoch seconds
+        (latest["recorded_at"] - datetime(1970, 1, 1)).total_seconds()
+    )
+    sample_buffer.extend(samples)
+    return {"message": "Locations recorded.", "accepted": len(samples), "status": 202}, 202
+
+
+def get_live_drivers_near(latitude, longitude, radius_km):
+    """(driver_id, latitude, longitude, distance_km, recorded_at) of drivers reporting near a point."""
+    return location_store.nearby(latitude, longitude, radius_km)
+
+
+def drivers_reporting(driver_ids):
+    """Which of `driver_ids` have a fresh live position."""
+    return location_store.fresh(driver_ids)
+
+
+def flush_location_samples(app, batch_size=None):
+    """
+    Write buffered pings to driver_location_samples, one bulk INSERT per batch.
+
+    A batch that violates a constraint, typically a ping from a driver deleted
+    since, is written row by row and the offending rows are dropped. Batches
+    that fail for any other reason go back to the buffer for the next flush.
+    """
+    with app.app_context():
+        batch_size = batch_size or app.config.get("LOCATION_SAMPLE_FLUSH_BATCH_SIZE", 1000)
+        written = 0
+        while True:
+            samples = sample_buffer.take(batch_size)
+            if not samples:
+                break
+            try:
+                _insert_samples(samples)
+                batch_written, complete = len(samples), True
+            except IntegrityError:
+                db.session.rollback()
+                batch_written, complete = _insert_samples_one_by_one(app, samples)
+            except Exception as e:
+                db.session.rollback()
+                sample_buffer.put_back(samples)  # Retried on the next flush
+                app.logger.warning(f"Failed to write location samples: {str(e)}")
+                break
+            written += batch_written
+            sample_buffer.count_written(batch_written)
+            if not complete or len(samples) < batch_size:
+                break
+        return written
+
+
+def _insert_samples(samples):
+    db.session.execute(DriverLocationSampleModel.__table__.insert(), samples)
+    db.session.commit()
+
+
+def _insert_samples_one_by_one(app, samples):
+    """
+    Write a batch that failed a constraint one row at a time, dropping the rows
+    that fail it. Returns (rows written, whether the whole batch was handled);
+    after any other error the rest of the batch is put back in the buffer.
+    """
+    written = 0
+    for index, sample in enumerate(samples):
+        try:
+            _insert_samples([sample])
+            written += 1
+        except IntegrityError as e:
+            db.session.rollback()
+            sample_buffer.count_rejected(1)
+            app.logger.warning(f"Dropped location sample of driver {sample['driver_id']}: {str(e.orig)}")
+        except Exception as e:
+            db.session.rollback()
+            sample_buffer.put_back(samples[index:])
+            app.logger.warning(f"Failed to write location samples: {str(e)}")
+            return written, False
+    return written, True
+
+
+def _stats():
+    return {
+        "backend": type(location_store).__name__,
+        "drivers": location_store.size(),
+        "buffered_samples": len(sample_buffer),
+        "written_samples": sample_buffer.written,
+        "dropped_samples": sample_buffer.dropped,
+        "rejected_samples": sample_buffer.rejected
+    }
+
+
+metrics.register("driver_locations", _stats)
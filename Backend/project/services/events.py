@@ -0,0 +1,192 @@
+import json
+import queue
+import threading
+
+from flask import Response, current_app, stream_with_context
+
+from project.db import db
+from project.services import metrics
+
+# Booking change notifications pushed to dashboards over Server-Sent Events.
+# Services publish to a hospital's and a user's channel after they commit; each
+# open stream subscribes to one channel. The in-process broker only reaches
+# streams served by the same process, so deployments with several workers use
+# the Redis broker.
+
+
+# A subscription has get(timeout), returning the next event or None if nothing
+# arrived within `timeout` seconds, and close().
+
+class _QueueSubscription:
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class MemoryBroker:
+    """Fans events out to the subscribers of this process."""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                self.dropped += 1  # A stalled client must not block the publisher
+
+    def subscribe(self, channel):
+        subscription = _QueueSubscription(self, channel, self.queue_size)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+
+class _RedisSubscription:
+    def __init__(self, client, channel):
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(channel)
+
+    def get(self, timeout):
+        message = self.pubsub.get_message(timeout=timeout)
+        return json.loads(message["data"]) if message else None
+
+    def close(self):
+        self.pubsub.close()
+
+
+class RedisBroker:
+    """Fans events out through Redis pub/sub to the subscribers of every worker."""
+
+    def __init__(self, url):
+        import redis
+
+        self.dropped = 0
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel, event):
+        self._client.publish(channel, json.dumps(event))
+
+    def subscribe(self, channel):
+        return _RedisSubscription(self._client, channel)
+
+    def subscriber_count(self):
+        return None
+
+
+class EventBus:
+    def __init__(self):
+        self.broker = MemoryBroker()
+        self.heartbeat = 15
+        self.published = 0
+        self.errors = 0
+        self.streams = 0
+
+    def configure(self, app):
+        if app.config.get("EVENTS_BACKEND", "memory") == "redis":
+            self.broker = RedisBroker(app.config["EVENTS_REDIS_URL"])
+        else:
+            self.broker = MemoryBroker(queue_size=app.config.get("EVENTS_QUEUE_SIZE", 100))
+        self.heartbeat = app.config.get("EVENTS_HEARTBEAT_SECONDS", self.heartbeat)
+
+    def publish(self, channel, event):
+        try:
+            self.broker.publish(channel, event)
+            self.published += 1
+        except Exception as e:
+            # Dashboards catch up through the list endpoints, a lost event must not fail the request
+            self.errors += 1
+            current_app.logger.warning(f"Failed to publish event to {channel}: {str(e)}")
+
+    def stream(self, channel):
+        """Return a text/event-stream response that relays the channel's events until the client leaves."""
+        # Streams stay open for minutes, don't hold a pooled connection meanwhile
+        db.session.close()
+
+        def generate():
+            # Subscribed here rather than up front, so a response that is never
+            # iterated never registers a subscriber that nothing would close
+            subscription = self.broker.subscribe(channel)
+            self.streams += 1
+            try:
+                yield ": connected\n\n"
+                while True:
+                    event = subscription.get(timeout=self.heartbeat)
+                    if event is None:
+                        yield ": keep-alive\n\n"  # Keeps proxies from closing an idle stream
+                        continue
+                    yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+            finally:
+                self.streams -= 1
+                subscription.close()
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    def stats(self):
+        return {
+            "backend": type(self.broker).__name__,
+            "published": self.published,
+            "errors": self.errors,
+            "open_streams": self.streams,
+            "subscribers": self.broker.subscriber_count(),
+            "dropped": self.broker.dropped
+        }
+
+
+event_bus = EventBus()
+metrics.register("events", event_bus.stats)
+
+
+def init_event_bus(app):
+    """Select the event broker from the app config."""
+    event_bus.configure(app)
+
+
+def hospital_channel(hospital_id):
+    return f"bookings:hospital:{hospital_id}"
+
+
+def user_channel(user_id):
+    return f"bookings:user:{user_id}"
+
+
+def publish_booking_event(event_type, booking):
+    """
+    Notify the booking's hospital and user; call after the change is committed.
+    `booking` is a dict with at least id, user_id, hospital_id and status.
+    """
+    event = {"type": event_type, "data": booking}
+    event_bus.publish(hospital_channel(booking["hospital_id"]), event)
+    event_bus.publish(user_channel(booking["user_id"]), event)
@@ -0,0 +1,156 @@
+from math import ceil, cos, radians
+
+# Geohash encoding used as a spatial index on hospital and driver locations.
+# Nearby points share a common prefix, so a radius search becomes a handful of
+# prefix range scans on an indexed string column instead of a full box scan.
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+MAX_PRECISION = 12
+GEOHASH_LENGTH = 9  # ~4.8m x 4.8m cells, precise enough for stored addresses
+KM_PER_DEGREE = 111  # Of latitude, and of longitude at the equator
+
+
+def encode(latitude, longitude, precision=GEOHASH_LENGTH):
+    """Encode a coordinate into a geohash string of the given precision."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits = bits << 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+def cell_size(precision):
+    """Return the (height, width) of a geohash cell in degrees."""
+    total_bits = 5 * precision
+    lon_bits = ceil(total_bits / 2)
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def _cells_in_box(min_lat, min_lon, max_lat, max_lon, precision):
+    """Return every geohash cell of the given precision that touches the box."""
+    cell_h, cell_w = cell_size(precision)
+    cells = set()
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            cells.add(encode(lat, lon, precision))
+            if lon >= max_lon:
+                break
+            lon = min(lon + cell_w, max_lon)
+        if lat >= max_lat:
+            break
+        lat = min(lat + cell_h, max_lat)
+    return cells
+
+
+def _estimate_cells(min_lat, min_lon, max_lat, max_lon, precision):
+    cell_h, cell_w = cell_size(precision)
+    return (ceil((max_lat - min_lat) / cell_h) + 1) * (ceil((max_lon - min_lon) / cell_w) + 1)
+
+
+def search_boxes(latitude, longitude, radius_km):
+    """
+    Return the (min_lat, min_lon, max_lat, max_lon) boxes that together contain
+    every point within `radius_km` of the coordinate.
+
+    A degree of longitude shrinks with the cosine of the latitude, so the box is
+    widened accordingly; near a pole it spans every longitude. A box crossing
+    the antimeridian is split into one box on each side of it.
+    """
+    lat_span = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - lat_span, -90.0), min(latitude + lat_span, 90.0)
+
+    # The widest parallel the box reaches is the one nearest a pole
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 90.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    lon_span = radius_km / (KM_PER_DEGREE * cos(radians(widest)))
+    if lon_span >= 180.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+
+    min_lon, max_lon = longitude - lon_span, longitude + lon_span
+    if min_lon < -180.0:
+        return [(min_lat, min_lon + 360.0, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon - 360.0)]
+    return [(min_lat, min_lon, max_lat, max_lon)]
+
+
+def covering_cells(min_lat, min_lon, max_lat, max_lon, max_cells=128):
+    """
+    Return a sorted list of geohash prefixes that together cover the bounding box.
+
+    The finest precision that needs at most `max_cells` prefixes is chosen, which
+    keeps the number of index range scans small while excluding most of the
+    rows a plain lat/lon box would still have to visit. With the default a 75 km
+    radius is covered by precision 4 cells (about 20 km x 20-40 km) up to
+    latitudes of about 65 degrees.
+    """
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    min_lon, max_lon = max(min_lon, -180.0), min(max_lon, 180.0)
+
+    precision = 1
+    for candidate in range(MAX_PRECISION, 0, -1):
+        if _estimate_cells(min_lat, min_lon, max_lat, max_lon, candidate) <= max_cells:
+            precision = candidate
+            break
+
+    return sorted(_cells_in_box(min_lat, min_lon, max_lat, max_lon, precision))
+
+
+def _next_cell(cell):
+    """The cell that follows `cell` in index order at the same precision, or None after the last."""
+    digits = [BASE32.index(char) for char in cell]
+    for position in range(len(digits) - 1, -1, -1):
+        if digits[position] < len(BASE32) - 1:
+            digits[position] += 1
+            return "".join(BASE32[digit] for digit in digits)
+        digits[position] = 0
+    return None
+
+
+def covering_ranges(boxes, max_cells=128):
+    """
+    Return the [low, high) geohash ranges that cover the boxes.
+
+    Cells that follow each other in index order are merged into one range, so
+    a search usually needs far fewer range scans than it has cells. '~' sorts
+    after every geohash character, so `high` is above any geohash in the last cell.
+    """
+    cells = sorted({cell for box in boxes for cell in covering_cells(*box, max_cells=max_cells)})
+    ranges = []
+    for cell in cells:
+        if ranges and _next_cell(ranges[-1][1]) == cell and len(cell) == len(ranges[-1][1]):
+            ranges[-1][1] = cell
+        else:
+            ranges.append([cell, cell])
+    return [(low, high + "~") for low, high in ranges]
@@ -1,38 +1,51 @@
 from project.tables import  *
 from project.services.driver import is_driver_in_active_booking
-from project.db import db
+from project.db import db, read_only, replica_reads
 
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token
 )
-from passlib.hash import pbkdf2_sha256
+from project.services.passwords import password_hasher
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from flask import Response, stream_with_context
 from flask_smorest import abort
+from sqlalchemy import and_, or_, select
 from math import radians, sin, cos, sqrt, atan2
+import json
+from datetime import datetime, timedelta
+
+from project.services import geohash
+from project.services.distance import nearest_within
+from project.services.serializers import serializer_options, serialize_query
+from project.services.profile_cache import profile_cache, PROFILE_ENTITIES
+from project.services.city_state import resolve_city_state
+from project.services.driver_locations import get_live_drivers_near, drivers_reporting
+from project.services.dispatch import availability_index
 
 # Business Logic Functions for CRUD operations
 
 
 
 # 
-def manage_address_field(data):
+def manage_address_field(data, city_state=None):
     # Extract address data from hospital_data
     address = data.pop("address")
 
-    # Create and save the address in the Address table
-    city_state = CityStateModel.query.filter_by(
-        postal_code=address["postal_code"]
-    ).first()
-    if not city_state:
-        city_state = CityStateModel(
-        city=address["city"],
-        state=address["state"],
-        postal_code=address["postal_code"]
-    )
-    field = {"city_state": city_state,"street": address["street"],"latitude":                               address["latitude"],"longitude": address["longitude"]}
+    # Resolve the postal code through the interning cache, creating it if new,
+    # unless the caller already resolved it
+    city_state = city_state or resolve_city_state(address)
+    field = {"city_state_id": city_state.id,"street": address["street"],"latitude":                               address["latitude"],"longitude": address["longitude"]}
     return field
 
+
+def location_geohash(latitude, longitude):
+    """Return the spatial index cell for a location, or None if it has no coordinates."""
+    if latitude is None or longitude is None:
+        return None
+    return geohash.encode(latitude, longitude)
+
+
 # Create a new entry and generate tokens   
 def create_logic(data, Model, entity):
     """Business logic to create a new entry and generate tokens."""
@@ -42,11 +55,13 @@ def create_logic(data, Model, entity):
     if 'address' in data:
         # Extract address data from hospital_data
         field = manage_address_field(data)
+        if hasattr(Model, "geohash"):
+            field["geohash"] = location_geohash(field["latitude"], field["longitude"])
     
     # Add the address_id to hospital_data and create the hospital
     if len(data["password"]) < 6:
         abort(400, message="Password must be at least 6 characters long.")
-    data["password"] = pbkdf2_sha256.hash(data["password"])
+    data["password"] = password_hasher.hash(data["password"], entity)
     item = Model(**data, **field)
     
     try:
@@ -67,6 +82,9 @@ def create_logic(data, Model, entity):
         print("error",e)
         abort(500, message=f"An error occurred while creating the entity.")
     
+    if entity == "hospital" and field:
+        availability_index.move_hospital(item.id, field["latitude"], field["longitude"])
+
     # Generate tokens
     access_token = create_access_token(identity=str(item.id), additional_claims={"role": f"{entity}"}, fresh=True)
     refresh_token = create_refresh_token(identity=str(item.id),additional_claims={"role": f"{entity}"})
@@ -82,20 +100,73 @@ def create_logic(data, Model, entity):
 
 # Fetch all items from the database
 
-def get_all_item_logic(Model, entity):
-    """Fetch all items from the database."""
-    items = Model.query.all()
-    return {f"{entity}s": [item.to_dict() for item in items], "message":f"all {entity}s fetched successfully", "status":200}, 200
+DEFAULT_PAGE_SIZE = 100
+
+
+@read_only
+def get_all_item_logic(Model, entity, pagination=None):
+    """
+    Fetch items ordered by id, or stream all of them as NDJSON. Paging is opt-in:
+    only a `limit` or `cursor` returns a page, otherwise every item is returned.
+    """
+    pagination = pagination or {}
+    if pagination.get("format") == "ndjson":
+        return stream_all_items(Model)
+
+    query = Model.query.order_by(Model.id).options(*serializer_options(Model))
+    if pagination.get("cursor") is not None:
+        query = query.filter(Model.id > pagination["cursor"])
+
+    limit = pagination.get("limit")
+    if limit is None and pagination.get("cursor") is None:
+        items, next_cursor = query.all(), None
+    else:
+        limit = limit or DEFAULT_PAGE_SIZE
+        # Fetch one extra row to know whether another page follows
+        items = query.limit(limit + 1).all()
+        next_cursor = items[limit - 1].id if len(items) > limit else None
+        items = items[:limit]
+    return {
+        f"{entity}s": [item.to_dict() for item in items],
+        "next_cursor": next_cursor,
+        "message":f"all {entity}s fetched successfully",
+        "status":200
+    }, 200
+
+
+def stream_all_items(Model, batch_size=500):
+    """Stream every item as newline-delimited JSON from a server-side cursor."""
+    query = (
+        select(Model)
+        .order_by(Model.id)
+        .options(*serializer_options(Model))
+        .execution_options(yield_per=batch_size)
+    )
+
+    def generate():
+        with replica_reads():
+            for item in db.session.execute(query).scalars():
+                yield json.dumps(item.to_dict()) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
   
 
 # Fetch an item by ID
 
+@read_only
 def get_item_by_id_logic(id, Model, entity):
     """Fetch an item by ID."""
-    item = Model.query.get(id)
-    if not item:
+    def load():
+        item = Model.query.get(id)
+        return item.to_dict() if item else None
+
+    if entity in PROFILE_ENTITIES:
+        data = profile_cache.get_or_load(entity, id, load)
+    else:
+        data = load()
+    if not data:
         return abort(404, message=f"{entity} not found.")
-    return {f"{entity}": item.to_dict(), "message": f"{entity} fetched successfully", "status": 200}, 200
+    return {f"{entity}": data, "message": f"{entity} fetched successfully", "status": 200}, 200
  
 # Update an item & address
 
@@ -103,16 +174,11 @@ def update_address(data,item):
     item.street = data.get("street", item.street)
     item.latitude = data.get("latitude", item.latitude)
     item.longitude = data.get("longitude", item.longitude)
+    if hasattr(item, "geohash"):
+        item.geohash = location_geohash(item.latitude, item.longitude)
     
-    # Update or create CityStateModel and assign it directly
-    city_state = CityStateModel.query.filter_by(postal_code=data["postal_code"]).first()
-    if not city_state:
-        city_state = CityStateModel(
-            city=data['city'],
-            state=data['state'],
-            postal_code=data["postal_code"]
-        )
-    item.city_state = city_state  # Pass the object directly, no need for flush
+    # Resolve or create the postal code and assign its id
+    item.city_state_id = resolve_city_state(data).id
    
 
 def update_logic(id, Model,data, entity):
@@ -123,7 +189,7 @@ def update_logic(id, Model,data, entity):
         if 'password' in data:
             if len(data["password"]) < 6:
                 abort(400, message="Password must be at least 6 characters long.")
-            data["password"] = pbkdf2_sha256.hash(data["password"])
+            data["password"] = password_hasher.hash(data["password"], entity)
         # Update fields
         item.name = data.get("name", item.name)
         item.email = data.get("email", item.email)
@@ -131,8 +197,13 @@ def update_logic(id, Model,data, entity):
         item.password = data.get("password", item.password)
         if 'address' in data:
             update_address(data['address'], item)
+        location = (item.latitude, item.longitude) if hasattr(item, "latitude") else None
         
         db.session.commit()
+        if entity in PROFILE_ENTITIES:
+            profile_cache.invalidate(entity, id)
+        if entity == "hospital" and 'address' in data:
+            availability_index.move_hospital(int(id), *location)
         return {f"{entity}": item.to_dict(), "message": f"{entity.capitalize()} updated successfully", "status": 200} , 200
 
     except IntegrityError as e:
@@ -151,8 +222,15 @@ def update_logic(id, Model,data, entity):
 def login_logic(login_data, Model, entity):
     """Business logic to log in a user."""
     item = Model.query.filter_by(name=login_data["name"]).first()
-    if not item or not pbkdf2_sha256.verify(login_data["password"], item.password):
+    if not item:
+        return abort(401, message="Invalid username or password.")
+    valid, new_hash = password_hasher.verify(login_data["password"], item.password, entity)
+    if not valid:
         return abort(401, message="Invalid username or password.")
+    if new_hash:
+        # Stored hash predates the current rounds setting, upgrade it now
+        item.password = new_hash
+        db.session.commit()
     
     access_token = create_access_token(identity=str(item.id), additional_claims={"role": f"{entity}"}, fresh=True)
     refresh_token = create_refresh_token(identity=str(item.id),additional_claims={"role": f"{entity}"})
@@ -174,6 +252,10 @@ def delete_logic(id, Model, entity):
     
     db.session.delete(item)
     db.session.commit()
+    if entity in PROFILE_ENTITIES:
+        profile_cache.invalidate(entity, id)
+    if entity == "hospital":
+        availability_index.remove_hospital(int(id))
     return {"message": f"{entity} deleted successfully", "status": 204}, 204
 
 # Haversine formula for calculating distance
@@ -191,67 +273,161 @@ def haversine(lat1, lon1, lat2, lon2):
 
 # Get nearby hospitals
 
+@read_only
 def get_nearby_items(entity_id,item_name, radius_km=75):
     """Get a list of hospitals within the specified radius (in km) from the entity's location."""
     model = HospitalModel if item_name == "driver" else DriverModel
-    entity = model.query.get(entity_id)
-    
-    item_ids = {item.id for item in entity.hospitals} if item_name == "hospital" else {item.id for item in entity.drivers}
-    entity = entity.to_dict()
-    address = entity['address']
-    entity_name = "hsopital" if item_name == "driver" else "driver"
-    if not entity or not address:
+    entity_name = "hospital" if item_name == "driver" else "driver"
+
+    # Only the coordinates of the entity are needed, not the full row
+    location = db.session.query(model.latitude, model.longitude).filter(model.id == entity_id).first()
+    if not location:
         abort(404, message=f"{entity_name.capitalize()} or {entity_name} address not found.")
-        
-    entity_lat = address['latitude']
-    entity_lon = address['longitude']
-    
+
+    entity_lat, entity_lon = location
     if entity_lat is None or entity_lon is None:
         abort(400, message=f"{entity_name.capitalize()}'s address must have latitude and longitude.")
-    item_model = HospitalModel if item_name == "hospital" else DriverModel
-    nearby_items = get_items_in_range(entity_lat, entity_lon,item_model,item_name, radius_km)[0].get(f"nearby_{item_name}s")
+
+    # Ids of the items already connected to the entity, read from the association table
+    association = hospital_driver_association.c
+    connected_column = association.hospital_id if item_name == "hospital" else association.driver_id
+    entity_column = association.driver_id if item_name == "hospital" else association.hospital_id
+    item_ids = {row[0] for row in db.session.query(connected_column).filter(entity_column == entity_id)}
+
+    if item_name == "driver":
+        nearby_items = get_nearby_drivers(entity_lat, entity_lon, radius_km)
+    else:
+        nearby_items = get_items_in_range(entity_lat, entity_lon, HospitalModel, item_name, radius_km)[0].get("nearby_hospitals")
     
     # Add 'isConnected' flag for each hospital
-    
-    items_with_status = []
     for data in nearby_items:
-        print(data)
         data["isConnected"] = data[f"{item_name}"]['id'] in item_ids
-        items_with_status.append(data)
-    
-    return items_with_status
-    
     
+    return nearby_items
 
 
-def get_items_in_range(entity_lat, entity_lon, item_model,item_name,radius_km=75):
-    # Convert radius to degrees (approximation for SQL filtering)
-    radius_deg = radius_km / 111  # 1 degree ≈ 111 km
+def get_items_in_range(entity_lat, entity_lon, item_model,item_name,radius_km=75, limit=None):
+    result = find_items_in_range(entity_lat, entity_lon, item_model, item_name, radius_km, limit)
+    if not result:
+        return abort(404, message=f"No {item_name}s found within the specified range.")
+    return {f"nearby_{item_name}s": result, "message": f" Nearby {item_name}s fetched successfully", "status": 200}, 200
+
+
+def find_items_in_range(entity_lat, entity_lon, item_model, item_name, radius_km=75, limit=None):
+    """Items whose address is within `radius_km` of the point, nearest first."""
+    # The lat/lon boxes around the point (two if it straddles the antimeridian)
+    boxes = geohash.search_boxes(entity_lat, entity_lon, radius_km)
+
+    # Narrow the search to the geohash cells covering the boxes. Each range of
+    # adjacent cells is one range scan on the indexed geohash column, so only
+    # rows in those cells are visited.
+    cell_filter = or_(*[
+        and_(item_model.geohash >= low, item_model.geohash < high)
+        for low, high in geohash.covering_ranges(boxes)
+    ])
+    box_filter = or_(*[
+        and_(
+            item_model.latitude >= min_lat, item_model.latitude <= max_lat,
+            item_model.longitude >= min_lon, item_model.longitude <= max_lon
+        )
+        for min_lat, min_lon, max_lat, max_lon in boxes
+    ])
 
-    # Filter using SQLAlchemy attributes, not Marshmallow schema
+    # Select only the columns the response needs, joined with the city/state in
+    # the same query, so no ORM objects are built and nothing is lazy-loaded
     nearby_items = (
-    db.session.query(item_model)
-    .filter(
-        (item_model.latitude >= entity_lat - radius_deg) &
-        (item_model.latitude <= entity_lat + radius_deg) &
-        (item_model.longitude >= entity_lon - radius_deg) &
-        (item_model.longitude <= entity_lon + radius_deg)
+    db.session.query(
+        item_model.id,
+        item_model.name,
+        item_model.phone,
+        item_model.latitude,
+        item_model.longitude,
+        CityStateModel.city,
+        CityStateModel.state,
+        CityStateModel.postal_code
     )
+    .outerjoin(CityStateModel, item_model.city_state_id == CityStateModel.id)
+    .filter(cell_filter & box_filter)
     .all()
     )
 
-    # Refine results using Haversine formula for more accurate filtering
+    # Refine results using Haversine formula for more accurate filtering,
+    # computed for all candidates at once and sorted nearest first
+    indices, distances = nearest_within(
+        entity_lat, entity_lon,
+        [row.latitude for row in nearby_items],
+        [row.longitude for row in nearby_items],
+        radius_km, k=limit
+    )
     result = []
-    for item in nearby_items:
-        distance = haversine(entity_lat, entity_lon, item.latitude, item.longitude)
-        if distance <= radius_km:
-            result.append({
-                f"{item_name}": item.to_dict(),
+    for index, distance in zip(indices, distances):
+        row = nearby_items[index]
+        result.append({
+            f"{item_name}": {
+                "id": row.id,
+                "name": row.name,
+                "phone": row.phone,
+                "address": {
+                    "latitude": row.latitude,
+                    "longitude": row.longitude,
+                    "city": row.city,
+                    "state": row.state,
+                    "postal_code": row.postal_code
+                }
+            },
+            "distance_km": round(float(distance), 2)
+        })
+    return result
+
+
+def get_nearby_drivers(entity_lat, entity_lon, radius_km=75):
+    """
+    Drivers within `radius_km`, nearest first. Drivers whose app is reporting are
+    placed at their live position; the rest at their address.
+    """
+    live = get_live_drivers_near(entity_lat, entity_lon, radius_km)
+    by_address = find_items_in_range(entity_lat, entity_lon, DriverModel, "driver", radius_km)
+    # A reporting driver is only near if their live position is
+    reporting = drivers_reporting([item["driver"]["id"] for item in by_address])
+    nearby_items = [item for item in by_address if item["driver"]["id"] not in reporting]
+
+    if live:
+        drivers = {
+            row.id: row for row in db.session.query(
+                DriverModel.id, DriverModel.name, DriverModel.phone, DriverModel.latitude, DriverModel.longitude,
+                CityStateModel.city, CityStateModel.state, CityStateModel.postal_code
+            )
+            .outerjoin(CityStateModel, DriverModel.city_state_id == CityStateModel.id)
+            .filter(DriverModel.id.in_([driver_id for driver_id, *_ in live]))
+        }
+        for driver_id, latitude, longitude, distance, recorded_at in live:
+            row = drivers.get(driver_id)
+            if row is None:
+                continue  # Deleted since it last reported
+            nearby_items.append({
+                "driver": {
+                    "id": row.id,
+                    "name": row.name,
+                    "phone": row.phone,
+                    "address": {
+                        "latitude": row.latitude,
+                        "longitude": row.longitude,
+                        "city": row.city,
+                        "state": row.state,
+                        "postal_code": row.postal_code
+                    },
+                    "live_location": {
+                        "latitude": latitude,
+                        "longitude": longitude,
+                        "recorded_at": (datetime(1970, 1, 1) + timedelta(seconds=recorded_at)).isoformat()
+                    }
+                },
                 "distance_km": round(distance, 2)
             })
-    if not result:
-        return abort(404, message=f"No {item_name}s found within the specified range.")
-    return {f"nearby_{item_name}s": result, "message": f" Nearby {item_name}s fetched successfully", "status": 200}, 200
+
+    if not nearby_items:
+        return abort(404, message="No drivers found within the specified range.")
+    return sorted(nearby_items, key=lambda item: item["distance_km"])
 
 
 
@@ -278,14 +454,19 @@ def send_connection_request(sender_type, driver_id, hospital_id):
     sender = "Driver" if sender_type == "driver" else "Hospital"
     return {"message": f"{sender} connection request sent successfully.", "status": 201, }, 201
 
+@read_only
 def get_connection_requests(Model,item_id):
     item = Model.query.get(item_id)
     if not item:
         return abort(404, message=f"{Model} not found.")
-    connection_requests = [connection_request for connection_request in item.connection_requests if connection_request.status == "pending"]
+    owner_column = ConnectRequestModel.driver_id if Model is DriverModel else ConnectRequestModel.hospital_id
+    connection_requests = serialize_query(
+        ConnectRequestModel.query.filter(owner_column == item_id, ConnectRequestModel.status == "pending"),
+        ConnectRequestModel
+    )
     if not connection_requests:
         return abort(404, message="No pending connection requests found.")
-    return {"connection_requests": [request.to_dict() for request in connection_requests], "message": "Connection requests fetched successfully", "status": 200}, 200
+    return {"connection_requests": connection_requests, "message": "Connection requests fetched successfully", "status": 200}, 200
 
 
 def respond_to_connection_request(connection_request, response_status):
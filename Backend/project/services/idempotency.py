@@ -0,0 +1,124 @@
+import hashlib
+import threading
+from functools import wraps
+
+from flask import Response, current_app, request
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from flask_smorest import abort
+
+from project.services.cache import MemoryBackend, backend_from_config
+from project.services import metrics
+
+# Idempotency-Key support for endpoints that clients retry over flaky networks.
+# The first request with a key reserves it, runs, and stores its successful
+# response; retries with the same key get that response back without running
+# the handler again. Keys are scoped per endpoint and per caller (role and id,
+# since ids are only unique per role), and bound to the request body so a key
+# can't be reused for a different request. Every web worker must see the same
+# keys, so the store defaults to Redis.
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyStore:
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.lock_ttl = 60
+        self.replays = 0
+        self.conflicts = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def configure(self, app):
+        self.backend = backend_from_config(app.config, "IDEMPOTENCY", shared=True)
+        self.lock_ttl = app.config.get("IDEMPOTENCY_LOCK_TTL", self.lock_ttl)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def run(self, scope, idempotency_key, func, *args, **kwargs):
+        """Run `func` once per key, replaying its stored response for retries."""
+        key = f"idempotency:{scope}:{get_jwt().get('role')}:{get_jwt_identity()}:{idempotency_key}"
+        fingerprint = hashlib.sha256(request.method.encode() + request.path.encode() + request.get_data()).hexdigest()
+
+        try:
+            reserved = self.backend.add(key, {"state": "pending", "fingerprint": fingerprint}, ttl=self.lock_ttl)
+            record = None if reserved else self.backend.get(key)
+        except Exception:
+            self._count("errors")  # Without the store, fall back to handling the request normally
+            return func(*args, **kwargs)
+
+        if not reserved and record is not None:
+            if record["fingerprint"] != fingerprint:
+                self._count("conflicts")
+                abort(422, message=f"{IDEMPOTENCY_HEADER} was already used with a different request.")
+            if record["state"] == "pending":
+                self._count("conflicts")
+                abort(409, message="A request with this Idempotency-Key is still being processed.")
+            self._count("replays")
+            return Response(
+                record["body"], record["status"], mimetype=record["mimetype"], headers={"Idempotent-Replayed": "true"}
+            )
+
+        try:
+            response = func(*args, **kwargs)
+        except BaseException:
+            self._release(key)  # Failed requests can be retried with the same key
+            raise
+
+        # Whatever the handler returned (body, (body, status), (body, status, headers),
+        # a Response ...), store what the client received
+        response = current_app.make_response(response)
+        try:
+            if 200 <= response.status_code < 300:
+                self.backend.set(key, {
+                    "state": "done", "fingerprint": fingerprint, "status": response.status_code,
+                    "mimetype": response.mimetype, "body": response.get_data(as_text=True)
+                })
+            else:
+                self.backend.delete(key)
+        except Exception:
+            self._count("errors")
+        return response
+
+    def _release(self, key):
+        try:
+            self.backend.delete(key)
+        except Exception:
+            self._count("errors")
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "replays": self.replays,
+            "conflicts": self.conflicts,
+            "errors": self.errors
+        }
+
+
+idempotency_store = IdempotencyStore()
+metrics.register("idempotency", idempotency_store.stats)
+
+
+def init_idempotency_store(app):
+    """Select the idempotency store backend from the app config."""
+    idempotency_store.configure(app)
+
+
+def idempotent(scope):
+    """
+    Decorator for JWT-protected routes honouring the Idempotency-Key header.
+    Requests without the header are handled as before.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not idempotency_key:
+                return func(*args, **kwargs)
+            if len(idempotency_key) > 255:
+                abort(400, message=f"{IDEMPOTENCY_HEADER} must be at most 255 characters.")
+            return idempotency_store.run(scope, idempotency_key, func, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,25 +1,172 @@
 from project.tables import TokenBlocklist
-from project.db import db
+from project.db import db, read_only
+from project.services.cache import LRUCache, BloomFilter
+from project.services import metrics
 
+import threading
+import time
 from datetime import timedelta
 from datetime import datetime
 
 
+class BlocklistCache:
+  """
+  Keeps the blocklist check off the database.
+
+  Every revoked jti is in a Bloom filter, loaded from the table at startup and
+  topped up every BLOCKLIST_BLOOM_REFRESH_SECONDS with the rows any process
+  added since the last refresh. While the filter is current, a jti it has never
+  seen was not revoked as of the last refresh, so the check for a token in
+  active use needs no query at all. This process's own logouts are added at
+  once, other processes' within one refresh interval.
+
+  A jti the filter has seen is either revoked or a false positive. Revoked jtis
+  are cached until their token expires and false positives in an LRU of
+  negative lookups for BLOCKLIST_CACHE_TTL seconds, so either costs one query.
+  If the refresh stops running, the filter goes stale and every lookup falls
+  back to the negative LRU and the database.
+  """
+
+  def __init__(self, maxsize=10000, ttl=30, bloom_capacity=100000, refresh_interval=30):
+    self.negative = LRUCache(maxsize=maxsize, ttl=ttl)
+    self.revoked = LRUCache(maxsize=maxsize)
+    self.bloom = BloomFilter(capacity=bloom_capacity)
+    self.bloom_capacity = bloom_capacity
+    self.refresh_interval = refresh_interval
+    self.refreshed_at = None  # Monotonic time of the last load, None until the filter is loaded
+    self._loaded_through = None  # created_at up to which every blocklist row is in the filter
+    self.database_lookups = 0
+    self._lock = threading.Lock()
+
+  def configure(self, app):
+    maxsize = app.config.get("BLOCKLIST_CACHE_SIZE", 10000)
+    self.negative = LRUCache(maxsize=maxsize, ttl=app.config.get("BLOCKLIST_CACHE_TTL", 30))
+    self.revoked = LRUCache(maxsize=maxsize)
+    self.bloom_capacity = app.config.get("BLOCKLIST_BLOOM_CAPACITY", 100000)
+    self.refresh_interval = app.config.get("BLOCKLIST_BLOOM_REFRESH_SECONDS", 30)
+    with self._lock:
+      self.database_lookups = 0
+    self.rebuild()
+
+  def rebuild(self):
+    """Load every unexpired revoked jti into a new filter sized for them (needs an app context)."""
+    started = datetime.utcnow()
+    live_tokens = TokenBlocklist.query.filter(TokenBlocklist.expires_at >= started)
+    bloom = BloomFilter(capacity=max(self.bloom_capacity, 2 * live_tokens.count()))
+    for (jti,) in live_tokens.with_entities(TokenBlocklist.jti).yield_per(1000):
+      bloom.add(jti)
+    # A logout between the query and the swap is only in the old filter, but
+    # it is in the revoked LRU and the next refresh adds it again
+    self.bloom = bloom
+    self._loaded(started)
+
+  def refresh(self):
+    """Add the jtis revoked since the last load, by any process; rebuild once the filter is full."""
+    if self._loaded_through is None or self.bloom.count >= self.bloom.capacity:
+      return self.rebuild()
+    started = datetime.utcnow()
+    # Reread a little before the last load, for rows committed after it with an earlier created_at
+    since = self._loaded_through - REFRESH_OVERLAP
+    for (jti,) in db.session.query(TokenBlocklist.jti).filter(TokenBlocklist.created_at >= since).yield_per(1000):
+      self.bloom.add(jti)
+      self.negative.delete(jti)
+    self._loaded(started)
+
+  def _loaded(self, started):
+    self._loaded_through = started
+    self.refreshed_at = time.monotonic()
+
+  def is_current(self):
+    """Whether the filter was loaded recently enough to answer "not revoked" on its own."""
+    return self.refreshed_at is not None and time.monotonic() - self.refreshed_at <= 3 * self.refresh_interval
+
+  def revoke(self, jti, expires_at):
+    """Mark `jti` as revoked; it is cached as such until its token expires (epoch seconds)."""
+    self.bloom.add(jti)
+    ttl = expires_at - time.time()
+    if ttl > 0:
+      self.revoked.set(jti, True, ttl=ttl)
+    self.negative.delete(jti)
+
+  def count_lookup(self):
+    with self._lock:
+      self.database_lookups += 1
+
+  def stats(self):
+    return {
+      "bloom_filter": dict(self.bloom.stats(), current=self.is_current()),
+      "negative_cache": self.negative.stats(),
+      "revoked_cache": self.revoked.stats(),
+      "database_lookups": self.database_lookups
+    }
+
+
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+blocklist_cache = BlocklistCache()
+metrics.register("token_blocklist", blocklist_cache.stats)
+
+
+def init_blocklist_cache(app):
+  """Configure the blocklist cache from the app config and load revoked tokens (needs an app context)."""
+  blocklist_cache.configure(app)
+
+
+def refresh_blocklist_cache(app):
+  """Scheduled job: add tokens revoked by any process to the Bloom filter."""
+  with app.app_context():
+    blocklist_cache.refresh()
+
+
 def logout_logic(jti, expires_at):
   """Add token to the blocklist with its expiration time."""
   token = TokenBlocklist(jti=jti, expires_at=datetime.fromtimestamp(expires_at))
   db.session.add(token)
   db.session.commit()
+  blocklist_cache.revoke(jti, expires_at)
   return {"message": "Logged out successfully"}
-  
+
+@read_only
 def is_token_revoked(jwt_payload):
   """Check if the token is in the blocklist."""
   jti = jwt_payload["jti"]
+  if jti not in blocklist_cache.bloom and blocklist_cache.is_current():
+    return False  # Not revoked as of the last refresh
+  if blocklist_cache.revoked.get(jti):
+    return True  # Revoked, and stays revoked until the token expires
+  if blocklist_cache.negative.get(jti):
+    return False  # Recently checked and not revoked
+
+  blocklist_cache.count_lookup()
   token = TokenBlocklist.query.filter_by(jti=jti).first()
-  return token is not None  # True if the token is revoked
+  if token is not None:
+    blocklist_cache.revoke(jti, jwt_payload["exp"])
+    return True  # True if the token is revoked
+  blocklist_cache.negative.set(jti, True)
+  return False
+
+def cleanup_expired_tokens(app, chunk_size=None):
+  """
+  Remove expired tokens from the blocklist in chunks.
 
-def cleanup_expired_tokens():
-  """Remove expired tokens from the blocklist."""
-  now = datetime.utcnow()
-  TokenBlocklist.query.filter(TokenBlocklist.expires_at < now).delete()
-  db.session.commit()
\ No newline at end of file
+  Each chunk selects up to `chunk_size` expired ids through the expires_at
+  index and deletes them in its own short transaction, so logins writing to
+  the table are never blocked for the length of the whole cleanup.
+  Returns the number of rows deleted.
+  """
+  with app.app_context():
+    chunk_size = chunk_size or app.config.get("TOKEN_CLEANUP_CHUNK_SIZE", 1000)
+    now = datetime.utcnow()
+    deleted = 0
+    while True:
+      ids = [row[0] for row in db.session.query(TokenBlocklist.id)
+             .filter(TokenBlocklist.expires_at < now)
+             .limit(chunk_size)]
+      if not ids:
+        break
+      deleted += TokenBlocklist.query.filter(TokenBlocklist.id.in_(ids)).delete(synchronize_session=False)
+      db.session.commit()
+      if len(ids) < chunk_size:
+        break
+    app.logger.info(f"Cleaned up {deleted} expired tokens from the blocklist.")
+    return deleted
@@ -0,0 +1,14 @@
+# Registry of runtime metrics exposed through /api/admins/metrics.
+# Each subsystem registers a callable that returns a JSON-serializable dict.
+
+_collectors = {}
+
+
+def register(name, collector):
+    """Register a metrics collector under `name`, replacing any previous one."""
+    _collectors[name] = collector
+
+
+def collect():
+    """Return the current metrics of every registered subsystem."""
+    return {name: collector() for name, collector in _collectors.items()}
@@ -0,0 +1,57 @@
+from project.db import db
+from project.tables import NotificationOutboxModel
+from project.services.tasks import send_email_batch
+
+# Transactional outbox for notification emails. Request handlers only add rows
+# to the outbox in the same commit as the booking change, so no broker I/O
+# happens on the request path and no email is lost if Redis is slow or down.
+# A periodic relay hands the queued emails to Celery in bulk.
+
+
+def enqueue_email(to_email, subject, body):
+    """Queue an email; it is saved with the caller's commit."""
+    db.session.add(NotificationOutboxModel(to_email=to_email, subject=subject, body=body))
+
+
+def enqueue_emails(emails):
+    """Queue many email dicts with one bulk insert; they are saved with the caller's commit."""
+    if emails:
+        db.session.execute(NotificationOutboxModel.__table__.insert(), emails)
+
+
+def relay_outbox(app, batch_size=None):
+    """
+    Drain the outbox to Celery, one send_email_batch task per batch.
+
+    Rows are locked (SKIP LOCKED where supported) so concurrent relays never pick
+    the same emails, and deleted in the same transaction once the task is
+    queued. If the broker is unreachable the transaction rolls back and the
+    emails stay queued for the next run. Returns the number of emails relayed.
+    """
+    with app.app_context():
+        batch_size = batch_size or app.config.get("OUTBOX_RELAY_BATCH_SIZE", 500)
+        relayed = 0
+        while True:
+            emails = (
+                NotificationOutboxModel.query
+                .order_by(NotificationOutboxModel.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not emails:
+                break
+            try:
+                send_email_batch.delay([email.to_dict() for email in emails])
+                NotificationOutboxModel.query.filter(
+                    NotificationOutboxModel.id.in_([email.id for email in emails])
+                ).delete(synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Failed to relay notification outbox: {str(e)}")
+                break
+            relayed += len(emails)
+            if len(emails) < batch_size:
+                break
+        return relayed
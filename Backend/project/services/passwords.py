@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from flask_smorest import abort
+from passlib.hash import pbkdf2_sha256
+
+from project.services import metrics
+
+# PBKDF2 hashing is deliberately CPU-expensive. hashlib releases the GIL while it
+# runs, so it doesn't stall other request threads, but a burst of logins would
+# still take every core the web workers need. Hashes therefore run on a small
+# process pool per web worker (PASSWORD_HASH_WORKERS, default 2), which caps the
+# CPU logins can use. The pool is bounded: when too many hashes are queued the
+# request gets a 503 instead of tying up a web worker. A queued hash keeps its
+# slot until it finishes, even if its request timed out, so timeouts can't grow
+# the queue past the bound.
+#
+# Pool processes are spawned, not forked: a fork would copy this process's
+# threads' locks (scheduler, connection pools) in whatever state they were in.
+# A spawned process re-imports the __main__ script, so a script that creates
+# the app must do so under `if __name__ == "__main__"` (gunicorn, flask and
+# celery entry points already do).
+
+ROLES = ("user", "driver", "hospital", "admin")
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with per-role PBKDF2 rounds on a bounded process pool."""
+
+    def __init__(self):
+        self.default_rounds = pbkdf2_sha256.default_rounds
+        self.rounds = {}
+        self.workers = 0
+        self.max_pending = 0
+        self.timeout = None
+        self.rehashed = 0
+        self.rejected = 0
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        self.default_rounds = config.get("PASSWORD_HASH_ROUNDS", self.default_rounds)
+        self.rounds = {
+            role: config.get(f"PASSWORD_HASH_ROUNDS_{role.upper()}", self.default_rounds) for role in ROLES
+        }
+        self.workers = config.get("PASSWORD_HASH_WORKERS", 0)
+        self.max_pending = config.get("PASSWORD_HASH_MAX_PENDING", self.workers * 4)
+        self.timeout = config.get("PASSWORD_HASH_TIMEOUT")
+        self._slots = threading.BoundedSemaphore(self.max_pending) if self.workers else None
+
+    def rounds_for(self, role):
+        return self.rounds.get(role, self.default_rounds)
+
+    def _pool(self):
+        # Created lazily, and again after a fork, so each web worker owns its pool
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _discard_pool(self, executor):
+        """Drop a pool that broke because one of its processes died; the next call builds a new one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, func, *args):
+        executor = self._pool()
+        try:
+            return executor, executor.submit(func, *args)
+        except BrokenProcessPool:
+            self._discard_pool(executor)
+            executor = self._pool()
+            return executor, executor.submit(func, *args)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _run(self, func, *args, retry=True):
+        if not self.workers:
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            abort(503, message="Too many login attempts in progress, please try again shortly.")
+        try:
+            executor, future = self._submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            abort(503, message="Password check timed out, please try again shortly.")
+        except BrokenProcessPool:
+            # A pool process died (OOM, killed) while this hash was queued or running
+            self._discard_pool(executor)
+            if not retry:
+                raise
+        return self._run(func, *args, retry=False)
+
+    def hash(self, password, role):
+        return self._run(_hash, password, self.rounds_for(role))
+
+    def verify(self, password, stored_hash, role):
+        """
+        Check a password against its stored hash.
+
+        Returns (valid, new_hash). new_hash is set when the stored hash uses
+        fewer rounds than the role's current setting and should be saved.
+        """
+        valid, new_hash = self._run(_verify_and_update, password, stored_hash, self.rounds_for(role))
+        if new_hash:
+            self._count("rehashed")
+        return valid, new_hash
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected
+        }
+
+
+# Module-level functions so they can be pickled and run in the pool's processes
+
+def _hash(password, rounds):
+    return pbkdf2_sha256.using(rounds=rounds).hash(password)
+
+
+def _verify_and_update(password, stored_hash, rounds):
+    if not pbkdf2_sha256.verify(password, stored_hash):
+        return False, None
+    if pbkdf2_sha256.from_string(stored_hash).rounds < rounds:
+        return True, _hash(password, rounds)
+    return True, None
+
+
+password_hasher = PasswordHasher()
+metrics.register("password_hashing", password_hasher.stats)
+
+
+def init_password_hasher(app):
+    password_hasher.configure(app.config)
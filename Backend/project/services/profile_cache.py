@@ -0,0 +1,94 @@
+import threading
+
+from project.db import primary_reads
+from project.services.cache import MemoryBackend, backend_from_config
+from project.services import metrics
+
+# Versioned cache of serialized hospital and driver profiles. Each profile is
+# stored under a key that includes a per-profile version number; a write bumps
+# the version, so readers move to a fresh key at once and a reader that loaded
+# the old row just before the write can only fill the abandoned old key.
+# Misses are loaded from the primary: a lagging replica could still return the
+# old row, which would then be cached under the new version.
+
+PROFILE_ENTITIES = ("hospital", "driver")
+SCHEMA_VERSION = 1  # Bump when to_dict() output changes, to ignore old entries
+
+
+class ProfileCache:
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def configure(self, app):
+        self.backend = backend_from_config(app.config, "PROFILE_CACHE")
+
+    def _version_key(self, entity, id):
+        return f"profile:{entity}:{id}:version"
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_or_load(self, entity, id, loader):
+        """Return the cached profile, calling `loader` to build and cache it on a miss."""
+        try:
+            version = self.backend.get(self._version_key(entity, id)) or 0
+            key = f"profile:v{SCHEMA_VERSION}:{entity}:{id}:{version}"
+            profile = self.backend.get(key)
+        except Exception:
+            self._count("errors")  # A cache outage must not fail the request
+            return loader()
+
+        if profile is not None:
+            self._count("hits")
+            return profile
+
+        self._count("misses")
+        with primary_reads():
+            profile = loader()
+        if profile is not None:
+            try:
+                self.backend.set(key, profile)
+            except Exception:
+                self._count("errors")
+        return profile
+
+    def invalidate(self, entity, id):
+        """Drop the cached profile after it was updated or deleted."""
+        self._count("invalidations")
+        try:
+            version = self.backend.get(self._version_key(entity, id)) or 0
+            self.backend.incr(self._version_key(entity, id))
+            self.backend.delete(f"profile:v{SCHEMA_VERSION}:{entity}:{id}:{version}")
+        except Exception:
+            self._count("errors")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "errors": self.errors
+        }
+
+
+profile_cache = ProfileCache()
+metrics.register("profile_cache", profile_cache.stats)
+
+
+def init_profile_cache(app):
+    """Select the profile cache backend from the app config."""
+    profile_cache.configure(app)
+
+
+def cached_profile(entity, id, load):
+    """Return the serialized hospital or driver `id`, calling `load` only on a cache miss."""
+    return profile_cache.get_or_load(entity, id, load)
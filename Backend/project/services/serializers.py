@@ -0,0 +1,47 @@
+from sqlalchemy.orm import joinedload
+
+from project.tables import AmbulanceModel, BookingRequestModel, ConnectRequestModel, DriverModel, HospitalModel
+from project.services.profile_cache import cached_profile
+
+# Relationships each model's to_dict() reads, declared once so list endpoints
+# load them in the same query as the rows instead of one lazy SELECT per row.
+# Embedded hospital and driver profiles come from the profile cache and are
+# only loaded on a cache miss, so they are not joined here.
+SERIALIZER_JOINS = {
+    BookingRequestModel: [("city_state",)],
+    HospitalModel: [("city_state",)],
+    DriverModel: [("city_state",)],
+}
+
+# Profiles each model's to_dict() embeds, by relationship and foreign key column
+SERIALIZER_PROFILES = {
+    AmbulanceModel: {"hospital": "hospital_id"},
+    ConnectRequestModel: {"driver": "driver_id", "hospital": "hospital_id"},
+}
+
+
+def serializer_options(Model):
+    """Return the joinedload options needed to serialize rows of `Model` without lazy loads."""
+    options = []
+    for path in SERIALIZER_JOINS.get(Model, []):
+        current, option = Model, None
+        for name in path:
+            attribute = getattr(current, name)
+            option = joinedload(attribute) if option is None else option.joinedload(attribute)
+            current = attribute.property.mapper.class_
+        options.append(option)
+    return options
+
+
+def embedded_profiles(item):
+    """The hospital and driver profiles `item.to_dict()` embeds, from the profile cache."""
+    profiles = {}
+    for entity, column in SERIALIZER_PROFILES.get(type(item), {}).items():
+        # The relationship is only loaded on a cache miss
+        profiles[entity] = cached_profile(entity, getattr(item, column), lambda: getattr(item, entity).to_dict())
+    return profiles
+
+
+def serialize_query(query, Model):
+    """Run the query with the serializer joins of `Model` and return the rows as dicts."""
+    return [item.to_dict(**embedded_profiles(item)) for item in query.options(*serializer_options(Model))]
@@ -1,23 +1,114 @@
 from celery import shared_task
+from celery.signals import worker_process_shutdown
+from celery.utils.log import get_task_logger
 
+import random
+import smtplib
+import threading
 
 from project.mail_config import mail
 
 from flask_mail import Message
 
+logger = get_task_logger(__name__)
 
-@shared_task(bind = True)
+# Errors worth retrying: the SMTP server dropped us or is temporarily unavailable
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+def _is_transient(error):
+    """Connection failures, and SMTP 4xx replies (421, 450, 451 ...) which are temporary by definition."""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 400 <= error.smtp_code < 500
+
+
+# Each worker process keeps one SMTP connection open and reuses it for every
+# email it sends, instead of a new connection and TLS handshake per email
+_connection = None
+_connection_lock = threading.Lock()
+
+
+def _open_connection():
+    global _connection
+    if _connection is None:
+        connection = mail.connect()
+        connection.__enter__()
+        _connection = connection
+    return _connection
+
+
+def _close_connection():
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.__exit__(None, None, None)
+        except Exception:
+            pass  # The server may already have closed it
+        _connection = None
+
+
+@worker_process_shutdown.connect
+def close_smtp_connection(**kwargs):
+    with _connection_lock:
+        _close_connection()
+
+
+def _build_message(email_data):
+    msg = Message(subject=email_data['subject'], recipients=[email_data['to_email']])
+    msg.body = email_data['body']
+    return msg
+
+
+def _deliver(email_data):
+    """Send one email over the worker's connection, reconnecting once if it went stale."""
+    msg = _build_message(email_data)
+    with _connection_lock:
+        try:
+            _open_connection().send(msg)
+        except smtplib.SMTPServerDisconnected:
+            _close_connection()
+            _open_connection().send(msg)
+
+
+def _deliver_all(emails):
+    """Send every email and return the ones that failed with a transient error."""
+    failed = []
+    for email_data in emails:
+        try:
+            _deliver(email_data)
+        except Exception as e:
+            if not _is_transient(e):
+                logger.error("Failed to send email %r: %s", email_data["subject"], e)
+                continue
+            with _connection_lock:
+                _close_connection()
+            logger.warning("Failed to send email %r, will retry: %s", email_data["subject"], e)
+            failed.append(email_data)
+    return failed
+
+
+def _retry_countdown(retries):
+    """Exponential backoff with jitter: ~5s, 10s, 20s ... capped at 5 minutes."""
+    return min(5 * 2 ** retries, 300) + random.uniform(0, 1)
+
+
+@shared_task(bind = True, max_retries=5)
 def send_email(self,email_data):
     """Send an email notification."""
-    print(f"sending mail with this email data \n {email_data}")
-    try:
-        msg = Message(subject=email_data['subject'], recipients=[email_data['to_email']])
-        msg.body = email_data['body']
-        mail.send(msg)
-    except Exception as e:
-        print(f"❌ Failed to send email: {str(e)}")
-        
+    logger.info("Sending email %r", email_data["subject"])
+    if _deliver_all([email_data]):
+        raise self.retry(countdown=_retry_countdown(self.request.retries))
+
     return "done"
 
-        
-        
\ No newline at end of file
+
+@shared_task(bind = True, max_retries=5)
+def send_email_batch(self,emails):
+    """Send a list of email notifications over one SMTP connection, retrying only the failed ones."""
+    logger.info("Sending %d emails", len(emails))
+    failed = _deliver_all(emails)
+    if failed:
+        raise self.retry(args=[failed], countdown=_retry_countdown(self.request.retries))
+
+    return "done"
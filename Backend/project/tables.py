@@ -28,6 +28,14 @@ class CityStateModel(db.Model):
 
 class BookingRequestModel(db.Model):
     __tablename__ = "booking_requests"
+    __table_args__ = (
+        # Dashboard listings filter by owner, optionally by status and creation date
+        db.Index("ix_booking_requests_hospital_status_created", "hospital_id", "status", "created_at"),
+        db.Index("ix_booking_requests_user_status_created", "user_id", "status", "created_at"),
+        # Delta sync reads the requests changed since a client's watermark
+        db.Index("ix_booking_requests_hospital_updated", "hospital_id", "updated_at"),
+        db.Index("ix_booking_requests_user_updated", "user_id", "updated_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
@@ -61,23 +69,34 @@ class BookingRequestModel(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # When the booking is auto-rejected unless the hospital acts, see services/deadlines.py
+    deadline_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    # Bumped on every status change, see services/booking_state.py
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # Set on the offers of a fan-out booking, sent to several hospitals at once
+    group_id = db.Column(db.Integer, db.ForeignKey("booking_groups.id"), nullable=True, index=True)
+
     # Relationships
     user = db.relationship("UserModel", back_populates="booking_requests")
     hospital = db.relationship("HospitalModel", back_populates="booking_requests")
 
-    def to_dict(self):
+    def to_dict(self, city_state=None):
         """
         Convert object to dictionary.
+        Pass `city_state` when it is already known to skip loading the relationship.
         """
+        city_state = city_state or self.city_state
         return {
             "id": self.id,
             "pickup_address": {
                 "street": self.street,
                 "latitude": self.latitude,
                 "longitude": self.longitude,
-                "city": self.city_state.city if self.city_state else None,
-                "state": self.city_state.state if self.city_state else None,
-                "postal_code": self.city_state.postal_code if self.city_state else None
+                "city": city_state.city if city_state else None,
+                "state": city_state.state if city_state else None,
+                "postal_code": city_state.postal_code if city_state else None
             },
             "status": self.status,
             "reason_of_rejection": self.reason_of_rejection,  # Include in dict
@@ -85,10 +104,29 @@ class BookingRequestModel(db.Model):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "user_id": self.user_id,
             "hospital_id": self.hospital_id,
-            "ambulance_type": self.ambulance_type
+            "ambulance_type": self.ambulance_type,
+            "group_id": self.group_id
         }
 
 
+class BookingGroupModel(db.Model):
+    __tablename__ = "booking_groups"
+
+    # One fan-out booking: its offers are booking requests to several hospitals,
+    # and the first hospital to accept claims the group (services/booking_state.py)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    status = db.Column(
+        db.Enum("open", "claimed", "exhausted", name="booking_group_status"),
+        nullable=False,
+        default="open",
+    )
+    # The offer that was accepted; not a foreign key since booking_requests references this table
+    accepted_request_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 # Admin Model
 class AdminModel(db.Model):
     __tablename__ = "admin"
@@ -151,6 +189,7 @@ class HospitalModel(db.Model):
     street = db.Column(db.String(255))
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), index=True)  # Spatial index cell, see services/geohash.py
     
     # Foreign key to CityStateModel
     city_state_id = db.Column(db.Integer, db.ForeignKey('city_states.id'), nullable=False)
@@ -196,6 +235,7 @@ class DriverModel(db.Model):
     street = db.Column(db.String(255))
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), index=True)  # Spatial index cell, see services/geohash.py
     
     # Foreign key to CityStateModel
     city_state_id = db.Column(db.Integer, db.ForeignKey('city_states.id'), nullable=False)
@@ -238,13 +278,17 @@ class AmbulanceModel(db.Model):
     # Foreign keys
     hospital_id = db.Column(db.Integer, db.ForeignKey("hospital.id"), nullable=False)
 
-    def to_dict(self):
+    def to_dict(self, hospital=None):
+        """
+        Convert object to dictionary.
+        Pass the serialized `hospital` when it is already known to skip loading the relationship.
+        """
         return {
             "id": self.id,
             "vehicle_number": self.vehicle_number,
             "vehicle_type": self.vehicle_type,
             "created_at": self.created_at.isoformat() if self.created_at else None,
-            "hospital": self.hospital.to_dict()
+            "hospital": hospital or self.hospital.to_dict()
         }
 
 
@@ -286,12 +330,51 @@ class TokenBlocklist(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String(36), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)  # Bloom filter refresh
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class NotificationOutboxModel(db.Model):
+    __tablename__ = "notification_outbox"
+
+    # Emails written in the same transaction as the change that triggers them,
+    # and handed to Celery afterwards by services/outbox.relay_outbox
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            "to_email": self.to_email,
+            "subject": self.subject,
+            "body": self.body
+        }
+
+
+class DriverLocationSampleModel(db.Model):
+    __tablename__ = "driver_location_samples"
+    __table_args__ = (
+        db.Index("ix_driver_location_samples_driver_recorded", "driver_id", "recorded_at"),
+    )
+
+    # GPS pings reported by driver apps, written in batches by
+    # services/driver_locations.flush_location_samples
+    id = db.Column(db.Integer, primary_key=True)
+    driver_id = db.Column(db.Integer, db.ForeignKey("driver.id", ondelete="CASCADE"), nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False)
 
 
 class ConnectRequestModel(db.Model):
     __tablename__ = "connect_requests"
+    __table_args__ = (
+        # Duplicate check on (driver, hospital, status) and per-owner pending lists
+        db.Index("ix_connect_requests_driver_hospital_status", "driver_id", "hospital_id", "status"),
+        db.Index("ix_connect_requests_hospital_status", "hospital_id", "status"),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     status = db.Column(db.Enum("pending", "accepted", "rejected", name="request_status"), nullable=False, default="pending")
@@ -308,14 +391,18 @@ class ConnectRequestModel(db.Model):
     driver = db.relationship("DriverModel", back_populates="connection_requests")
     hospital = db.relationship("HospitalModel", back_populates="connection_requests")
 
-    def to_dict(self):
+    def to_dict(self, driver=None, hospital=None):
+        """
+        Convert object to dictionary.
+        Pass the serialized `driver` and `hospital` when already known to skip loading the relationships.
+        """
         return {
             "id": self.id,
             "status": self.status,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "sender_type": self.sender_type,
-            "driver": self.driver.to_dict(),
-            "hospital": self.hospital.to_dict()
+            "driver": driver or self.driver.to_dict(),
+            "hospital": hospital or self.hospital.to_dict()
         }
 
 
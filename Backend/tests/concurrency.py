@@ -0,0 +1,25 @@
+import threading
+
+from werkzeug.exceptions import HTTPException
+
+# How many times each race test is repeated
+ROUNDS = 10
+
+
+def run_concurrently(*calls):
+    """Start every call on its own thread at the same moment; return their results in order."""
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def run(index, call):
+        try:
+            results[index] = call(barrier)
+        except HTTPException as e:
+            results[index] = e.code
+
+    threads = [threading.Thread(target=run, args=(index, call)) for index, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    return results
@@ -0,0 +1,121 @@
+import itertools
+import os
+import tempfile
+
+import pytest
+
+# The scheduler keeps its job store in a relative sqlite file, created when
+# project.scheduler is imported, so run from a scratch directory that also
+# holds the test database.
+_workdir = tempfile.mkdtemp(prefix="lifelinego-tests-")
+os.chdir(_workdir)
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_workdir}/test.db"
+os.environ["SQLALCHEMY_REPLICA_URIS"] = ""
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("JWT_SECRET_KEY", "test")
+os.environ.setdefault("MAIL_DEFAULT_SENDER", "noreply@lifelinego.test")
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["IDEMPOTENCY_BACKEND"] = "memory"
+os.environ["LIVE_LOCATION_BACKEND"] = "memory"
+
+from flask_jwt_extended import create_access_token
+
+from project import create_app
+from project.db import db
+from project.scheduler import scheduler
+from project.tables import BookingRequestModel, DriverModel, HospitalModel, UserModel
+from project.services.city_state import resolve_city_state
+from project.services.helper import location_geohash
+
+_ids = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def app():
+    app, _ = create_app()
+    # Tests run the periodic jobs themselves
+    scheduler.pause()
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def address(latitude=28.61, longitude=77.21, postal_code="110001"):
+    return {
+        "street": "1 Test Road", "city": "Delhi", "state": "DL",
+        "postal_code": postal_code, "latitude": latitude, "longitude": longitude
+    }
+
+
+@pytest.fixture
+def make_hospital(app):
+    def make(latitude=28.61, longitude=77.21):
+        n = next(_ids)
+        with app.app_context():
+            hospital = HospitalModel(
+                name=f"hospital{n}", email=f"hospital{n}@lifelinego.test", phone=f"9{n:09d}", password="x",
+                street="1 Test Road", latitude=latitude, longitude=longitude,
+                geohash=location_geohash(latitude, longitude),
+                city_state_id=resolve_city_state(address()).id
+            )
+            db.session.add(hospital)
+            db.session.commit()
+            return hospital.id
+    return make
+
+
+@pytest.fixture
+def make_driver(app):
+    def make(latitude=28.61, longitude=77.21):
+        n = next(_ids)
+        with app.app_context():
+            driver = DriverModel(
+                name=f"driver{n}", email=f"driver{n}@lifelinego.test", phone=f"7{n:09d}", password="x",
+                street="1 Test Road", latitude=latitude, longitude=longitude,
+                geohash=location_geohash(latitude, longitude),
+                city_state_id=resolve_city_state(address()).id
+            )
+            db.session.add(driver)
+            db.session.commit()
+            return driver.id
+    return make
+
+
+@pytest.fixture
+def make_user(app):
+    def make():
+        n = next(_ids)
+        with app.app_context():
+            user = UserModel(name=f"user{n}", email=f"user{n}@lifelinego.test", phone=f"8{n:09d}", password="x")
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def make_booking(app):
+    def make(user_id, hospital_id, postal_code="110001", **values):
+        values.setdefault("status", "pending")
+        with app.app_context():
+            booking = BookingRequestModel(
+                user_id=user_id, hospital_id=hospital_id, sex="M", ambulance_type="Basic",
+                street="1 Test Road", latitude=28.61, longitude=77.21,
+                city_state_id=resolve_city_state(address(postal_code=postal_code)).id, **values
+            )
+            db.session.add(booking)
+            db.session.commit()
+            return booking.id
+    return make
+
+
+@pytest.fixture
+def auth_headers(app):
+    def headers(id, role):
+        with app.app_context():
+            token = create_access_token(identity=str(id), additional_claims={"role": role})
+        return {"Authorization": f"Bearer {token}"}
+    return headers
@@ -0,0 +1,143 @@
+-- Schema created by db.create_all() before the first migration, used by tests/test_schema.py
+CREATE TABLE city_states (
+	id INTEGER NOT NULL, 
+	city VARCHAR(100) NOT NULL, 
+	state VARCHAR(100) NOT NULL, 
+	postal_code VARCHAR(20) NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (postal_code)
+);
+CREATE TABLE admin (
+	id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	email VARCHAR(100) NOT NULL, 
+	password VARCHAR(200) NOT NULL, 
+	created_at DATETIME, 
+	phone VARCHAR(15) NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (name), 
+	UNIQUE (email), 
+	UNIQUE (phone)
+);
+CREATE TABLE user (
+	id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	email VARCHAR(100) NOT NULL, 
+	phone VARCHAR(15) NOT NULL, 
+	password VARCHAR(200) NOT NULL, 
+	created_at DATETIME, 
+	PRIMARY KEY (id), 
+	UNIQUE (name), 
+	UNIQUE (email), 
+	UNIQUE (phone)
+);
+CREATE TABLE token_blocklist (
+	id INTEGER NOT NULL, 
+	jti VARCHAR(36) NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	expires_at DATETIME NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (jti)
+);
+CREATE TABLE hospital (
+	id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	email VARCHAR(100) NOT NULL, 
+	created_at DATETIME, 
+	password VARCHAR(200) NOT NULL, 
+	phone VARCHAR(15) NOT NULL, 
+	street VARCHAR(255), 
+	latitude FLOAT, 
+	longitude FLOAT, 
+	city_state_id INTEGER NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (name), 
+	UNIQUE (email), 
+	UNIQUE (phone), 
+	FOREIGN KEY(city_state_id) REFERENCES city_states (id)
+);
+CREATE TABLE driver (
+	id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	email VARCHAR(100) NOT NULL, 
+	phone VARCHAR(20) NOT NULL, 
+	password VARCHAR(255) NOT NULL, 
+	status VARCHAR(9) NOT NULL, 
+	created_at DATETIME, 
+	street VARCHAR(255), 
+	latitude FLOAT, 
+	longitude FLOAT, 
+	city_state_id INTEGER NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (email), 
+	FOREIGN KEY(city_state_id) REFERENCES city_states (id)
+);
+CREATE TABLE hospital_driver (
+	hospital_id INTEGER NOT NULL, 
+	driver_id INTEGER NOT NULL, 
+	PRIMARY KEY (hospital_id, driver_id), 
+	FOREIGN KEY(hospital_id) REFERENCES hospital (id), 
+	FOREIGN KEY(driver_id) REFERENCES driver (id)
+);
+CREATE TABLE booking_requests (
+	id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	hospital_id INTEGER NOT NULL, 
+	sex VARCHAR(1) NOT NULL, 
+	ambulance_type VARCHAR(8) NOT NULL, 
+	status VARCHAR(9) NOT NULL, 
+	reason_of_rejection VARCHAR(255), 
+	street VARCHAR(255), 
+	latitude FLOAT, 
+	longitude FLOAT, 
+	city_state_id INTEGER NOT NULL, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES user (id), 
+	FOREIGN KEY(hospital_id) REFERENCES hospital (id), 
+	FOREIGN KEY(city_state_id) REFERENCES city_states (id)
+);
+CREATE TABLE ambulance (
+	id INTEGER NOT NULL, 
+	vehicle_number VARCHAR(20) NOT NULL, 
+	vehicle_type VARCHAR(50) NOT NULL, 
+	status VARCHAR(11) NOT NULL, 
+	created_at DATETIME, 
+	hospital_id INTEGER NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (vehicle_number), 
+	FOREIGN KEY(hospital_id) REFERENCES hospital (id)
+);
+CREATE TABLE connect_requests (
+	id INTEGER NOT NULL, 
+	status VARCHAR(8) NOT NULL, 
+	created_at DATETIME, 
+	sender_type VARCHAR(8) NOT NULL, 
+	driver_id INTEGER NOT NULL, 
+	hospital_id INTEGER NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(driver_id) REFERENCES driver (id), 
+	FOREIGN KEY(hospital_id) REFERENCES hospital (id)
+);
+CREATE TABLE booking (
+	id INTEGER NOT NULL, 
+	status VARCHAR(9) NOT NULL, 
+	created_at DATETIME, 
+	request_id INTEGER NOT NULL, 
+	ambulance_details JSON NOT NULL, 
+	driver_details JSON NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (request_id), 
+	FOREIGN KEY(request_id) REFERENCES booking_requests (id)
+);
+CREATE TABLE otp (
+	id INTEGER NOT NULL, 
+	booking_id INTEGER NOT NULL, 
+	otp_code VARCHAR(10) NOT NULL, 
+	created_at DATETIME, 
+	expires_at DATETIME NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (booking_id), 
+	FOREIGN KEY(booking_id) REFERENCES booking (id)
+);
@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from project.db import db
+
+
+@contextmanager
+def record_statements(app):
+    """Record the (statement, parameters) of every query the app runs inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
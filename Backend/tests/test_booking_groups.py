@@ -0,0 +1,144 @@
+import pytest
+
+from project.db import db
+from project.tables import BookingGroupModel, BookingRequestModel, HospitalModel, NotificationOutboxModel, UserModel
+from project.services import dispatch
+from project.services.ambulanceBooking import respond_to_booking
+from project.services.booking_state import close_exhausted_groups, WITHDRAWN_REASON
+from project.services.dispatch import AvailabilityIndex
+
+from concurrency import ROUNDS, run_concurrently
+
+EXHAUSTED_BODY = "None of the nearby hospitals could accept your ambulance booking request. Please try again."
+
+
+@pytest.fixture
+def make_group(app, make_hospital, make_user, make_booking):
+    def make(offers=2):
+        user_id = make_user()
+        with app.app_context():
+            group = BookingGroupModel(user_id=user_id, status="open")
+            db.session.add(group)
+            db.session.commit()
+            group_id = group.id
+        hospital_ids = [make_hospital() for _ in range(offers)]
+        booking_ids = [make_booking(user_id, hospital_id, group_id=group_id) for hospital_id in hospital_ids]
+        return user_id, group_id, list(zip(booking_ids, hospital_ids))
+    return make
+
+
+def exhausted_emails(app, user_id):
+    with app.app_context():
+        email = db.session.get(UserModel, user_id).email
+        return NotificationOutboxModel.query.filter_by(to_email=email, body=EXHAUSTED_BODY).count()
+
+
+@pytest.mark.parametrize("update_returning", [True, False])
+def test_a_group_is_closed_once(app, make_group, update_returning, monkeypatch):
+    user_id, group_id, offers = make_group()
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, "update_returning", update_returning)
+        for booking_id, hospital_id in offers:
+            respond_to_booking({"status": "rejected", "reason": "Full"}, booking_id, str(hospital_id))
+
+        assert close_exhausted_groups([group_id]) == []  # Already closed by the last decline
+        assert db.session.get(BookingGroupModel, group_id).status == "exhausted"
+    assert exhausted_emails(app, user_id) == 1
+
+
+@pytest.mark.parametrize("round", range(ROUNDS))
+def test_concurrent_declines_email_the_user_once(app, make_group, round):
+    user_id, group_id, offers = make_group(offers=4)
+
+    def decline(booking_id, hospital_id):
+        def call(barrier):
+            barrier.wait()
+            with app.app_context():
+                respond_to_booking({"status": "rejected", "reason": "Full"}, booking_id, str(hospital_id))
+                return "rejected"
+        return call
+
+    results = run_concurrently(*(decline(*offer) for offer in offers))
+
+    assert results == ["rejected"] * len(offers)
+    with app.app_context():
+        assert db.session.get(BookingGroupModel, group_id).status == "exhausted"
+    assert exhausted_emails(app, user_id) == 1
+
+
+@pytest.mark.parametrize("round", range(ROUNDS))
+def test_the_first_acceptance_claims_the_group(app, make_group, round):
+    user_id, group_id, offers = make_group(offers=4)
+
+    def accept(booking_id, hospital_id):
+        def call(barrier):
+            barrier.wait()
+            with app.app_context():
+                return respond_to_booking({"status": "accepted"}, booking_id, str(hospital_id))[1]
+        return call
+
+    results = run_concurrently(*(accept(*offer) for offer in offers))
+
+    assert sorted(results) == [200, 409, 409, 409]
+    winner = offers[results.index(200)][0]
+    with app.app_context():
+        group = db.session.get(BookingGroupModel, group_id)
+        assert (group.status, group.accepted_request_id) == ("claimed", winner)
+        for booking_id, _ in offers:
+            booking = db.session.get(BookingRequestModel, booking_id)
+            if booking_id == winner:
+                assert booking.status == "accepted"
+            else:
+                assert (booking.status, booking.reason_of_rejection, booking.deadline_at) == (
+                    "rejected", WITHDRAWN_REASON, None
+                )
+
+
+FAN_OUT = {
+    "ambulance_type": "Basic", "status": "pending", "name": "Patient", "age": 40, "sex": "M",
+    "address": {
+        "street": "2 Pickup Lane", "city": "Delhi", "state": "DL", "postal_code": "110001",
+        "latitude": 28.61, "longitude": 77.21
+    },
+}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = AvailabilityIndex()
+    monkeypatch.setattr(dispatch, "availability_index", index)
+    return index
+
+
+def test_fan_out_offers_the_nearest_hospitals(app, client, make_hospital, make_user, auth_headers, index):
+    hospital_ids = []
+    for ambulance_id, km in enumerate((3, 1, 2)):
+        latitude = 28.61 + km / 111  # ~111 km per degree
+        hospital_ids.append(make_hospital(latitude, 77.21))
+        index.move_hospital(hospital_ids[-1], latitude, 77.21)
+        index.update_ambulance(ambulance_id, hospital_ids[-1], "Basic", "available")
+    user_id = make_user()
+
+    response = client.post(
+        "/api/users/order-requests/fan-out", json=dict(FAN_OUT, hospitals=2), headers=auth_headers(user_id, "user")
+    )
+
+    assert response.status_code == 201, response.get_json()
+    data = response.get_json()["data"]
+    nearest = [hospital_ids[1], hospital_ids[2]]
+    assert [offer["hospital_id"] for offer in data["order_requests"]] == nearest
+    with app.app_context():
+        group = db.session.get(BookingGroupModel, data["group_id"])
+        assert (group.user_id, group.status) == (user_id, "open")
+        offers = BookingRequestModel.query.filter_by(group_id=group.id).order_by(BookingRequestModel.id).all()
+        assert [offer.hospital_id for offer in offers] == nearest
+        assert all(offer.status == "pending" and offer.deadline_at is not None for offer in offers)
+        for hospital_id in nearest:
+            email = db.session.get(HospitalModel, hospital_id).email
+            assert NotificationOutboxModel.query.filter_by(to_email=email).count() == 1
+
+
+def test_fan_out_without_a_matching_ambulance(client, make_user, auth_headers, index):
+    response = client.post("/api/users/order-requests/fan-out", json=FAN_OUT, headers=auth_headers(make_user(), "user"))
+
+    assert response.status_code == 404
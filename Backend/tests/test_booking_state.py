@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.exceptions import HTTPException
+
+from project.db import db
+from project.tables import BookingRequestModel
+from project.services.ambulanceBooking import respond_to_booking, sweep_booking_deadlines
+from project.services.booking_state import transition_booking
+from project.services.deadlines import DEADLINE_REASONS
+
+from concurrency import ROUNDS, run_concurrently
+
+
+def load(app, booking_id):
+    with app.app_context():
+        return db.session.get(BookingRequestModel, booking_id)
+
+
+def test_transition_applies_and_bumps_version(app, make_hospital, make_user, make_booking):
+    booking_id = make_booking(make_user(), make_hospital())
+    with app.app_context():
+        booking = db.session.get(BookingRequestModel, booking_id)
+        transition_booking(booking, "pending", status="accepted")
+        db.session.commit()
+        assert (booking.status, booking.version) == ("accepted", 1)
+    assert (load(app, booking_id).status, load(app, booking_id).version) == ("accepted", 1)
+
+
+def test_transition_from_a_stale_read_is_rejected(app, make_hospital, make_user, make_booking):
+    booking_id = make_booking(make_user(), make_hospital())
+    with app.app_context():
+        stale = db.session.get(BookingRequestModel, booking_id)
+        with app.app_context():
+            current = db.session.get(BookingRequestModel, booking_id)
+            transition_booking(current, "pending", status="rejected", reason_of_rejection="Full")
+            db.session.commit()
+        with pytest.raises(HTTPException) as error:
+            transition_booking(stale, "pending", status="accepted")
+        assert error.value.code == 409
+    assert load(app, booking_id).status == "rejected"
+
+
+def test_invalid_transition_is_refused(app, make_hospital, make_user, make_booking):
+    booking_id = make_booking(make_user(), make_hospital(), status="rejected")
+    with app.app_context():
+        booking = db.session.get(BookingRequestModel, booking_id)
+        with pytest.raises(ValueError):
+            transition_booking(booking, "rejected", status="accepted")
+
+
+@pytest.mark.parametrize("round", range(ROUNDS))
+def test_concurrent_transitions_have_exactly_one_winner(app, make_hospital, make_user, make_booking, round):
+    booking_id = make_booking(make_user(), make_hospital())
+    outcomes = ["accepted", "rejected"] * 4
+
+    def respond(status):
+        def call(barrier):
+            with app.app_context():
+                booking = db.session.get(BookingRequestModel, booking_id)
+                barrier.wait()  # Every thread has read version 0 before any writes
+                transition_booking(booking, "pending", status=status)
+                db.session.commit()
+                return status
+        return call
+
+    results = run_concurrently(*(respond(status) for status in outcomes))
+
+    winners = [result for result in results if result in ("accepted", "rejected")]
+    assert len(winners) == 1, results
+    assert results.count(409) == len(outcomes) - 1, results
+    booking = load(app, booking_id)
+    assert (booking.status, booking.version) == (winners[0], 1)
+
+
+@pytest.mark.parametrize("round", range(ROUNDS))
+def test_hospital_response_races_the_deadline_sweep(app, make_hospital, make_user, make_booking, round):
+    hospital_id = make_hospital()
+    booking_id = make_booking(make_user(), hospital_id, deadline_at=datetime.utcnow() - timedelta(seconds=1))
+
+    def accept(barrier):
+        barrier.wait()
+        with app.app_context():
+            respond_to_booking({"status": "accepted"}, booking_id, str(hospital_id))
+            return "accepted"
+
+    def sweep(barrier):
+        barrier.wait()
+        return sweep_booking_deadlines(app)
+
+    accepted, _ = run_concurrently(accept, sweep)
+
+    booking = load(app, booking_id)
+    assert booking.version == 1, "both the response and the sweep changed the booking"
+    if accepted == "accepted":
+        assert booking.status == "accepted" and booking.deadline_at > datetime.utcnow()
+    else:
+        # The sweep won: the hospital was told the booking changed (409) or was already processed (400)
+        assert accepted in (400, 409)
+        assert (booking.status, booking.reason_of_rejection) == ("rejected", DEADLINE_REASONS["pending"])
+        assert booking.deadline_at is None
+
+
+def test_sweep_leaves_a_booking_answered_before_its_deadline(app, make_hospital, make_user, make_booking):
+    hospital_id = make_hospital()
+    booking_id = make_booking(make_user(), hospital_id, deadline_at=datetime.utcnow() + timedelta(seconds=1))
+    with app.app_context():
+        respond_to_booking({"status": "rejected", "reason": "No ambulance"}, booking_id, str(hospital_id))
+
+    sweep_booking_deadlines(app)
+
+    booking = load(app, booking_id)
+    assert (booking.status, booking.reason_of_rejection, booking.version) == ("rejected", "No ambulance", 1)
@@ -0,0 +1,95 @@
+import pytest
+
+from project.services import dispatch
+from project.services.dispatch import AvailabilityIndex, rank_hospitals_for_dispatch
+
+# Pickup point in central Delhi; hospitals placed north of it, 0.01° of latitude is ~1.1 km
+PICKUP = (28.61, 77.21)
+
+
+@pytest.fixture
+def index():
+    index = AvailabilityIndex()
+    for hospital_id, km in [(1, 1), (2, 5), (3, 20), (4, 100)]:
+        index.move_hospital(hospital_id, PICKUP[0] + km / 111, PICKUP[1])
+    return index
+
+
+def nearest_ids(index, ambulance_type="Basic", radius_km=75, limit=5):
+    return [hospital_id for hospital_id, _, _ in index.nearest(*PICKUP, ambulance_type, radius_km, limit)]
+
+
+def test_nearest_matches_the_ambulance_type_case_insensitively(index):
+    index.update_ambulance(10, 1, "ICU", "available")
+    index.update_ambulance(11, 2, " basic ", "available")
+
+    assert nearest_ids(index, "Basic") == [2]
+    assert nearest_ids(index, "icu") == [1]
+    assert nearest_ids(index, "Neonatal") == []
+
+
+def test_counts_follow_status_changes(index):
+    for ambulance_id in (10, 11, 12):
+        index.update_ambulance(ambulance_id, 1, "Basic", "available")
+    index.update_ambulance(11, 1, "Basic", "busy")
+    index.remove_ambulance(12)
+
+    assert index.nearest(*PICKUP, "Basic", 75, 5)[0][:2] == (1, 1)
+
+    index.update_ambulance(10, 1, "Basic", "maintenance")
+    assert nearest_ids(index) == []
+
+
+def test_nearest_respects_radius_and_limit(index):
+    for hospital_id in (1, 2, 3, 4):
+        index.update_ambulance(hospital_id * 10, hospital_id, "Basic", "available")
+
+    assert nearest_ids(index) == [1, 2, 3]
+    assert nearest_ids(index, radius_km=10) == [1, 2]
+    assert nearest_ids(index, limit=2) == [1, 2]
+    assert nearest_ids(index, radius_km=500) == [1, 2, 3, 4]
+
+
+def test_rebuild_keeps_changes_made_while_it_read_the_database(index):
+    index.update_ambulance(10, 1, "Basic", "available")
+    generation = index.begin_rebuild()
+    snapshot = [(10, 1, "Basic", "available")]  # Read before the ambulance was dispatched
+    index.update_ambulance(10, 1, "Basic", "busy")
+    index.update_ambulance(20, 2, "Basic", "available")
+
+    assert index.replace(snapshot, [(1, PICKUP[0] + 0.01, PICKUP[1]), (2, PICKUP[0] + 0.05, PICKUP[1])], generation)
+    assert nearest_ids(index) == [2]
+
+    # Changes after the rebuild finished are no longer recorded
+    index.update_ambulance(10, 1, "Basic", "available")
+    assert index._changes is None
+
+
+def test_an_overtaken_rebuild_is_discarded(index):
+    index.update_ambulance(10, 1, "Basic", "available")
+    stale = index.begin_rebuild()
+    current = index.begin_rebuild()
+
+    assert index.replace([], [], stale) is False
+    assert nearest_ids(index) == [1]
+    assert index.replace([(10, 1, "Basic", "busy")], [(1, PICKUP[0] + 0.01, PICKUP[1])], current) is True
+    assert nearest_ids(index) == []
+
+
+def test_rank_hospitals_for_dispatch(app, make_hospital, index, monkeypatch):
+    near, far = make_hospital(PICKUP[0] + 0.01, PICKUP[1]), make_hospital(PICKUP[0] + 0.1, PICKUP[1])
+    index.move_hospital(near, PICKUP[0] + 0.01, PICKUP[1])
+    index.move_hospital(far, PICKUP[0] + 0.1, PICKUP[1])
+    index.update_ambulance(10, near, "Basic", "available")
+    index.update_ambulance(11, far, "Basic", "available")
+    index.update_ambulance(12, far, "Basic", "available")
+    index.update_ambulance(13, 999999, "Basic", "available")  # Hospital deleted by another worker
+    index.move_hospital(999999, PICKUP[0] + 0.001, PICKUP[1])
+    monkeypatch.setattr(dispatch, "availability_index", index)
+
+    with app.app_context():
+        ranked = rank_hospitals_for_dispatch(*PICKUP, "basic", radius_km=50, limit=3)
+        assert [(row["hospital"]["id"], row["available_ambulances"]) for row in ranked] == [(near, 1), (far, 2)]
+        assert ranked[0]["distance_km"] < ranked[1]["distance_km"]
+
+        assert [row["hospital"]["id"] for row in rank_hospitals_for_dispatch(*PICKUP, "basic", 5, 3)] == [near]
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from project.services.distance import haversine_many, nearest_within
+from project.services.helper import haversine
+
+
+def test_haversine_many_matches_scalar_haversine():
+    rng = np.random.default_rng(7)
+    latitudes = rng.uniform(-90, 90, 2000)
+    longitudes = rng.uniform(-180, 180, 2000)
+    origin = (28.6139, 77.2090)
+
+    distances = haversine_many(*origin, latitudes, longitudes)
+
+    expected = [haversine(*origin, lat, lon) for lat, lon in zip(latitudes, longitudes)]
+    np.testing.assert_allclose(distances, expected, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("origin, point", [
+    ((28.6139, 77.2090), (28.6139, 77.2090)),  # Same point
+    ((0.0, 179.9), (0.0, -179.9)),  # Across the antimeridian
+    ((89.9, 0.0), (89.9, 180.0)),  # Across the pole
+    ((0.0, 0.0), (0.0, 180.0)),  # Antipodal
+])
+def test_haversine_many_edge_cases(origin, point):
+    distance = haversine_many(*origin, [point[0]], [point[1]])[0]
+    assert distance == pytest.approx(haversine(*origin, *point), abs=1e-9)
+
+
+def test_nearest_within_filters_and_orders_by_distance():
+    latitudes = [28.70, 28.62, 29.50, 28.65]
+    longitudes = [77.21, 77.21, 77.21, 77.21]
+
+    indices, distances = nearest_within(28.61, 77.21, latitudes, longitudes, radius_km=20)
+
+    assert list(indices) == [1, 3, 0]
+    assert list(distances) == sorted(distances)
+    assert all(distance <= 20 for distance in distances)
+
+
+def test_nearest_within_returns_the_k_nearest():
+    rng = np.random.default_rng(11)
+    latitudes = rng.uniform(28, 29, 500)
+    longitudes = rng.uniform(77, 78, 500)
+
+    indices, distances = nearest_within(28.5, 77.5, latitudes, longitudes, radius_km=1000, k=5)
+
+    all_distances = haversine_many(28.5, 77.5, latitudes, longitudes)
+    assert list(indices) == list(np.argsort(all_distances)[:5])
+    np.testing.assert_allclose(distances, np.sort(all_distances)[:5])
+
+
+def test_nearest_within_without_candidates():
+    indices, distances = nearest_within(28.5, 77.5, [], [], radius_km=10)
+    assert len(indices) == len(distances) == 0
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+from project.db import db
+from project.tables import DriverLocationSampleModel
+from project.services import driver_locations
+from project.services.driver_locations import LocationSampleBuffer, flush_location_samples
+
+
+@pytest.fixture
+def sample_buffer(monkeypatch):
+    buffer = LocationSampleBuffer(maxsize=100)
+    monkeypatch.setattr(driver_locations, "sample_buffer", buffer)
+    return buffer
+
+
+def sample(driver_id, latitude=28.61):
+    return {"driver_id": driver_id, "latitude": latitude, "longitude": 77.21, "recorded_at": datetime.utcnow()}
+
+
+def stored_samples(app, driver_id):
+    with app.app_context():
+        return DriverLocationSampleModel.query.filter_by(driver_id=driver_id).count()
+
+
+def test_flush_writes_every_sample(app, sample_buffer):
+    sample_buffer.extend([sample(501) for _ in range(7)])
+
+    assert flush_location_samples(app, batch_size=3) == 7
+    assert len(sample_buffer) == 0
+    assert stored_samples(app, 501) == 7
+
+
+def test_flush_drops_rows_that_violate_a_constraint(app, sample_buffer):
+    bad = sample(502, latitude=None)  # NOT NULL violation, like a ping from a deleted driver
+    sample_buffer.extend([sample(502), bad, sample(502), sample(502)])
+
+    assert flush_location_samples(app, batch_size=10) == 3
+    assert (len(sample_buffer), sample_buffer.rejected, sample_buffer.written) == (0, 1, 3)
+    assert stored_samples(app, 502) == 3
+
+    # Later flushes are not blocked by the bad row
+    sample_buffer.extend([sample(502)])
+    assert flush_location_samples(app) == 1
+
+
+def test_flush_keeps_samples_after_a_transient_error(app, sample_buffer, monkeypatch):
+    sample_buffer.extend([sample(503) for _ in range(4)])
+
+    def unavailable(samples):
+        raise ConnectionError("database is unavailable")
+
+    monkeypatch.setattr(driver_locations, "_insert_samples", unavailable)
+    assert flush_location_samples(app) == 0
+    assert len(sample_buffer) == 4
+
+    monkeypatch.undo()
+    monkeypatch.setattr(driver_locations, "sample_buffer", sample_buffer)
+    assert flush_location_samples(app) == 4
+    assert stored_samples(app, 503) == 4
+
+
+def test_put_back_drops_the_oldest_samples_when_the_buffer_filled_up(sample_buffer):
+    failed = [sample(504, latitude=index) for index in range(10)]
+    sample_buffer.extend([sample(505) for _ in range(95)])  # Pinged while the write was failing
+
+    sample_buffer.put_back(failed)
+
+    assert (len(sample_buffer), sample_buffer.dropped) == (100, 5)
+    kept = sample_buffer.take(5)
+    assert [row["latitude"] for row in kept] == [5, 6, 7, 8, 9]
+    assert all(row["driver_id"] == 505 for row in sample_buffer.take(95))
+
+
+def test_memory_location_store_is_refused_with_several_workers(app, monkeypatch):
+    monkeypatch.setitem(app.config, "WEB_CONCURRENCY", 4)
+
+    with pytest.raises(RuntimeError, match="LIVE_LOCATION_BACKEND"):
+        driver_locations.init_driver_locations(app)
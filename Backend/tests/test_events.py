@@ -0,0 +1,23 @@
+from project.services.events import event_bus, publish_booking_event, hospital_channel
+
+
+def test_stream_relays_events_and_unsubscribes_on_close(app):
+    with app.test_request_context():
+        response = event_bus.stream(hospital_channel(1))
+        assert event_bus.broker.subscriber_count() == 0  # Nothing subscribed until the stream is read
+
+        chunks = iter(response.response)
+        assert next(chunks) == ": connected\n\n"
+        assert event_bus.broker.subscriber_count() == 1
+
+        publish_booking_event("booking.created", {"id": 7, "user_id": 2, "hospital_id": 1, "status": "pending"})
+        assert next(chunks).startswith("event: booking.created\ndata: {\"id\": 7")
+
+        response.close()
+        assert event_bus.broker.subscriber_count() == 0
+
+
+def test_unread_stream_leaves_no_subscriber(app):
+    with app.test_request_context():
+        event_bus.stream(hospital_channel(1))
+    assert event_bus.broker.subscriber_count() == 0
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from project.tables import HospitalModel
+from project.services import geohash
+from project.services.distance import haversine_many
+from project.services.helper import find_items_in_range
+
+
+def covered(latitude, longitude, ranges):
+    cell = geohash.encode(latitude, longitude)
+    return any(low <= cell < high for low, high in ranges)
+
+
+@pytest.mark.parametrize("origin", [
+    (28.61, 77.21),
+    (64.0, 10.0),  # Degrees of longitude are half as long
+    (-17.0, 179.95),  # Radius crosses the antimeridian
+    (0.0, -179.95),
+    (89.6, 45.0),  # Radius crosses the pole
+])
+def test_every_point_within_the_radius_is_covered(origin):
+    radius_km = 75
+    rng = np.random.default_rng(11)
+    # Points scattered over a few radii around the origin, wrapped onto the globe
+    latitudes = np.clip(origin[0] + rng.uniform(-2, 2, 5000), -90, 90)
+    longitudes = (origin[1] + rng.uniform(-6, 6, 5000) + 180) % 360 - 180
+    within = haversine_many(*origin, latitudes, longitudes) <= radius_km
+    assert within.any()
+
+    boxes = geohash.search_boxes(*origin, radius_km)
+    ranges = geohash.covering_ranges(boxes)
+
+    for latitude, longitude in zip(latitudes[within], longitudes[within]):
+        assert covered(latitude, longitude, ranges)
+        assert any(
+            min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+            for min_lat, min_lon, max_lat, max_lon in boxes
+        )
+
+
+def test_a_75_km_search_uses_precision_4_cells():
+    boxes = geohash.search_boxes(28.61, 77.21, 75)
+    (cells,) = [geohash.covering_cells(*box) for box in boxes]
+
+    assert {len(cell) for cell in cells} == {4}
+    # Adjacent cells share a range scan
+    assert len(geohash.covering_ranges(boxes)) < len(cells)
+
+
+def test_search_box_is_split_at_the_antimeridian():
+    boxes = geohash.search_boxes(0.0, 179.9, 75)
+
+    assert len(boxes) == 2
+    assert any(max_lon == 180.0 for _, _, _, max_lon in boxes)
+    assert any(min_lon == -180.0 for _, min_lon, _, _ in boxes)
+
+
+def test_find_items_in_range_across_the_antimeridian(app, make_hospital):
+    east = make_hospital(latitude=-17.0, longitude=179.9)
+    west = make_hospital(latitude=-17.0, longitude=-179.9)
+
+    with app.app_context():
+        found = find_items_in_range(-17.0, -179.95, HospitalModel, "hospital", radius_km=50)
+        ids = [item["hospital"]["id"] for item in found]
+
+    assert ids[:2] == [west, east]
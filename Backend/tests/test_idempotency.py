@@ -0,0 +1,71 @@
+import uuid
+
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+
+from project.services.cache import MemoryBackend, backend_from_config
+from project.services.idempotency import IdempotencyStore
+
+
+@pytest.fixture
+def store():
+    return IdempotencyStore(MemoryBackend())
+
+
+def call(app, store, headers, func, key="key-1", body=b'{"a": 1}'):
+    with app.test_request_context("/api/things", method="POST", data=body, headers=headers):
+        verify_jwt_in_request()
+        return store.run("things", key, func)
+
+
+def test_replays_the_stored_response_of_a_three_tuple(app, store, auth_headers):
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return {"id": len(calls)}, 201, {"Location": "/api/things/1"}
+
+    headers = auth_headers(1, "user")
+    first = call(app, store, headers, handler)
+    retry = call(app, store, headers, handler)
+
+    assert calls == [1]
+    assert (first.status_code, first.get_json()) == (201, {"id": 1})
+    assert first.headers["Location"] == "/api/things/1"
+    assert (retry.status_code, retry.get_json()) == (201, {"id": 1})
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+
+def test_replays_a_plain_body(app, store, auth_headers):
+    headers = auth_headers(1, "user")
+    call(app, store, headers, lambda: {"ok": True})
+    retry = call(app, store, headers, lambda: {"ok": False})
+
+    assert (retry.status_code, retry.get_json()) == (200, {"ok": True})
+
+
+def test_failed_responses_are_not_stored(app, store, auth_headers):
+    headers = auth_headers(1, "user")
+    call(app, store, headers, lambda: ({"message": "busy"}, 503))
+    retry = call(app, store, headers, lambda: ({"id": 7}, 201))
+
+    assert (retry.status_code, retry.get_json()) == (201, {"id": 7})
+
+
+def test_key_is_scoped_per_role(app, store, auth_headers):
+    # User 1 and hospital 1 are different callers sharing an id
+    key = str(uuid.uuid4())
+    call(app, store, auth_headers(1, "user"), lambda: ({"caller": "user"}, 201), key=key)
+    response = call(app, store, auth_headers(1, "hospital"), lambda: ({"caller": "hospital"}, 201), key=key)
+
+    assert response.get_json() == {"caller": "hospital"}
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_memory_backend_is_refused_with_several_workers():
+    config = {"IDEMPOTENCY_BACKEND": "memory", "WEB_CONCURRENCY": 4}
+
+    with pytest.raises(RuntimeError, match="IDEMPOTENCY_BACKEND"):
+        backend_from_config(config, "IDEMPOTENCY", shared=True)
+    assert isinstance(backend_from_config(dict(config, WEB_CONCURRENCY=1), "IDEMPOTENCY", shared=True), MemoryBackend)
+
@@ -0,0 +1,92 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from project.db import db
+from project.tables import TokenBlocklist
+from project.services.cache import BloomFilter
+from project.services.logout import blocklist_cache, is_token_revoked, logout_logic
+
+
+def payload():
+    return {"jti": str(uuid.uuid4()), "exp": time.time() + 3600}
+
+
+def revoke_elsewhere(app, jti):
+    """A logout handled by another process: only the table knows about it."""
+    with app.app_context():
+        db.session.add(TokenBlocklist(jti=jti, expires_at=datetime.utcnow() + timedelta(hours=1)))
+        db.session.commit()
+
+
+def check(app, token):
+    with app.app_context():
+        return is_token_revoked(token)
+
+
+@pytest.fixture
+def blocklist(app):
+    with app.app_context():
+        blocklist_cache.configure(app)
+    return blocklist_cache
+
+
+def test_bloom_filter_add_reports_new_items_only():
+    bloom = BloomFilter(capacity=100)
+
+    assert bloom.add("a") is True
+    assert bloom.add("a") is False
+    assert "a" in bloom and bloom.count == 1
+
+
+def test_live_tokens_are_checked_without_a_query(app, blocklist):
+    tokens = [payload() for _ in range(50)]
+
+    for _ in range(3):
+        assert not any(check(app, token) for token in tokens)
+
+    # Only Bloom filter false positives reach the database
+    assert blocklist.database_lookups <= 2
+
+
+def test_own_logout_is_revoked_at_once(app, blocklist):
+    token = payload()
+    with app.app_context():
+        logout_logic(token["jti"], token["exp"])
+
+    assert check(app, token) is True
+
+
+def test_refresh_picks_up_logouts_from_other_processes(app, blocklist):
+    token = payload()
+    assert check(app, token) is False
+
+    revoke_elsewhere(app, token["jti"])
+    with app.app_context():
+        blocklist.refresh()
+
+    assert check(app, token) is True
+
+
+def test_stale_filter_falls_back_to_the_database(app, blocklist, monkeypatch):
+    token = payload()
+    revoke_elsewhere(app, token["jti"])
+    monkeypatch.setattr(blocklist, "refreshed_at", time.monotonic() - 4 * blocklist.refresh_interval)
+
+    assert check(app, token) is True
+    assert blocklist.database_lookups == 1
+
+
+def test_full_filter_is_rebuilt_on_refresh(app, blocklist, monkeypatch):
+    token = payload()
+    revoke_elsewhere(app, token["jti"])
+    monkeypatch.setattr(blocklist, "bloom", BloomFilter(capacity=1))
+    blocklist.bloom.add("filler")
+
+    with app.app_context():
+        blocklist.refresh()
+
+    assert blocklist.bloom.capacity == blocklist.bloom_capacity
+    assert token["jti"] in blocklist.bloom
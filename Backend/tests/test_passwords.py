@@ -0,0 +1,34 @@
+import pytest
+
+from project.services.passwords import PasswordHasher
+
+
+@pytest.fixture(scope="module")
+def hasher():
+    # One pool for the module: each spawned process imports the app on start
+    hasher = PasswordHasher()
+    hasher.configure({"PASSWORD_HASH_ROUNDS": 1000, "PASSWORD_HASH_WORKERS": 2, "PASSWORD_HASH_TIMEOUT": 60})
+    yield hasher
+    hasher._executor.shutdown()
+
+
+def test_pool_hashes_and_verifies(hasher):
+    stored = hasher.hash("secret", "user")
+
+    assert hasher.verify("secret", stored, "user") == (True, None)
+    assert hasher.verify("wrong", stored, "user") == (False, None)
+
+
+def test_pool_processes_are_spawned(hasher):
+    hasher.hash("secret", "user")
+
+    assert hasher._executor._mp_context.get_start_method() == "spawn"
+
+
+def test_verify_rehashes_below_the_role_rounds(hasher, monkeypatch):
+    stored = hasher.hash("secret", "user")
+    monkeypatch.setitem(hasher.rounds, "admin", 2000)
+
+    valid, new_hash = hasher.verify("secret", stored, "admin")
+
+    assert valid and new_hash and hasher.verify("secret", new_hash, "admin") == (True, None)
@@ -0,0 +1,66 @@
+import itertools
+import time
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from project import pool_config
+from project.pool_config import InstrumentedQueuePool, PoolStats
+
+from concurrency import run_concurrently
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = PoolStats()
+    monkeypatch.setattr(pool_config, "pool_stats", stats)
+    return stats
+
+
+def make_engine(tmp_path, opened, **options):
+    """An engine on the instrumented pool that counts the connections it opens."""
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=InstrumentedQueuePool, **options)
+    creator = engine.pool._creator
+
+    def counting_creator():
+        next(opened)
+        return creator()
+
+    engine.pool._creator = counting_creator
+    return engine
+
+
+def test_checkouts_beyond_pool_size_are_overflow(tmp_path, stats):
+    engine = make_engine(tmp_path, itertools.count(1), pool_size=2, max_overflow=2, pool_timeout=0.1)
+
+    connections = [engine.connect() for _ in range(4)]
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    for connection in connections:
+        connection.close()
+    engine.connect().close()  # Served from the pool
+
+    snapshot = stats.snapshot()
+    assert (snapshot["checkouts"], snapshot["overflow_checkouts"], snapshot["timeouts"]) == (5, 2, 1)
+
+
+def test_overflow_checkouts_match_overflow_connections_under_load(tmp_path, stats):
+    opened = itertools.count(1)
+    engine = make_engine(tmp_path, opened, pool_size=3, max_overflow=5, pool_timeout=10)
+    threads, checkouts = 16, 50
+
+    def worker(barrier):
+        barrier.wait()
+        for _ in range(checkouts):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                time.sleep(0.0005)
+
+    run_concurrently(*[worker] * threads)
+
+    # Overflow connections are closed on return, so every overflow checkout opened one
+    connections_opened = next(opened) - 1
+    snapshot = stats.snapshot()
+    assert snapshot["checkouts"] == threads * checkouts
+    assert snapshot["overflow_checkouts"] == connections_opened - 3
+    assert snapshot["timeouts"] == 0
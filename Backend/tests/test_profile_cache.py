@@ -0,0 +1,20 @@
+from project.tables import HospitalModel
+from project.services.helper import get_connection_requests, send_connection_request
+
+from recording import record_statements
+
+
+def test_connection_requests_embed_cached_profiles(app, make_hospital, make_driver):
+    hospital_id, driver_id = make_hospital(), make_driver()
+    with app.app_context():
+        send_connection_request("driver", driver_id, hospital_id)
+        first, _ = get_connection_requests(HospitalModel, hospital_id)
+
+    with record_statements(app) as statements:
+        with app.app_context():
+            second, _ = get_connection_requests(HospitalModel, hospital_id)
+
+    assert second["connection_requests"] == first["connection_requests"]
+    assert second["connection_requests"][0]["driver"]["id"] == driver_id
+    # Both profiles were cached by the first listing
+    assert not any("FROM driver" in statement for statement, _ in statements)
@@ -0,0 +1,31 @@
+import pytest
+
+from recording import record_statements
+
+
+@pytest.mark.parametrize("role, path", [
+    ("hospital", "/api/hospitals/order-requests/all"),
+    ("user", "/api/users/order-requests/all"),
+])
+def test_order_request_listing_query_count_does_not_grow_with_rows(
+    app, client, make_hospital, make_user, make_booking, auth_headers, role, path
+):
+    counts = []
+    for rows in (2, 20):
+        hospital_id, user_id = make_hospital(), make_user()
+        for row in range(rows):
+            # Distinct postal codes, so lazy loads couldn't be served from the identity map
+            make_booking(user_id, hospital_id, postal_code=f"2{row:05d}")
+        headers = auth_headers(hospital_id if role == "hospital" else user_id, role)
+
+        with record_statements(app) as statements:
+            response = client.get(path, headers=headers)
+
+        assert response.status_code == 200
+        assert len(response.get_json()["data"]) == rows
+        assert all(row["pickup_address"]["postal_code"] for row in response.get_json()["data"])
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1], "listing issues a query per row"
+    # The page itself, plus the blocklist query a Bloom filter false positive would cost
+    assert counts[0] <= 2
@@ -0,0 +1,94 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from project.db import db
+from project.tables import HospitalModel, TokenBlocklist
+from project.services.deadlines import reject_due_bookings
+from project.services.helper import get_connection_requests, send_connection_request
+from project.services.logout import cleanup_expired_tokens
+
+from recording import record_statements
+
+# The hot booking and connection queries must be served by the composite
+# indexes declared on the models, not by a table scan. Each case runs the real
+# code path, records the statements it sends and EXPLAINs them with their
+# parameters, so a change to a query is checked against the indexes it needs.
+
+
+def query_plans(app, statements, table):
+    """The EXPLAIN QUERY PLAN of each recorded statement that reads `table`."""
+    plans = []
+    with app.app_context():
+        connection = db.session.connection()
+        for statement, parameters in statements:
+            if f"FROM {table}" in statement and statement.lstrip().upper().startswith(("SELECT", "UPDATE")):
+                rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                plans.append(" ".join(row[-1] for row in rows))
+        db.session.rollback()
+    assert plans, f"no statement read {table}"
+    return plans
+
+
+def assert_uses_index(plans, index):
+    assert any(f"USING INDEX {index}" in plan or f"USING COVERING INDEX {index}" in plan for plan in plans), plans
+
+
+@pytest.fixture
+def owners(make_hospital, make_user, make_booking):
+    hospital_id, user_id = make_hospital(), make_user()
+    make_booking(user_id, hospital_id)
+    return hospital_id, user_id
+
+
+@pytest.mark.parametrize("role, path, index", [
+    ("hospital", "/api/hospitals/order-requests/all?status=pending&created_from=2025-01-01T00:00:00",
+     "ix_booking_requests_hospital_status_created"),
+    ("user", "/api/users/order-requests/all?status=pending&limit=10",
+     "ix_booking_requests_user_status_created"),
+    ("hospital", "/api/hospitals/order-requests/all?since=2025-01-01T00:00:00,0",
+     "ix_booking_requests_hospital_updated"),
+    ("user", "/api/users/order-requests/all?since=2025-01-01T00:00:00,0",
+     "ix_booking_requests_user_updated"),
+])
+def test_order_request_listing_uses_its_index(app, client, owners, auth_headers, role, path, index):
+    hospital_id, user_id = owners
+    headers = auth_headers(hospital_id if role == "hospital" else user_id, role)
+
+    with record_statements(app) as statements:
+        assert client.get(path, headers=headers).status_code == 200
+
+    assert_uses_index(query_plans(app, statements, "booking_requests"), index)
+
+
+def test_deadline_sweep_uses_the_deadline_index(app):
+    with record_statements(app) as statements:
+        with app.app_context():
+            reject_due_bookings(now=datetime(2025, 1, 1))
+            db.session.rollback()
+
+    assert_uses_index(query_plans(app, statements, "booking_requests"), "ix_booking_requests_deadline_at")
+
+
+def test_connection_request_checks_use_their_indexes(app, make_hospital, make_driver):
+    hospital_id, driver_id = make_hospital(), make_driver()
+    with record_statements(app) as statements:
+        with app.app_context():
+            send_connection_request("hospital", driver_id, hospital_id)
+            get_connection_requests(HospitalModel, hospital_id)
+
+    plans = query_plans(app, statements, "connect_requests")
+    assert_uses_index(plans, "ix_connect_requests_driver_hospital_status")
+    assert_uses_index(plans, "ix_connect_requests_hospital_status")
+
+
+def test_token_cleanup_uses_the_expires_at_index(app):
+    with app.app_context():
+        db.session.add(TokenBlocklist(jti=str(uuid.uuid4()), expires_at=datetime.utcnow() - timedelta(hours=1)))
+        db.session.commit()
+
+    with record_statements(app) as statements:
+        cleanup_expired_tokens(app)
+
+    assert_uses_index(query_plans(app, statements, "token_blocklist"), "ix_token_blocklist_expires_at")
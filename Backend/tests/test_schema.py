@@ -0,0 +1,133 @@
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+
+from project.db import db
+from project.schema import MIGRATIONS, upgrade_schema
+from project.tables import BookingRequestModel
+
+BASELINE_SCHEMA = Path(__file__).parent / "data" / "baseline_schema.sql"
+logger = logging.getLogger("tests.schema")
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    """A database as the app created it before any migration, with a few rows in it."""
+    engine = create_engine(f"sqlite:///{tmp_path}/baseline.db")
+    with engine.begin() as connection:
+        connection.connection.executescript(BASELINE_SCHEMA.read_text())
+        connection.execute(text("INSERT INTO city_states VALUES (1, 'Delhi', 'DL', '110001')"))
+        connection.execute(text(
+            "INSERT INTO hospital (id, name, email, password, phone, latitude, longitude, city_state_id) "
+            "VALUES (1, 'h', 'h@lifelinego.test', 'x', '1', 28.6, 77.2, 1)"
+        ))
+    yield engine
+    engine.dispose()
+
+
+def columns(engine, table):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def indexes(engine, table):
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_adds_geohash_and_backfills_existing_rows(baseline_engine):
+    upgrade_schema(baseline_engine, logger)
+
+    assert "geohash" in columns(baseline_engine, "hospital")
+    assert "ix_driver_geohash" in indexes(baseline_engine, "driver")
+    with baseline_engine.connect() as connection:
+        assert connection.execute(text("SELECT geohash FROM hospital WHERE id = 1")).scalar() == "ttnfswrr4"
+
+
+def test_upgrade_adds_booking_version_to_existing_rows(baseline_engine):
+    with baseline_engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO user (id, name, email, phone, password) VALUES (1, 'u', 'u@lifelinego.test', '2', 'x')"
+        ))
+        connection.execute(text(
+            "INSERT INTO booking_requests (id, user_id, hospital_id, sex, ambulance_type, status, city_state_id) "
+            "VALUES (1, 1, 1, 'M', 'basic', 'pending', 1)"
+        ))
+
+    upgrade_schema(baseline_engine, logger)
+
+    with baseline_engine.connect() as connection:
+        assert connection.execute(text("SELECT version FROM booking_requests WHERE id = 1")).scalar() == 0
+
+
+@pytest.mark.parametrize("table, index", [
+    ("token_blocklist", "ix_token_blocklist_created_at"),
+    ("token_blocklist", "ix_token_blocklist_expires_at"),
+    ("booking_requests", "ix_booking_requests_deadline_at"),
+    ("booking_requests", "ix_booking_requests_hospital_status_created"),
+    ("booking_requests", "ix_booking_requests_user_status_created"),
+    ("connect_requests", "ix_connect_requests_driver_hospital_status"),
+    ("connect_requests", "ix_connect_requests_hospital_status"),
+    ("booking_requests", "ix_booking_requests_hospital_updated"),
+    ("booking_requests", "ix_booking_requests_user_updated"),
+    ("booking_requests", "ix_booking_requests_group_id"),
+])
+def test_upgrade_creates_indexes(baseline_engine, table, index):
+    upgrade_schema(baseline_engine, logger)
+
+    assert index in indexes(baseline_engine, table)
+
+
+def test_upgraded_database_matches_the_models(baseline_engine):
+    # What create_app() does on startup: create the missing tables, then migrate the existing ones
+    db.metadata.create_all(baseline_engine)
+    upgrade_schema(baseline_engine, logger)
+
+    for table in db.metadata.sorted_tables:
+        assert columns(baseline_engine, table.name) == {column.name for column in table.columns}, table.name
+        assert {index.name for index in table.indexes} <= indexes(baseline_engine, table.name), table.name
+
+
+def test_upgrade_runs_each_migration_once(baseline_engine, caplog):
+    upgrade_schema(baseline_engine, logger)
+    caplog.clear()
+
+    with caplog.at_level(logging.INFO, logger="tests.schema"):
+        upgrade_schema(baseline_engine, logger)
+
+    assert caplog.records == []
+    with baseline_engine.connect() as connection:
+        applied = connection.execute(text("SELECT name FROM schema_migrations")).scalars().all()
+    assert sorted(applied) == sorted(name for name, _ in MIGRATIONS)
+
+
+def test_upgrade_backfills_deadlines_of_waiting_bookings(baseline_engine):
+    created = datetime(2026, 1, 1, 12, 0)
+    accepted = created + timedelta(minutes=5)
+    with baseline_engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO user (id, name, email, phone, password) VALUES (1, 'u', 'u@lifelinego.test', '2', 'x')"
+        ))
+        for id, status in [(1, "pending"), (2, "accepted"), (3, "accepted"), (4, "rejected")]:
+            connection.execute(text(
+                "INSERT INTO booking_requests (id, user_id, hospital_id, sex, ambulance_type, status, city_state_id, "
+                "created_at, updated_at) VALUES (:id, 1, 1, 'M', 'Basic', :status, 1, :created, :accepted)"
+            ), {"id": id, "status": status, "created": created, "accepted": accepted})
+        # Booking 3 already has its details
+        connection.execute(text(
+            "INSERT INTO booking (id, status, request_id, ambulance_details, driver_details) "
+            "VALUES (1, 'active', 3, '{}', '{}')"
+        ))
+
+    upgrade_schema(baseline_engine, logger, {"BOOKING_RESPONSE_TIMEOUT_MINUTES": 10})
+
+    table = BookingRequestModel.__table__
+    with baseline_engine.connect() as connection:
+        deadlines = dict(connection.execute(select(table.c.id, table.c.deadline_at)).all())
+    assert deadlines == {
+        1: created + timedelta(minutes=10),
+        2: accepted + timedelta(minutes=10),
+        3: None,
+        4: None,
+    }